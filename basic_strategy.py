@@ -0,0 +1,255 @@
+"""
+basic_strategy.py
+Works out the best Hit/Stand decision for every (player total, dealer face-up card) pair
+under our house rules, offline, and saves it as a lookup table for the client.
+Published strategy charts assume soft Aces, doubling and splitting; here the Ace is
+ALWAYS 11, face cards are 10, the dealer hits below 17 and a bust player loses on the
+spot, so the chart has to be computed for exactly these rules.
+
+The solver does dynamic programming over the deck composition: a shoe is the tuple of
+how many cards of each point value (2..11) are left, and every value below is memoized
+by (shoe, totals):
+  dealer outcome  probabilities of the dealer ending on 17, 18, 19, 20, 21 or bust,
+                  drawing the hole card and then hitting below 17 from that shoe
+  stand           +1 / 0 / -1 against that distribution (a tie is a push)
+  hit             averaged over the next card: -1 on a bust, else the better of
+                  standing and hitting again with one card less in the shoe
+Those values are exact for one player hand. The chart can only depend on the total,
+so for every (total, face-up card) we add up the stand and hit values of every hand
+composition with that total, each weighted by how likely it is to be holding it, and
+keep the better action.
+
+The result is written in the JSON format decision_policies.load_decision_table_from_json
+reads, so a bot plays it with --bot table:PATH and a human can ask it for advice with
+--advisor table:PATH; at decision time it is a single dict lookup.
+
+Usage: python basic_strategy.py --decks 1 --output basic_strategy.json [--check-rounds 200000]
+"""
+
+import argparse
+import json
+import math
+import time
+
+import consts
+import decision_policies
+import in_memory_transport
+from card_shoe import ShuffledShoeSource
+
+# Point values in shoe tuple order: 2..10, then the Ace (always 11)
+CARD_POINT_VALUES = tuple(range(2, 12))
+
+# Per deck: four of each, except the sixteen 10-point cards (10, Jack, Queen, King)
+CARDS_PER_DECK_BY_POINT_VALUE = tuple(16 if card_points == 10 else 4 for card_points in CARD_POINT_VALUES)
+
+DEALER_STANDS_ON_POINTS = 17
+
+# Index of a bust in a dealer outcome distribution; 17..21 come first
+DEALER_OUTCOME_BUST = 5
+
+LOWEST_PLAYER_TOTAL = 4
+
+
+def build_full_shoe(deck_count):
+    return tuple(card_count * deck_count for card_count in CARDS_PER_DECK_BY_POINT_VALUE)
+
+
+def remove_card_from_shoe(shoe_counts, card_points):
+    card_index = card_points - 2
+    return shoe_counts[:card_index] + (shoe_counts[card_index] - 1,) + shoe_counts[card_index + 1:]
+
+
+class BasicStrategySolver:
+    def __init__(self, deck_count=1):
+        self.deck_count = deck_count
+        self.full_shoe_counts = build_full_shoe(deck_count)
+        self.dealer_outcome_cache = {}
+        self.hit_value_cache = {}
+
+    def dealer_outcome_distribution(self, shoe_counts, dealer_total):
+        """
+        Probabilities of the dealer's final hand: index 0..4 for 17..21, DEALER_OUTCOME_BUST.
+        """
+        if dealer_total >= DEALER_STANDS_ON_POINTS:
+            final_outcome = [0.0] * (DEALER_OUTCOME_BUST + 1)
+            final_outcome[DEALER_OUTCOME_BUST if dealer_total > 21 else dealer_total - DEALER_STANDS_ON_POINTS] = 1.0
+            return final_outcome
+
+        cache_key = (shoe_counts, dealer_total)
+        cached_outcome = self.dealer_outcome_cache.get(cache_key)
+        if cached_outcome is not None:
+            return cached_outcome
+
+        outcome_distribution = [0.0] * (DEALER_OUTCOME_BUST + 1)
+        cards_left = sum(shoe_counts)
+        for card_points, card_count in zip(CARD_POINT_VALUES, shoe_counts):
+            if not card_count:
+                continue
+            draw_probability = card_count / cards_left
+            next_outcome = self.dealer_outcome_distribution(remove_card_from_shoe(shoe_counts, card_points), dealer_total + card_points)
+            for outcome_index, outcome_probability in enumerate(next_outcome):
+                outcome_distribution[outcome_index] += draw_probability * outcome_probability
+
+        self.dealer_outcome_cache[cache_key] = outcome_distribution
+        return outcome_distribution
+
+    def stand_value(self, shoe_counts, player_total, dealer_card_points):
+        # The hole card was dealt from this same shoe, unseen, so drawing it now is equivalent
+        outcome_distribution = self.dealer_outcome_distribution(shoe_counts, dealer_card_points)
+        expected_value = outcome_distribution[DEALER_OUTCOME_BUST]
+        for outcome_index in range(DEALER_OUTCOME_BUST):
+            dealer_final_total = DEALER_STANDS_ON_POINTS + outcome_index
+            if player_total > dealer_final_total:
+                expected_value += outcome_distribution[outcome_index]
+            elif player_total < dealer_final_total:
+                expected_value -= outcome_distribution[outcome_index]
+        return expected_value
+
+    def hit_value(self, shoe_counts, player_total, dealer_card_points):
+        cache_key = (shoe_counts, player_total, dealer_card_points)
+        cached_value = self.hit_value_cache.get(cache_key)
+        if cached_value is not None:
+            return cached_value
+
+        expected_value = 0.0
+        cards_left = sum(shoe_counts)
+        for card_points, card_count in zip(CARD_POINT_VALUES, shoe_counts):
+            if not card_count:
+                continue
+            draw_probability = card_count / cards_left
+            if player_total + card_points > 21:
+                expected_value -= draw_probability
+            else:
+                expected_value += draw_probability * self.best_value(
+                    remove_card_from_shoe(shoe_counts, card_points), player_total + card_points, dealer_card_points
+                )
+
+        self.hit_value_cache[cache_key] = expected_value
+        return expected_value
+
+    def best_value(self, shoe_counts, player_total, dealer_card_points):
+        return max(
+            self.stand_value(shoe_counts, player_total, dealer_card_points),
+            self.hit_value(shoe_counts, player_total, dealer_card_points)
+        )
+
+    def enumerate_player_hands(self, shoe_counts):
+        """
+        Every hand of two or more cards worth at most 21 that shoe_counts can deal,
+        as (total, shoe left after it, probability of holding exactly those cards).
+        """
+        cards_in_shoe = sum(shoe_counts)
+
+        def extend_hand(first_card_index, hand_counts, hand_total, hand_card_count):
+            if hand_card_count >= 2:
+                holding_probability = math.prod(
+                    math.comb(shoe_count, hand_count) for shoe_count, hand_count in zip(shoe_counts, hand_counts)
+                ) / math.comb(cards_in_shoe, hand_card_count)
+                yield hand_total, tuple(map(int.__sub__, shoe_counts, hand_counts)), holding_probability
+            # Cards are added in non-decreasing order, so every combination comes up once
+            for card_index in range(first_card_index, len(CARD_POINT_VALUES)):
+                card_points = CARD_POINT_VALUES[card_index]
+                if hand_total + card_points > 21:
+                    break
+                if hand_counts[card_index] == shoe_counts[card_index]:
+                    continue
+                hand_counts[card_index] += 1
+                yield from extend_hand(card_index, hand_counts, hand_total + card_points, hand_card_count + 1)
+                hand_counts[card_index] -= 1
+
+        yield from extend_hand(0, [0] * len(CARD_POINT_VALUES), 0, 0)
+
+    def solve(self):
+        """
+        Returns {(player total, dealer face-up points): (action, stand value, hit value)},
+        the values being the holding-probability weighted averages over every hand with
+        that total.
+        """
+        strategy_entries = {}
+        for dealer_card_points in CARD_POINT_VALUES:
+            shoe_without_dealer_card = remove_card_from_shoe(self.full_shoe_counts, dealer_card_points)
+            weighted_values_by_total = {}
+            for player_total, shoe_left, holding_probability in self.enumerate_player_hands(shoe_without_dealer_card):
+                total_weight, weighted_stand_value, weighted_hit_value = weighted_values_by_total.get(player_total, (0.0, 0.0, 0.0))
+                weighted_values_by_total[player_total] = (
+                    total_weight + holding_probability,
+                    weighted_stand_value + holding_probability * self.stand_value(shoe_left, player_total, dealer_card_points),
+                    weighted_hit_value + holding_probability * self.hit_value(shoe_left, player_total, dealer_card_points),
+                )
+
+            for player_total, (total_weight, weighted_stand_value, weighted_hit_value) in weighted_values_by_total.items():
+                stand_value = weighted_stand_value / total_weight
+                hit_value = weighted_hit_value / total_weight
+                best_action = decision_policies.PLAYER_ACTION_HIT if hit_value > stand_value else decision_policies.PLAYER_ACTION_STAND
+                strategy_entries[(player_total, dealer_card_points)] = (best_action, stand_value, hit_value)
+        return strategy_entries
+
+
+def build_decision_table_json(strategy_entries):
+    """
+    The {"<player total>": {"<dealer points>": "hit" | "stand"}} layout of decision_policies.
+    """
+    decision_table_json = {}
+    for (player_total, dealer_card_points), (best_action, _, _) in sorted(strategy_entries.items()):
+        decision_table_json.setdefault(str(player_total), {})[str(dealer_card_points)] = best_action
+    return decision_table_json
+
+
+def format_strategy_chart(strategy_entries):
+    chart_lines = ["Total | " + " ".join(f"{'A' if card_points == 11 else card_points:>2}" for card_points in CARD_POINT_VALUES)]
+    for player_total in range(LOWEST_PLAYER_TOTAL, 22):
+        chart_cells = []
+        for dealer_card_points in CARD_POINT_VALUES:
+            strategy_entry = strategy_entries.get((player_total, dealer_card_points))
+            chart_cells.append(" -" if strategy_entry is None else (" H" if strategy_entry[0] == decision_policies.PLAYER_ACTION_HIT else " S"))
+        chart_lines.append(f"{player_total:>5} | " + " ".join(chart_cells))
+    return "\n".join(chart_lines)
+
+
+def parse_command_line_arguments():
+    argument_parser = argparse.ArgumentParser(description="Compute the Hit/Stand table for our house rules")
+    argument_parser.add_argument("--decks", type=int, default=1, help="decks per shoe, like server.py --decks")
+    argument_parser.add_argument("--output", default="basic_strategy.json", help="where to write the decision table")
+    argument_parser.add_argument(
+        "--check-rounds", type=int, default=0, metavar="N",
+        help="also play N rounds in-process with the table and with threshold:17 and compare"
+    )
+    command_line_arguments = argument_parser.parse_args()
+    if command_line_arguments.decks < 1:
+        argument_parser.error("--decks must be at least 1")
+    return command_line_arguments
+
+
+if __name__ == "__main__":
+    command_line_arguments = parse_command_line_arguments()
+
+    solving_started_at = time.perf_counter()
+    strategy_solver = BasicStrategySolver(command_line_arguments.decks)
+    solved_strategy_entries = strategy_solver.solve()
+    print(
+        f"Solved {len(solved_strategy_entries)} decisions for {command_line_arguments.decks} deck(s) in "
+        f"{time.perf_counter() - solving_started_at:.1f}s "
+        f"({len(strategy_solver.dealer_outcome_cache)} dealer and {len(strategy_solver.hit_value_cache)} hit states)"
+    )
+    print(format_strategy_chart(solved_strategy_entries))
+
+    with open(command_line_arguments.output, "w", encoding="utf-8") as output_file:
+        json.dump(build_decision_table_json(solved_strategy_entries), output_file, indent=1)
+    print(f"Wrote {command_line_arguments.output}; play it with: python client.py --bot table:{command_line_arguments.output}")
+
+    if command_line_arguments.check_rounds:
+        compared_policies = (
+            ("table", decision_policies.TableDrivenPolicy(decision_policies.load_decision_table_from_json(command_line_arguments.output))),
+            ("threshold:17", decision_policies.FixedThresholdPolicy(17)),
+        )
+        for policy_name, decision_policy in compared_policies:
+            finished_player = in_memory_transport.play_in_memory_rounds(
+                decision_policy, command_line_arguments.check_rounds, ShuffledShoeSource(command_line_arguments.decks)
+            )
+            results_by_code = finished_player.results_by_code
+            win_count = results_by_code[consts.GAME_RESULT_INDICATOR_PLAYER_WIN]
+            loss_count = results_by_code[consts.GAME_RESULT_INDICATOR_PLAYER_LOSS]
+            print(
+                f"{policy_name:>12}: win rate {win_count / finished_player.rounds_completed:.4f}, "
+                f"expected value per unit bet {(win_count - loss_count) / finished_player.rounds_completed:+.4f}"
+            )
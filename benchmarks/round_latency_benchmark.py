@@ -0,0 +1,167 @@
+"""
+round_latency_benchmark.py
+Loopback benchmark for the write path of the threaded server. It plays the same
+scripted rounds twice: once the old way (one sendall per packet, Nagle on) and once
+with write coalescing + TCP_NODELAY, and prints p50/p99 round latency for both.
+
+Usage: python benchmarks/round_latency_benchmark.py --sessions 8 --rounds 200
+"""
+
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+
+# The benchmark lives one folder below the game modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import consts
+import game_logging
+import protocol_codec
+from frame_reader import BufferedFrameReader
+from latency_statistics import summarize_latency_samples, format_latency_summary
+from packet_writer import enable_tcp_no_delay
+from server import Server
+
+# The scripted player simply copies the dealer: hit below 17
+SCRIPTED_PLAYER_STAND_THRESHOLD = 17
+
+
+def card_points(card_rank):
+    if card_rank == 1:
+        return 11
+    return min(card_rank, 10)
+
+
+def serve_loopback_sessions(game_server, loopback_listener_socket):
+    """
+    Minimal accept loop: same socket preparation and session code as start_server,
+    minus the UDP broadcast.
+    """
+    while True:
+        try:
+            incoming_client_socket, _ = loopback_listener_socket.accept()
+        except OSError:
+            return
+        game_server.prepare_accepted_client_socket(incoming_client_socket)
+        threading.Thread(
+            target=game_server.manage_individual_client_session,
+            args=(incoming_client_socket,),
+            daemon=True
+        ).start()
+
+
+def play_scripted_session(server_address, rounds_to_play, round_latency_samples):
+    """
+    Plays rounds_to_play rounds and records, per round, the time from the start of the
+    round (request sent / previous verdict received) until its verdict arrives.
+    """
+    game_socket = socket.create_connection(server_address)
+    enable_tcp_no_delay(game_socket)
+    payload_reader = BufferedFrameReader(game_socket)
+
+    try:
+        game_socket.sendall(protocol_codec.encode_request_packet(rounds_to_play, "Benchmark Bot"))
+        round_started_at = time.perf_counter()
+
+        for _ in range(rounds_to_play):
+            player_hand_points = 0
+            cards_seen_this_turn = 0
+            is_it_my_turn = True
+
+            while True:
+                unpacked_payload = payload_reader.read_server_payload()
+                if unpacked_payload is None:
+                    raise ConnectionError("Server closed the connection mid-session")
+                _, _, payload_result, card_rank_val, _ = unpacked_payload
+
+                if payload_result != consts.GAME_RESULT_INDICATOR_ROUND_STILL_ACTIVE:
+                    round_finished_at = time.perf_counter()
+                    round_latency_samples.append(round_finished_at - round_started_at)
+                    round_started_at = round_finished_at
+                    break
+
+                if not is_it_my_turn:
+                    continue
+
+                # Cards 1-2 are ours, card 3 is the dealer's face-up card, then our hits
+                cards_seen_this_turn += 1
+                if cards_seen_this_turn != 3:
+                    player_hand_points += card_points(card_rank_val)
+                if cards_seen_this_turn < 3:
+                    continue
+
+                # Busted hands get their verdict without us saying anything
+                if player_hand_points > 21:
+                    continue
+
+                if player_hand_points < SCRIPTED_PLAYER_STAND_THRESHOLD:
+                    game_socket.sendall(protocol_codec.encode_client_decision(protocol_codec.PLAYER_DECISION_HIT))
+                else:
+                    game_socket.sendall(protocol_codec.encode_client_decision(protocol_codec.PLAYER_DECISION_STAND))
+                    is_it_my_turn = False
+    finally:
+        game_socket.close()
+
+
+def run_benchmark_mode(mode_label, game_server, session_count, rounds_per_session):
+    loopback_listener_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    loopback_listener_socket.bind(("127.0.0.1", 0))
+    loopback_listener_socket.listen(consts.TCP_LISTENER_BACKLOG_SIZE)
+    server_address = loopback_listener_socket.getsockname()
+
+    threading.Thread(
+        target=serve_loopback_sessions,
+        args=(game_server, loopback_listener_socket),
+        daemon=True
+    ).start()
+
+    per_session_samples = [[] for _ in range(session_count)]
+    session_threads = [
+        threading.Thread(target=play_scripted_session, args=(server_address, rounds_per_session, session_samples))
+        for session_samples in per_session_samples
+    ]
+
+    benchmark_started_at = time.perf_counter()
+    for session_thread in session_threads:
+        session_thread.start()
+    for session_thread in session_threads:
+        session_thread.join()
+    elapsed_seconds = time.perf_counter() - benchmark_started_at
+
+    loopback_listener_socket.close()
+
+    all_round_latencies = [latency for session_samples in per_session_samples for latency in session_samples]
+    latency_summary = summarize_latency_samples(all_round_latencies)
+    rounds_per_second = len(all_round_latencies) / elapsed_seconds if elapsed_seconds else 0.0
+    return mode_label, latency_summary, rounds_per_second
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description="Round latency: per-packet sends vs coalesced writes")
+    argument_parser.add_argument("--sessions", type=int, default=4, help="concurrent scripted players")
+    argument_parser.add_argument("--rounds", type=int, default=250, help="rounds per player")
+    command_line_arguments = argument_parser.parse_args()
+
+    benchmark_modes = [
+        ("per-packet sendall, Nagle on", Server(coalesce_outgoing_packets=False, enable_tcp_no_delay_on_clients=False)),
+        ("coalesced sendmsg, TCP_NODELAY", Server(coalesce_outgoing_packets=True, enable_tcp_no_delay_on_clients=True)),
+    ]
+
+    # Only warnings from the server, per-session INFO lines would just be noise here
+    game_logging.configure_server_logging("WARNING")
+
+    benchmark_results = []
+    for mode_label, game_server in benchmark_modes:
+        benchmark_results.append(
+            run_benchmark_mode(mode_label, game_server, command_line_arguments.sessions, command_line_arguments.rounds)
+        )
+
+    for mode_label, latency_summary, rounds_per_second in benchmark_results:
+        print(f"{mode_label:32s} {rounds_per_second:9.1f} rounds/s  {format_latency_summary(latency_summary)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""
+run_benchmarks.py
+The benchmark suite for the game's hot paths. Every benchmark is timed on its own:
+  micro: shoe building and shuffling, hand scoring (server and client side), every
+         protocol_codec encoder and decoder, and the BufferedFrameReader read path
+         for pipelined and split packets
+  e2e:   a real Server on loopback against scripted players, at 1, 100 and 1000
+         concurrent sessions, reporting rounds/sec and round latency percentiles
+Results are written as JSON. If a baseline file exists the run is compared against it
+and the script exits with status 1 when a metric got worse by more than the tolerance.
+
+Usage:
+    python benchmarks/run_benchmarks.py --save-baseline           # record the baseline
+    python benchmarks/run_benchmarks.py --output latest.json      # compare against it
+    python benchmarks/run_benchmarks.py --only micro --tolerance 0.25
+"""
+
+import argparse
+import json
+import os
+import platform
+import socket
+import sys
+import threading
+import time
+import timeit
+
+# The benchmark lives one folder below the game modules
+BENCHMARKS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIRECTORY))
+
+import consts
+import game_logging
+import protocol_codec
+from card_shoe import CardShoe, RunningHand, ShuffledShoeSource, card_id_from_rank_and_suit
+from client import Client
+from frame_reader import BufferedFrameReader
+from latency_statistics import summarize_latency_samples
+from round_latency_benchmark import play_scripted_session
+from server import Server, raise_open_file_limit_to_maximum
+
+DEFAULT_BASELINE_PATH = os.path.join(BENCHMARKS_DIRECTORY, "benchmark_baseline.json")
+DEFAULT_CONCURRENCY_LEVELS = (1, 100, 1000)
+
+# Small runs get more rounds per player (up to the 255 a request can ask for), so even
+# the single session run has enough rounds for stable numbers
+MIN_ROUNDS_PER_END_TO_END_RUN = 2000
+MAX_ROUNDS_PER_REQUEST = 255
+
+# Which way is "better" for every metric we compare against the baseline. The tail
+# percentiles are reported but not compared, a single scheduler hiccup moves them.
+LOWER_IS_BETTER = "lower"
+HIGHER_IS_BETTER = "higher"
+COMPARED_METRIC_DIRECTIONS = {
+    "ns_per_call": LOWER_IS_BETTER,
+    "rounds_per_second": HIGHER_IS_BETTER,
+    "p50_ms": LOWER_IS_BETTER,
+}
+
+# A typical three card hand, as the client's (rank, suit) tuples and as the server's card ids
+SAMPLE_HAND_OF_CARDS = [(1, 0), (7, 2), (12, 3)]
+SAMPLE_HAND_CARD_IDS = [card_id_from_rank_and_suit(card_rank, card_suit) for card_rank, card_suit in SAMPLE_HAND_OF_CARDS]
+
+
+def time_per_call(benchmarked_callable, repeat_count):
+    """
+    Best of repeat_count timeit runs, each sized to take about 0.2s, in nanoseconds per call.
+    """
+    benchmark_timer = timeit.Timer(benchmarked_callable)
+    calls_per_run, _ = benchmark_timer.autorange()
+    best_run_seconds = min(benchmark_timer.repeat(repeat=repeat_count, number=calls_per_run))
+    return best_run_seconds / calls_per_run * 1e9
+
+
+def build_hand_scoring_benchmarks():
+    bot_client = Client(is_output_quiet=True)
+    shuffled_shoe_source = ShuffledShoeSource(1)
+
+    def score_hand_with_running_hand():
+        # What the round engine does: add a card, check for a bust, read the total at the end
+        running_hand = RunningHand()
+        for card_id in SAMPLE_HAND_CARD_IDS:
+            running_hand.add_card(card_id)
+            if running_hand.is_bust():
+                break
+        return running_hand.total_points
+
+    return [
+        ("deck.card_shoe_single_deck", CardShoe),
+        ("deck.card_shoe_six_decks", lambda: CardShoe(6)),
+        ("deck.shuffled_shoe_source_acquire", shuffled_shoe_source.acquire_shoe),
+        ("hand.running_hand", score_hand_with_running_hand),
+        ("hand.calculate_current_hand_points", lambda: bot_client.calculate_current_hand_points(SAMPLE_HAND_OF_CARDS)),
+    ]
+
+
+class LoopingByteSource:
+    """
+    Stands in for a socket: recv_into hands out stream_bytes over and over, at most
+    chunk_size bytes per call, so the frame reader can be timed without a kernel.
+    """
+
+    def __init__(self, stream_bytes, chunk_size):
+        self.stream_bytes = stream_bytes
+        self.chunk_size = chunk_size
+        self.stream_position = 0
+
+    def recv_into(self, target_view):
+        copied_byte_count = min(len(target_view), self.chunk_size, len(self.stream_bytes) - self.stream_position)
+        target_view[:copied_byte_count] = self.stream_bytes[self.stream_position:self.stream_position + copied_byte_count]
+        self.stream_position = (self.stream_position + copied_byte_count) % len(self.stream_bytes)
+        return copied_byte_count
+
+
+def build_packet_codec_benchmarks():
+    """
+    The repo's own codec: every protocol_codec encoder and decoder on a typical packet,
+    the prebuilt payload lookups the sessions do per card, and the frame reader.
+    """
+    sample_card_id = SAMPLE_HAND_CARD_IDS[1]
+    sample_card_payload = protocol_codec.PREBUILT_CARD_PAYLOADS_BY_CARD_ID[sample_card_id]
+    sample_offer_packet = protocol_codec.encode_offer_packet(40000, "Benchmark Dealer")
+    sample_extended_offer_packet = protocol_codec.encode_extended_offer_packet(40000, "Benchmark Dealer", 12, 512)
+    sample_request_packet = protocol_codec.encode_request_packet(10, "Benchmark Team", consts.MESSAGE_TYPE_CONTINUABLE_GAME_REQUEST)
+    sample_multiplexed_request_packet = protocol_codec.encode_multiplexed_request_packet(10, "Benchmark Team", 8)
+    sample_decision_packet = protocol_codec.encode_client_decision(protocol_codec.PLAYER_DECISION_HIT)
+    sample_multiplexed_decision_packet = protocol_codec.PREBUILT_MULTIPLEXED_DECISION_PAYLOADS[3][protocol_codec.PLAYER_DECISION_STAND]
+    sample_multiplexed_card_payload = protocol_codec.PREBUILT_MULTIPLEXED_CARD_PAYLOADS[3][sample_card_id]
+
+    return [
+        ("codec.encode_offer_packet", lambda: protocol_codec.encode_offer_packet(40000, "Benchmark Dealer")),
+        ("codec.encode_extended_offer_packet", lambda: protocol_codec.encode_extended_offer_packet(40000, "Benchmark Dealer", 12, 512)),
+        ("codec.encode_request_packet", lambda: protocol_codec.encode_request_packet(10, "Benchmark Team")),
+        ("codec.encode_multiplexed_request_packet", lambda: protocol_codec.encode_multiplexed_request_packet(10, "Benchmark Team", 8)),
+        ("codec.encode_client_decision", lambda: protocol_codec.encode_client_decision(protocol_codec.PLAYER_DECISION_HIT)),
+        ("codec.prebuilt_card_payload", lambda: protocol_codec.PREBUILT_CARD_PAYLOADS_BY_CARD_ID[sample_card_id]),
+        ("codec.prebuilt_multiplexed_card_payload", lambda: protocol_codec.PREBUILT_MULTIPLEXED_CARD_PAYLOADS[3][sample_card_id]),
+        ("codec.decode_offer_packet", lambda: protocol_codec.decode_offer_packet(sample_offer_packet)),
+        ("codec.decode_extended_offer_packet", lambda: protocol_codec.decode_extended_offer_packet(sample_extended_offer_packet)),
+        ("codec.decode_request_packet", lambda: protocol_codec.decode_request_packet(sample_request_packet)),
+        ("codec.decode_multiplexed_request_trailer", lambda: protocol_codec.decode_multiplexed_request_trailer(
+            sample_multiplexed_request_packet, protocol_codec.REQUEST_PACKET_SIZE
+        )),
+        ("codec.decode_client_decision", lambda: protocol_codec.decode_client_decision(sample_decision_packet)),
+        ("codec.decode_multiplexed_client_decision", lambda: protocol_codec.decode_multiplexed_client_decision(sample_multiplexed_decision_packet)),
+        ("codec.decode_server_payload", lambda: protocol_codec.decode_server_payload(sample_card_payload)),
+        ("codec.decode_multiplexed_server_payload", lambda: protocol_codec.decode_multiplexed_server_payload(sample_multiplexed_card_payload)),
+        # 64 decisions arrive in one recv, most reads come straight from the buffer
+        ("frame_reader.client_decision_pipelined",
+         BufferedFrameReader(LoopingByteSource(sample_decision_packet * 64, consts.NETWORK_BUFFER_SIZE_IN_BYTES)).read_client_decision),
+        # Every payload is split over three recv calls, the worst case TCP may hand us
+        ("frame_reader.server_payload_split",
+         BufferedFrameReader(LoopingByteSource(sample_card_payload * 64, 4)).read_server_payload),
+    ]
+
+
+def run_micro_benchmarks(repeat_count):
+    micro_results = {}
+    for benchmark_name, benchmarked_callable in build_hand_scoring_benchmarks() + build_packet_codec_benchmarks():
+        micro_results[benchmark_name] = {"ns_per_call": round(time_per_call(benchmarked_callable, repeat_count), 1)}
+        print(f"{benchmark_name:44s} {micro_results[benchmark_name]['ns_per_call']:12.1f} ns/call")
+    return micro_results
+
+
+def run_loopback_benchmark(session_count, rounds_per_session):
+    """
+    A fresh Server, sized so that every session is admitted at once, serving its real
+    accept loop (worker pool, deadlines) on a loopback port. Every scripted player plays
+    rounds_per_session rounds; latency is measured per round, from the previous verdict
+    to the next one.
+    """
+    game_server = Server(max_concurrent_sessions=max(session_count, consts.DEFAULT_MAX_CONCURRENT_SESSIONS), max_pending_handshakes_per_ip=0)
+    loopback_listener_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    loopback_listener_socket.bind(("127.0.0.1", 0))
+    loopback_listener_socket.listen(consts.TCP_LISTENER_BACKLOG_SIZE)
+    # The listener stays open until we exit, a closed one would make the accept loop spin
+    game_server.tcp_connection_listener_socket = loopback_listener_socket
+    threading.Thread(target=game_server.accept_client_connections_forever, name="benchmark-accept", daemon=True).start()
+
+    server_address = loopback_listener_socket.getsockname()
+    per_session_samples = [[] for _ in range(session_count)]
+    session_threads = [
+        threading.Thread(target=play_scripted_session, args=(server_address, rounds_per_session, session_samples), daemon=True)
+        for session_samples in per_session_samples
+    ]
+
+    benchmark_started_at = time.perf_counter()
+    for session_thread in session_threads:
+        session_thread.start()
+    for session_thread in session_threads:
+        session_thread.join()
+    elapsed_seconds = time.perf_counter() - benchmark_started_at
+
+    all_round_latencies = [latency for session_samples in per_session_samples for latency in session_samples]
+    latency_summary = summarize_latency_samples(all_round_latencies)
+    return {
+        "sessions": session_count,
+        "rounds": latency_summary["count"],
+        "rounds_expected": session_count * rounds_per_session,
+        "elapsed_seconds": round(elapsed_seconds, 3),
+        "rounds_per_second": round(latency_summary["count"] / elapsed_seconds, 1) if elapsed_seconds else 0.0,
+        "p50_ms": round(latency_summary["p50"] * 1000, 3),
+        "p90_ms": round(latency_summary["p90"] * 1000, 3),
+        "p99_ms": round(latency_summary["p99"] * 1000, 3),
+        "max_ms": round(latency_summary["max"] * 1000, 3),
+    }
+
+
+def run_end_to_end_benchmarks(concurrency_levels, rounds_per_session):
+    # 1000 players are 2000 sockets in this one process
+    raise_open_file_limit_to_maximum()
+    end_to_end_results = {}
+    for session_count in concurrency_levels:
+        benchmark_name = f"e2e.loopback.{session_count}_sessions"
+        level_rounds_per_session = min(max(rounds_per_session, MIN_ROUNDS_PER_END_TO_END_RUN // session_count), MAX_ROUNDS_PER_REQUEST)
+        end_to_end_results[benchmark_name] = run_loopback_benchmark(session_count, level_rounds_per_session)
+        level_result = end_to_end_results[benchmark_name]
+        print(
+            f"{benchmark_name:44s} {level_result['rounds_per_second']:9.1f} rounds/s  "
+            f"p50={level_result['p50_ms']:.3f}ms p90={level_result['p90_ms']:.3f}ms p99={level_result['p99_ms']:.3f}ms "
+            f"({level_result['rounds']}/{level_result['rounds_expected']} rounds)"
+        )
+    return end_to_end_results
+
+
+def compare_against_baseline(benchmark_results, baseline_results, tolerance):
+    """
+    Returns (benchmark name, metric, baseline value, new value, relative change) for every
+    metric that got worse by more than tolerance (0.15 = 15%).
+    """
+    regressions = []
+    for benchmark_name, new_metrics in sorted(benchmark_results.items()):
+        baseline_metrics = baseline_results.get(benchmark_name)
+        if baseline_metrics is None:
+            continue
+        for metric_name, metric_direction in COMPARED_METRIC_DIRECTIONS.items():
+            baseline_value = baseline_metrics.get(metric_name)
+            new_value = new_metrics.get(metric_name)
+            if not baseline_value or new_value is None:
+                continue
+            relative_change = (new_value - baseline_value) / baseline_value
+            got_worse_by = relative_change if metric_direction == LOWER_IS_BETTER else -relative_change
+            if got_worse_by > tolerance:
+                regressions.append((benchmark_name, metric_name, baseline_value, new_value, relative_change))
+    return regressions
+
+
+def write_json_report(report_path, benchmark_report):
+    with open(report_path, "w", encoding="utf-8") as report_file:
+        json.dump(benchmark_report, report_file, indent=2, sort_keys=True)
+        report_file.write("\n")
+
+
+def parse_command_line_arguments():
+    argument_parser = argparse.ArgumentParser(description="Micro and end-to-end benchmarks for the game hot paths")
+    argument_parser.add_argument("--only", choices=("micro", "e2e"), default=None, help="run just one of the two groups")
+    argument_parser.add_argument("--repeat", type=int, default=5, help="timeit repetitions per micro benchmark (best one counts)")
+    argument_parser.add_argument("--rounds", type=int, default=50, help="rounds per scripted player in the e2e runs")
+    argument_parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=list(DEFAULT_CONCURRENCY_LEVELS),
+        help="concurrent sessions for each e2e run (default: 1 100 1000)"
+    )
+    argument_parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    argument_parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="baseline JSON to compare against")
+    argument_parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline instead of comparing")
+    argument_parser.add_argument(
+        "--tolerance", type=float, default=0.15,
+        help="relative slowdown allowed before a metric counts as a regression (default: 0.15)"
+    )
+    return argument_parser.parse_args()
+
+
+def main():
+    command_line_arguments = parse_command_line_arguments()
+    # Only warnings from the server, per-session INFO lines would just be noise here
+    game_logging.configure_server_logging("WARNING")
+
+    benchmark_results = {}
+    if command_line_arguments.only in (None, "micro"):
+        benchmark_results.update(run_micro_benchmarks(command_line_arguments.repeat))
+    if command_line_arguments.only in (None, "e2e"):
+        benchmark_results.update(run_end_to_end_benchmarks(command_line_arguments.concurrency, command_line_arguments.rounds))
+
+    benchmark_report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": benchmark_results,
+    }
+    if command_line_arguments.output:
+        write_json_report(command_line_arguments.output, benchmark_report)
+
+    if command_line_arguments.save_baseline:
+        write_json_report(command_line_arguments.baseline, benchmark_report)
+        print(f"Baseline saved to {command_line_arguments.baseline}")
+        return 0
+
+    if not os.path.exists(command_line_arguments.baseline):
+        print(f"No baseline at {command_line_arguments.baseline}, run with --save-baseline to record one")
+        return 0
+
+    with open(command_line_arguments.baseline, encoding="utf-8") as baseline_file:
+        baseline_results = json.load(baseline_file)["results"]
+    regressions = compare_against_baseline(benchmark_results, baseline_results, command_line_arguments.tolerance)
+    if not regressions:
+        print(f"No regressions against {command_line_arguments.baseline} (tolerance {command_line_arguments.tolerance:.0%})")
+        return 0
+
+    print(f"{len(regressions)} regression(s) against {command_line_arguments.baseline}:")
+    for benchmark_name, metric_name, baseline_value, new_value, relative_change in regressions:
+        print(f"  {benchmark_name} {metric_name}: {baseline_value} -> {new_value} ({relative_change:+.1%})")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
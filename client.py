@@ -1,78 +1,127 @@
+import argparse
 import socket
-import struct
+import time
 import consts
+import decision_policies
+import protocol_codec
+from frame_reader import BufferedFrameReader
+from offer_discovery import OfferDiscoveryCache
 
 class Client:
-    def __init__(self):
+    def __init__(self, decision_policy=None, rounds_per_session=None, player_display_name=None, is_output_quiet=False,
+                 offer_collection_window_seconds=consts.OFFER_COLLECTION_WINDOW_IN_SECONDS, use_session_continuation=True,
+                 multiplexed_table_count=1, decision_advisor=None):
         """
         Initializing the client state variables.
+        Passing a decision_policy turns this into a headless bot: no input() prompts,
+        the policy answers every Hit/Stand question (see decision_policies.py).
+        Offers are gathered by a discovery cache that lives as long as the client
+        (see offer_discovery.py), so we can pick the least busy server.
+        With use_session_continuation we ask the server to keep the connection open
+        after a batch, so the next batch skips discovery and the TCP handshake.
+        A bot with multiplexed_table_count > 1 plays that many tables at once over a
+        single connection instead (rounds_per_session rounds on each table).
+        A decision_advisor (any policy, typically the table from basic_strategy.py) only
+        suggests a move to the human player before each Hit/Stand prompt.
         """
         self.target_server_ip = None
         self.target_server_port = None
         self.base_team_name_string = "Festigal Fantasia" 
-        self.udp_listening_socket = None
+        self.offer_discovery_cache = OfferDiscoveryCache(offer_collection_window_seconds)
         self.tcp_game_socket = None
+        self.server_payload_reader = None
         self.cards_currently_held = []
-        self.full_player_display_name = ""
-        self.number_of_rounds_requested = 0
+        self.full_player_display_name = player_display_name or ""
+        self.number_of_rounds_requested = rounds_per_session or 0
+        self.decision_policy = decision_policy
+        self.decision_advisor = decision_advisor
+        self.is_output_quiet = is_output_quiet
+        self.dealer_visible_card_points = 0
+        self.is_session_continuation_enabled = use_session_continuation
+        # Servers that hung up on a continuable request (older versions), they get plain 0x3
+        self.servers_without_continuation = set()
+        self.has_received_payload_in_last_session = False
+        # Set when the server answered with the busy notice instead of a game
+        self.was_turned_away_as_busy = False
+        self.multiplexed_table_count = multiplexed_table_count
+
+        # Numbers about the last session, read by the load generator
+        self.connect_latency_seconds = None
+        self.decision_sent_at = None
+        self.decision_latency_samples = []
+        self.rounds_completed_in_last_session = 0
+        self.wins_in_last_session = 0
+        self.last_session_error = None
+
+    def display_message(self, message_text):
+        """Every line of output goes through here so bots can run silently."""
+        if not self.is_output_quiet:
+            print(message_text)
+
+    def is_headless(self):
+        return self.decision_policy is not None
 
     def start_client(self):
         """
         This is where it all begins. We get the name once, then loop forever looking for games.
         """
-        self.prompt_user_for_identification()
+        if not self.full_player_display_name:
+            self.prompt_user_for_identification()
 
         while True:
             # We ask for rounds count inside the loop now per new instructions
-            self.prompt_user_for_desired_rounds()
+            # (bots were told how many rounds to play up front)
+            if not self.is_headless():
+                self.prompt_user_for_desired_rounds()
 
-            print("Client started, listening for offer requests...")
-            
-            self.udp_listening_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            try:
-                # Need REUSEPORT to allow multiple clients on one machine if needed
-                self.udp_listening_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
-            except AttributeError:
-                # Fallback for Windows which uses REUSEADDR
-                self.udp_listening_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-                
-            self.udp_listening_socket.bind(("", consts.LISTENING_UDP_PORT_FOR_CLIENT_DISCOVERY))
+            # A connection kept from the last batch goes straight into the next one
+            if self.tcp_game_socket is not None and self.establish_tcp_connection_and_start_session():
+                continue
 
-            # Infinite loop to catch a valid offer packet
-            while True:
-                raw_udp_data, sender_address_tuple = self.udp_listening_socket.recvfrom(consts.NETWORK_BUFFER_SIZE_IN_BYTES)
-                
-                try:
-                    # Unpack the offer to see if it's legit
-                    unpacked_offer = struct.unpack(consts.STRUCT_PACKING_FORMAT_FOR_OFFER, raw_udp_data)
-                    cookie_val = unpacked_offer[0]
-                    msg_type_val = unpacked_offer[1]
-                    server_tcp_port = unpacked_offer[2]
-                    server_name_bytes = unpacked_offer[3]
-
-                    if cookie_val != consts.PROTOCOL_MAGIC_COOKIE_IDENTIFIER or msg_type_val != consts.MESSAGE_TYPE_OFFER_ANNOUNCEMENT:
-                        continue
-                    
-                    self.target_server_ip = sender_address_tuple[0]
-                    self.target_server_port = server_tcp_port
-                    decoded_server_name = server_name_bytes.decode('utf-8').strip('\x00')
-                    
-                    print(f"Received offer from {self.target_server_ip} ({decoded_server_name}), attempting to connect...")
+            # Best candidate first; if it refuses the connection we move down the list
+            for candidate_offer in self.wait_for_server_offer():
+                self.target_server_ip = candidate_offer.server_ip
+                self.target_server_port = candidate_offer.tcp_port
+
+                # Move on to the TCP part
+                if self.multiplexed_table_count > 1:
+                    has_session_started = self.play_multiplexed_session_against(
+                        candidate_offer.server_ip, candidate_offer.tcp_port, self.multiplexed_table_count
+                    )
+                else:
+                    has_session_started = self.establish_tcp_connection_and_start_session()
+                if has_session_started:
                     break
-                except Exception:
-                    continue
-            
-            # Close UDP since we found our match
-            self.udp_listening_socket.close()
-            
-            # Move on to the TCP part
-            self.establish_tcp_connection_and_start_session()
+
+                self.offer_discovery_cache.forget_server(candidate_offer)
+                self.display_message("Trying the next server...")
+
+    def wait_for_server_offer(self):
+        """
+        Blocks until at least one valid UDP offer is known, points us at the least
+        loaded server and returns every candidate (best first) for falling back.
+        """
+        self.display_message("Client started, listening for offer requests...")
+
+        candidate_offers = self.offer_discovery_cache.find_candidate_servers()
+        best_offer = candidate_offers[0]
+        self.target_server_ip = best_offer.server_ip
+        self.target_server_port = best_offer.tcp_port
+
+        if best_offer.has_load_information():
+            self.display_message(
+                f"Received offer from {best_offer.server_ip} ({best_offer.server_name}, {best_offer.active_session_count} players), "
+                f"attempting to connect..."
+            )
+        else:
+            self.display_message(f"Received offer from {best_offer.server_ip} ({best_offer.server_name}), attempting to connect...")
+        return candidate_offers
 
     def prompt_user_for_identification(self):
         """Simple input for the name suffix."""
         id_suffix = input("Enter player number (e.g. 1, 2): ")
         self.full_player_display_name = f"{self.base_team_name_string} {id_suffix}"
-        print(f"Playing as: {self.full_player_display_name}")
+        self.display_message(f"Playing as: {self.full_player_display_name}")
 
     def prompt_user_for_desired_rounds(self):
         """Ensures we get a valid integer for rounds."""
@@ -81,38 +130,239 @@ class Client:
             if user_input_str.isdigit() and int(user_input_str) > 0:
                 self.number_of_rounds_requested = int(user_input_str)
                 break
-            print("Invalid input, please enter a number > 0.")
+            self.display_message("Invalid input, please enter a number > 0.")
+
+    def play_session_against(self, server_ip, server_port):
+        """
+        Skips discovery and plays one session against a known server (used by the load generator).
+        """
+        self.target_server_ip = server_ip
+        self.target_server_port = server_port
+        self.establish_tcp_connection_and_start_session()
+        # Nobody is going to ask for another batch, don't leave the server waiting for one
+        self.close_game_connection()
+
+    def play_multiplexed_session_against(self, server_ip, server_port, table_count):
+        """
+        Bot only: plays rounds_per_session rounds on each of table_count tables over one
+        connection, every table answered by the decision policy. The session statistics
+        (rounds, wins, latencies) cover all tables together. Returns False if we could
+        not connect.
+        """
+        self.target_server_ip = server_ip
+        self.target_server_port = server_port
+        self.connect_latency_seconds = None
+        self.decision_sent_at = None
+        self.decision_latency_samples = []
+        self.rounds_completed_in_last_session = 0
+        self.wins_in_last_session = 0
+        self.last_session_error = None
+        self.was_turned_away_as_busy = False
 
-    def establish_tcp_connection_and_start_session(self):
         try:
             self.tcp_game_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            # 10 minutes timeout to allow human thinking time
-            self.tcp_game_socket.settimeout(600) 
-            self.tcp_game_socket.connect((self.target_server_ip, self.target_server_port))
+            self.tcp_game_socket.settimeout(600)
+            connect_started_at = time.perf_counter()
+            self.tcp_game_socket.connect((server_ip, server_port))
+            self.connect_latency_seconds = time.perf_counter() - connect_started_at
+            self.server_payload_reader = BufferedFrameReader(self.tcp_game_socket)
+
+            self.tcp_game_socket.sendall(protocol_codec.encode_multiplexed_request_packet(
+                self.number_of_rounds_requested,
+                self.full_player_display_name,
+                table_count
+            ))
+            # A full server answers with one standard sized busy notice, not a multiplexed payload
+            if self.server_payload_reader.peek_packet_type() == consts.MESSAGE_TYPE_SERVER_BUSY:
+                self.report_server_busy()
+            else:
+                self.run_multiplexed_tables(table_count)
+
+        except socket.timeout:
+            self.last_session_error = "Connection timed out."
+            self.display_message("Connection timed out.")
+        except Exception as conn_error:
+            self.last_session_error = f"Error in multiplexed session: {conn_error}"
+            self.display_message(f"Error in multiplexed session: {conn_error}")
+        finally:
+            self.close_game_connection()
+
+        return self.connect_latency_seconds is not None and not self.was_turned_away_as_busy
+
+    def report_server_busy(self):
+        self.was_turned_away_as_busy = True
+        self.last_session_error = "Server busy"
+        self.display_message("The server is full right now.")
+
+    def run_multiplexed_tables(self, table_count):
+        """
+        Tracks every table's hand from the tagged payloads. Decisions are collected while
+        more payloads are already buffered and then sent together in one write.
+        """
+        player_points_by_table = [0] * table_count
+        player_card_count_by_table = [0] * table_count
+        dealer_visible_points_by_table = [0] * table_count
+        is_player_turn_by_table = [True] * table_count
+        pending_decision_packets = []
+        rounds_left_to_play = table_count * self.number_of_rounds_requested
+
+        while rounds_left_to_play:
+            if pending_decision_packets and self.server_payload_reader.buffered_byte_count() < protocol_codec.MULTIPLEXED_SERVER_PAYLOAD_SIZE:
+                self.tcp_game_socket.sendall(b"".join(pending_decision_packets))
+                pending_decision_packets.clear()
+                self.decision_sent_at = time.perf_counter()
+
+            unpacked_payload = self.server_payload_reader.read_multiplexed_server_payload()
+            if unpacked_payload is None:
+                self.last_session_error = "Server closed the connection before all tables finished"
+                break
+
+            if self.decision_sent_at is not None:
+                self.decision_latency_samples.append(time.perf_counter() - self.decision_sent_at)
+                self.decision_sent_at = None
+
+            payload_cookie, payload_type, table_id, payload_result, card_rank_val, card_suit_val = unpacked_payload
+            if payload_cookie != consts.PROTOCOL_MAGIC_COOKIE_IDENTIFIER or payload_type != consts.MESSAGE_TYPE_MULTIPLEXED_GAME_PAYLOAD or table_id >= table_count:
+                self.last_session_error = "Invalid packet received"
+                break
+
+            if payload_result != consts.GAME_RESULT_INDICATOR_ROUND_STILL_ACTIVE:
+                rounds_left_to_play -= 1
+                self.rounds_completed_in_last_session += 1
+                if payload_result == consts.GAME_RESULT_INDICATOR_PLAYER_WIN:
+                    self.wins_in_last_session += 1
+                player_points_by_table[table_id] = 0
+                player_card_count_by_table[table_id] = 0
+                dealer_visible_points_by_table[table_id] = 0
+                is_player_turn_by_table[table_id] = True
+                continue
+
+            card_points = self.calculate_current_hand_points([(card_rank_val, card_suit_val)])
+            if player_card_count_by_table[table_id] < 2 or (is_player_turn_by_table[table_id] and dealer_visible_points_by_table[table_id]):
+                # The player's first two cards, or a card we asked for
+                player_points_by_table[table_id] += card_points
+                player_card_count_by_table[table_id] += 1
+                if not dealer_visible_points_by_table[table_id]:
+                    continue
+            elif not dealer_visible_points_by_table[table_id]:
+                dealer_visible_points_by_table[table_id] = card_points
+            else:
+                # Dealer's cards after we stood, only the verdict matters to us
+                continue
+
+            # A bust needs no answer, the verdict is already on its way
+            if player_points_by_table[table_id] > 21:
+                continue
+
+            policy_action = self.decision_policy.choose_action(player_points_by_table[table_id], dealer_visible_points_by_table[table_id])
+            if policy_action == decision_policies.PLAYER_ACTION_HIT:
+                pending_decision_packets.append(protocol_codec.PREBUILT_MULTIPLEXED_DECISION_PAYLOADS[table_id][protocol_codec.PLAYER_DECISION_HIT])
+            else:
+                pending_decision_packets.append(protocol_codec.PREBUILT_MULTIPLEXED_DECISION_PAYLOADS[table_id][protocol_codec.PLAYER_DECISION_STAND])
+                is_player_turn_by_table[table_id] = False
+
+        self.display_message(
+            f"Finished {self.rounds_completed_in_last_session} rounds on {table_count} tables. "
+            f"Win rate: {self.wins_in_last_session}/{self.rounds_completed_in_last_session}"
+        )
+
+    def close_game_connection(self):
+        if self.tcp_game_socket:
+            self.tcp_game_socket.close()
+            self.tcp_game_socket = None
+
+    def choose_request_message_type(self):
+        if self.is_session_continuation_enabled and (self.target_server_ip, self.target_server_port) not in self.servers_without_continuation:
+            return consts.MESSAGE_TYPE_CONTINUABLE_GAME_REQUEST
+        return consts.MESSAGE_TYPE_GAME_REQUEST
+
+    def establish_tcp_connection_and_start_session(self):
+        """
+        Plays one session against target_server_ip/port, on the connection kept from
+        the previous batch if there is one. Returns False when no session could be
+        started (connect failed, the kept connection was gone, or the server was
+        busy), so the caller can look for another server.
+        """
+        self.connect_latency_seconds = None
+        self.decision_sent_at = None
+        self.decision_latency_samples = []
+        self.rounds_completed_in_last_session = 0
+        self.wins_in_last_session = 0
+        self.last_session_error = None
+        self.has_received_payload_in_last_session = False
+        self.was_turned_away_as_busy = False
+
+        is_reusing_connection = self.tcp_game_socket is not None
+        has_session_started = False
+        should_keep_connection = False
+        should_retry_without_continuation = False
+
+        try:
+            if not is_reusing_connection:
+                self.tcp_game_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                # 10 minutes timeout to allow human thinking time
+                self.tcp_game_socket.settimeout(600) 
+                connect_started_at = time.perf_counter()
+                self.tcp_game_socket.connect((self.target_server_ip, self.target_server_port))
+                self.connect_latency_seconds = time.perf_counter() - connect_started_at
+                self.server_payload_reader = BufferedFrameReader(self.tcp_game_socket)
+                has_session_started = True
             
             # Wipe the hand clean for a fresh start
             self.cards_currently_held = [] 
             
             # Build the request packet
-            binary_request_packet = struct.pack(
-                consts.STRUCT_PACKING_FORMAT_FOR_REQUEST,
-                consts.PROTOCOL_MAGIC_COOKIE_IDENTIFIER,
-                consts.MESSAGE_TYPE_GAME_REQUEST,
+            request_message_type = self.choose_request_message_type()
+            binary_request_packet = protocol_codec.encode_request_packet(
                 self.number_of_rounds_requested,
-                self.full_player_display_name.encode('utf-8').ljust(32, b'\0')
+                self.full_player_display_name,
+                request_message_type
             )
             self.tcp_game_socket.sendall(binary_request_packet)
             
             self.main_gameplay_execution_loop()
+
+            if is_reusing_connection:
+                # The server may have let our idle connection go in the meantime
+                has_session_started = self.has_received_payload_in_last_session
+            elif (
+                not self.has_received_payload_in_last_session
+                and request_message_type == consts.MESSAGE_TYPE_CONTINUABLE_GAME_REQUEST
+                and self.last_session_error is None
+                and not self.was_turned_away_as_busy
+            ):
+                # An older server does not know the continuable request and hangs up right away, cleanly.
+                # A busy notice, a timeout or a reset says nothing about continuation, so those never count.
+                self.servers_without_continuation.add((self.target_server_ip, self.target_server_port))
+                should_retry_without_continuation = True
+
+            if self.was_turned_away_as_busy:
+                has_session_started = False
+
+            should_keep_connection = (
+                request_message_type == consts.MESSAGE_TYPE_CONTINUABLE_GAME_REQUEST
+                and self.last_session_error is None
+                and self.rounds_completed_in_last_session == self.number_of_rounds_requested
+            )
             
         except socket.timeout:
-            print("Connection timed out.")
+            self.last_session_error = "Connection timed out."
+            self.display_message("Connection timed out.")
         except Exception as conn_error:
-            print(f"Error connecting to server: {conn_error}")
+            self.last_session_error = f"Error connecting to server: {conn_error}"
+            self.display_message(f"Error connecting to server: {conn_error}")
         finally:
-            if self.tcp_game_socket:
-                self.tcp_game_socket.close()
-                self.tcp_game_socket = None
+            if not should_keep_connection:
+                self.close_game_connection()
+
+        if should_retry_without_continuation:
+            return self.establish_tcp_connection_and_start_session()
+
+        if should_keep_connection:
+            self.display_message("Keeping the connection open for the next batch...\n")
+        elif has_session_started:
+            self.display_message("Closing connection and looking for a new server...\n")
+        return has_session_started
 
     def main_gameplay_execution_loop(self):
         total_wins_counter = 0
@@ -124,20 +374,27 @@ class Client:
 
         while rounds_completed_counter < self.number_of_rounds_requested:
             try:
-                incoming_payload = self.tcp_game_socket.recv(struct.calcsize(consts.STRUCT_PACKING_FORMAT_FOR_SERVER_PAYLOAD))
-                if not incoming_payload: 
+                # Always a whole packet, even if TCP split it or glued several together
+                unpacked_payload = self.server_payload_reader.read_server_payload()
+                if unpacked_payload is None: 
                     break
+                self.has_received_payload_in_last_session = True
                 
+                # Time from our last Hit/Stand until the server answered
+                if self.decision_sent_at is not None:
+                    self.decision_latency_samples.append(time.perf_counter() - self.decision_sent_at)
+                    self.decision_sent_at = None
+
                 # Unpacking the server's message
-                unpacked_payload = struct.unpack(consts.STRUCT_PACKING_FORMAT_FOR_SERVER_PAYLOAD, incoming_payload)
-                payload_cookie = unpacked_payload[0]
-                payload_type = unpacked_payload[1]
-                payload_result = unpacked_payload[2]
-                card_rank_val = unpacked_payload[3]
-                card_suit_val = unpacked_payload[4]
+                payload_cookie, payload_type, payload_result, card_rank_val, card_suit_val = unpacked_payload
                 
+                if payload_cookie == consts.PROTOCOL_MAGIC_COOKIE_IDENTIFIER and payload_type == consts.MESSAGE_TYPE_SERVER_BUSY:
+                    self.report_server_busy()
+                    break
+
                 if payload_cookie != consts.PROTOCOL_MAGIC_COOKIE_IDENTIFIER or payload_type != consts.MESSAGE_TYPE_GAME_PAYLOAD:
-                    print("Error: Invalid packet received")
+                    self.display_message("Error: Invalid packet received")
+                    self.last_session_error = "Invalid packet received"
                     break
 
                 if payload_result == consts.GAME_RESULT_INDICATOR_ROUND_STILL_ACTIVE:
@@ -146,92 +403,105 @@ class Client:
                     if is_it_my_turn:
                         # Case 1: Initial deal (first two cards are mine)
                         if len(self.cards_currently_held) < 2:
-                            print(f"Got card: {formatted_card_string}")
+                            self.display_message(f"Got card: {formatted_card_string}")
                             self.cards_currently_held.append((card_rank_val, card_suit_val))
                         
                         # Case 2: I have 2 cards, so this next one must be the dealer's visible card
                         elif not has_dealer_visible_card_been_shown:
-                            print(f"Dealer's Face-Up Card: {formatted_card_string}")
+                            self.display_message(f"Dealer's Face-Up Card: {formatted_card_string}")
                             has_dealer_visible_card_been_shown = True
+                            self.dealer_visible_card_points = self.calculate_current_hand_points([(card_rank_val, card_suit_val)])
                             
                             # Only NOW do we ask the user what to do
                             user_decision = self.get_player_decision_input()
                             if user_decision == 'stand':
                                 is_it_my_turn = False 
-                                print("Waiting for dealer's move...")
+                                self.display_message("Waiting for dealer's move...")
                         
                         # Case 3: Normal hit during the game
                         else:
-                            print(f"Got card: {formatted_card_string}")
+                            self.display_message(f"Got card: {formatted_card_string}")
                             self.cards_currently_held.append((card_rank_val, card_suit_val))
                             
                             user_decision = self.get_player_decision_input()
                             if user_decision == 'stand':
                                 is_it_my_turn = False 
-                                print("Waiting for dealer's move...")
+                                self.display_message("Waiting for dealer's move...")
 
                     else:
                         # If it's not my turn, the server is sending me dealer's cards
-                        print(f"Dealer played: {formatted_card_string}")
+                        self.display_message(f"Dealer played: {formatted_card_string}")
 
                 else: 
                     # This means the round is over
                     rounds_completed_counter += 1
                     
                     if payload_result == consts.GAME_RESULT_INDICATOR_PLAYER_WIN:
-                        print("### YOU WON! ###")
+                        self.display_message("### YOU WON! ###")
                         total_wins_counter += 1
                     elif payload_result == consts.GAME_RESULT_INDICATOR_PLAYER_LOSS:
-                        print("### YOU LOST... ###")
+                        self.display_message("### YOU LOST... ###")
                     else:
-                        print("### IT'S A TIE ###")
+                        self.display_message("### IT'S A TIE ###")
                     
-                    print("-" * 30)
+                    self.display_message("-" * 30)
                     # Prepare for next round
                     self.cards_currently_held = [] 
                     is_it_my_turn = True 
                     has_dealer_visible_card_been_shown = False # Reset flag
 
             except socket.timeout:
-                print("Server stopped responding (Timeout).")
+                self.display_message("Server stopped responding (Timeout).")
+                self.last_session_error = "Server stopped responding (Timeout)."
                 break
             except Exception as game_error:
-                print(f"Game error: {game_error}")
+                self.display_message(f"Game error: {game_error}")
+                self.last_session_error = f"Game error: {game_error}"
                 break
         
-        print(f"Finished playing {rounds_completed_counter} rounds. Win rate: {total_wins_counter}/{rounds_completed_counter}")
-        print("Closing connection and looking for a new server...\n")
+        self.rounds_completed_in_last_session = rounds_completed_counter
+        self.wins_in_last_session = total_wins_counter
+        self.display_message(f"Finished playing {rounds_completed_counter} rounds. Win rate: {total_wins_counter}/{rounds_completed_counter}")
 
     def get_player_decision_input(self):
         """
         Logic to handle Hit or Stand input, including auto-bust detection.
         """
         current_hand_value = self.calculate_current_hand_points(self.cards_currently_held)
-        print(f"Your hand value: {current_hand_value}")
+        self.display_message(f"Your hand value: {current_hand_value}")
         
         # If we have 22 (double ace) or more, we bust immediately.
         if current_hand_value > 21:
             return 'bust'
 
+        # Headless mode: the policy decides, no prompt
+        if self.is_headless():
+            policy_action = self.decision_policy.choose_action(current_hand_value, self.dealer_visible_card_points)
+            if policy_action == decision_policies.PLAYER_ACTION_HIT:
+                self.transmit_decision_packet(protocol_codec.PLAYER_DECISION_HIT)
+            else:
+                self.transmit_decision_packet(protocol_codec.PLAYER_DECISION_STAND)
+            return policy_action
+
+        if self.decision_advisor is not None:
+            advised_action = self.decision_advisor.choose_action(current_hand_value, self.dealer_visible_card_points)
+            self.display_message(f"Advisor suggests: {advised_action}")
+
         while True:
             raw_input = input("Choose action: (h)it or (s)tand? ").lower()
             if raw_input in ['h', 'hit']:
-                self.transmit_decision_packet("Hittt")
+                self.transmit_decision_packet(protocol_codec.PLAYER_DECISION_HIT)
                 return 'hit'
             elif raw_input in ['s', 'stand']:
-                self.transmit_decision_packet("Stand")
+                self.transmit_decision_packet(protocol_codec.PLAYER_DECISION_STAND)
                 return 'stand'
             else:
-                print("Invalid input.")
+                self.display_message("Invalid input.")
 
     def transmit_decision_packet(self, action_string):
-        binary_decision_packet = struct.pack(
-            consts.STRUCT_PACKING_FORMAT_FOR_CLIENT_PAYLOAD,
-            consts.PROTOCOL_MAGIC_COOKIE_IDENTIFIER,
-            consts.MESSAGE_TYPE_GAME_PAYLOAD,
-            action_string.encode('utf-8')
-        )
-        self.tcp_game_socket.sendall(binary_decision_packet)
+        # Both decisions are prebuilt in the codec
+        self.tcp_game_socket.sendall(protocol_codec.encode_client_decision(action_string))
+        self.decision_sent_at = time.perf_counter()
 
     def calculate_current_hand_points(self, hand_list):
         current_score = 0
@@ -244,6 +514,55 @@ class Client:
                 current_score += r_val
         return current_score
 
+def parse_command_line_arguments():
+    argument_parser = argparse.ArgumentParser(description="Blackjack game client")
+    argument_parser.add_argument(
+        "--bot", metavar="POLICY", default=None,
+        help="play headless with a decision policy: threshold[:N], stand, random[:P] or table:PATH"
+    )
+    argument_parser.add_argument(
+        "--advisor", metavar="POLICY", default=None,
+        help="interactive mode: show what a policy would do before every prompt, e.g. table:basic_strategy.json"
+    )
+    argument_parser.add_argument("--rounds", type=int, default=10, help="rounds per session in bot mode (1-255)")
+    argument_parser.add_argument("--name", default=None, help="player name in bot mode")
+    argument_parser.add_argument(
+        "--discovery-window", type=float, default=consts.OFFER_COLLECTION_WINDOW_IN_SECONDS,
+        help="seconds to keep collecting offers after the first one, to pick the least loaded server"
+    )
+    argument_parser.add_argument(
+        "--tables", type=int, default=1,
+        help=f"bot mode only: play this many tables at once over one connection (1-{consts.MAX_MULTIPLEXED_TABLES_PER_CONNECTION})"
+    )
+    argument_parser.add_argument(
+        "--no-continuation", dest="use_session_continuation", action="store_false",
+        help="reconnect for every batch instead of asking the server to keep the connection open"
+    )
+    command_line_arguments = argument_parser.parse_args()
+    # The rounds field of the request packet is a single byte
+    if not 1 <= command_line_arguments.rounds <= 255:
+        argument_parser.error("--rounds must be between 1 and 255")
+    if not 1 <= command_line_arguments.tables <= consts.MAX_MULTIPLEXED_TABLES_PER_CONNECTION:
+        argument_parser.error(f"--tables must be between 1 and {consts.MAX_MULTIPLEXED_TABLES_PER_CONNECTION}")
+    if command_line_arguments.tables > 1 and not command_line_arguments.bot:
+        argument_parser.error("--tables needs --bot, nobody can type answers for several tables at once")
+    return command_line_arguments
+
 if __name__ == "__main__":
-    game_client_instance = Client()
+    command_line_arguments = parse_command_line_arguments()
+    if command_line_arguments.bot:
+        game_client_instance = Client(
+            decision_policy=decision_policies.build_decision_policy(command_line_arguments.bot),
+            rounds_per_session=command_line_arguments.rounds,
+            player_display_name=command_line_arguments.name or "Festigal Fantasia Bot",
+            offer_collection_window_seconds=command_line_arguments.discovery_window,
+            use_session_continuation=command_line_arguments.use_session_continuation,
+            multiplexed_table_count=command_line_arguments.tables
+        )
+    else:
+        game_client_instance = Client(
+            offer_collection_window_seconds=command_line_arguments.discovery_window,
+            use_session_continuation=command_line_arguments.use_session_continuation,
+            decision_advisor=decision_policies.build_decision_policy(command_line_arguments.advisor) if command_line_arguments.advisor else None
+        )
     game_client_instance.start_client()
\ No newline at end of file
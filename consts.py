@@ -15,6 +15,35 @@ PROTOCOL_MAGIC_COOKIE_IDENTIFIER = 0xabcddcba
 # Buffer size for receiving packets (in bytes)
 NETWORK_BUFFER_SIZE_IN_BYTES = 1024 
 
+# Deadline budgets for a connected client (see deadline_timer_wheel.py)
+# Time to send the request packet after we start serving the connection
+HANDSHAKE_DEADLINE_IN_SECONDS = 10
+
+# How long one Hit/Stand (or the next batch request) may take (10 mins, human thinking time)
+PLAYER_DECISION_DEADLINE_IN_SECONDS = 600
+
+# Upper bound on a whole session, continued batches included
+SESSION_DEADLINE_IN_SECONDS = 3600
+
+# Connections from one IP that may be waiting on their handshake at the same time (0 = no limit)
+MAX_PENDING_HANDSHAKES_PER_SOURCE_IP = 256
+
+# Resolution and size of the deadline timer wheel (one turn = 0.1s * 1024, about 100s)
+DEADLINE_TIMER_WHEEL_TICK_IN_SECONDS = 0.1
+DEADLINE_TIMER_WHEEL_SLOT_COUNT = 1024
+
+# Backlog for the TCP listener, large enough to absorb bursts of thousands of players joining at once
+TCP_LISTENER_BACKLOG_SIZE = 4096
+
+# How often the server shouts its offer over UDP (in seconds)
+OFFER_BROADCAST_INTERVAL_IN_SECONDS = 1
+
+# How long a client keeps listening for more offers after the first one, to compare servers
+OFFER_COLLECTION_WINDOW_IN_SECONDS = 0.3
+
+# A cached offer nobody repeated for this long is considered gone
+OFFER_CACHE_EXPIRY_IN_SECONDS = 5
+
 # Message Types
 
 # Identifier for the Server Offer packet (UDP)
@@ -26,12 +55,85 @@ MESSAGE_TYPE_GAME_REQUEST = 0x3
 # Identifier for Payload packets (Game moves/results)
 MESSAGE_TYPE_GAME_PAYLOAD = 0x4
 
+# Identifier for the optional load-aware offer (UDP), sent next to the standard offer.
+# Older clients only accept 0x2 packets of the standard size, so they simply ignore it.
+MESSAGE_TYPE_EXTENDED_OFFER_ANNOUNCEMENT = 0x5
+
+# Identifier for a Client Request (TCP) that also asks to keep the connection for more batches.
+# Same layout as 0x3. After the last verdict the server waits for another request on the same
+# connection instead of closing it; an older server rejects 0x6 and closes, so clients fall back to 0x3.
+MESSAGE_TYPE_CONTINUABLE_GAME_REQUEST = 0x6
+
+# Both request types a server accepts
+ACCEPTED_GAME_REQUEST_MESSAGE_TYPES = (MESSAGE_TYPE_GAME_REQUEST, MESSAGE_TYPE_CONTINUABLE_GAME_REQUEST)
+
+# Identifier for a multiplexed Client Request (TCP): many independent tables on one connection.
+# It is the standard request followed by one extra byte, the number of tables.
+MESSAGE_TYPE_MULTIPLEXED_GAME_REQUEST = 0x7
+
+# Identifier for multiplexed Payload packets, both directions; each one names its table
+MESSAGE_TYPE_MULTIPLEXED_GAME_PAYLOAD = 0x8
+
+# Every request type that may open a session
+ACCEPTED_SESSION_OPENING_MESSAGE_TYPES = ACCEPTED_GAME_REQUEST_MESSAGE_TYPES + (MESSAGE_TYPE_MULTIPLEXED_GAME_REQUEST,)
+
+# Upper bound on tables per multiplexed connection (each one holds its own shoe and hands)
+MAX_MULTIPLEXED_TABLES_PER_CONNECTION = 64
+
+# Identifier for the "server busy" notice (TCP): sent instead of the first payload when we are full,
+# right before hanging up. Standard payload layout with Result = 0 and Rank = seconds until a retry is worthwhile.
+# Older clients see an unknown payload type and end the session with "Invalid packet received".
+MESSAGE_TYPE_SERVER_BUSY = 0x9
+
+# Admission control: at most this many threaded sessions play at once per server process (CLI: --max-sessions)
+DEFAULT_MAX_CONCURRENT_SESSIONS = 512
+
+# The async engine's cap: an idle coroutine costs a few KB instead of a thread, so thousands of
+# sessions fit in one process; this only guards against running out of file descriptors
+DEFAULT_MAX_CONCURRENT_ASYNC_SESSIONS = 65536
+
+# Connections over the cap wait in a queue this long at most (CLI: --admission-queue)
+DEFAULT_ADMISSION_QUEUE_CAPACITY = 1024
+
+# ...and for at most this many seconds before they get the busy notice (CLI: --queue-deadline)
+DEFAULT_ADMISSION_QUEUE_DEADLINE_IN_SECONDS = 3
+
+# Retry hint carried in the busy notice
+SERVER_BUSY_RETRY_AFTER_IN_SECONDS = 1
+
+# Team standings (see team_leaderboard.py): independent locks the teams are spread over
+LEADERBOARD_SHARD_COUNT = 16
+
+# How often the standings are written to the --leaderboard-file (in seconds)
+DEFAULT_LEADERBOARD_SNAPSHOT_INTERVAL_IN_SECONDS = 30
+
+# Teams listed by GET /leaderboard unless ?top= asks for another number
+DEFAULT_LEADERBOARD_TOP_TEAM_COUNT = 10
+
+# Shared-dealer tables (see shared_tables.py): players seated at one dealer (CLI: --table-size, 1 = a private dealer each)
+DEFAULT_SHARED_TABLE_SIZE = 1
+
+# ...and at most this many, the seats of a real Blackjack table
+MAX_SHARED_TABLE_SIZE = 7
+
+# How often a seat waiting for the other players checks that its own player is still there
+SHARED_TABLE_SEAT_CHECK_INTERVAL_IN_SECONDS = 1
+
+# Profiling (see session_profiler.py): seconds between two stack samples of every thread
+DEFAULT_PROFILE_SAMPLE_INTERVAL_IN_SECONDS = 0.01
+
+# ...and the share of threaded sessions that run under cProfile in "cprofile" mode
+DEFAULT_PROFILED_SESSION_FRACTION = 0.1
+
 # Protocol Structure Formats (using struct library notation)
 # I = unsigned int (4 bytes), B = unsigned char (1 byte), H = unsigned short (2 bytes), s = string
 
 # Offer Packet Format: Cookie(4), Type(1), Port(2), Name(32)
 STRUCT_PACKING_FORMAT_FOR_OFFER = '>IBH32s' 
 
+# Extended Offer Packet Format: the standard offer + Active Sessions(2), Session Capacity(2, 0 = no stated limit)
+STRUCT_PACKING_FORMAT_FOR_EXTENDED_OFFER = '>IBH32sHH'
+
 # Request Packet Format: Cookie(4), Type(1), Rounds(1), Name(32)
 STRUCT_PACKING_FORMAT_FOR_REQUEST = '>IBB32s'
 
@@ -41,6 +143,15 @@ STRUCT_PACKING_FORMAT_FOR_CLIENT_PAYLOAD = '>IB5s'
 # Server Payload Format (Card/Result): Cookie(4), Type(1), Result(1), Rank(2), Suit(1)
 STRUCT_PACKING_FORMAT_FOR_SERVER_PAYLOAD = '>IBBHB' 
 
+# Multiplexed Request Format: Cookie(4), Type(1), Rounds per table(1), Name(32), Tables(1)
+STRUCT_PACKING_FORMAT_FOR_MULTIPLEXED_REQUEST = '>IBB32sB'
+
+# Multiplexed Client Payload Format: Cookie(4), Type(1), Table(1), Decision(5 chars)
+STRUCT_PACKING_FORMAT_FOR_MULTIPLEXED_CLIENT_PAYLOAD = '>IBB5s'
+
+# Multiplexed Server Payload Format: Cookie(4), Type(1), Table(1), Result(1), Rank(2), Suit(1)
+STRUCT_PACKING_FORMAT_FOR_MULTIPLEXED_SERVER_PAYLOAD = '>IBBBHB'
+
 # Game Logic Constants
 
 # Result codes indicating the state of the round
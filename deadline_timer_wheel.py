@@ -0,0 +1,268 @@
+"""
+deadline_timer_wheel.py
+Deadlines for player sessions without a timer (or a socket timeout) per connection.
+A HashedTimerWheel keeps every pending deadline in one of slot_count buckets, picked by
+the tick it expires on; scheduling and cancelling are O(1) and one driver (a thread, or
+a task on the event loop) advances the wheel once per tick and fires what is due.
+
+On top of it, each session gets a SessionDeadlines with three budgets: the handshake,
+every wait for a player decision, and the session as a whole. When one runs out we
+abort the connection, which wakes up whoever is blocked on it. Re-arming the decision
+budget is only a couple of attribute writes: the wheel entry is left alone and simply
+re-checked (and pushed back) when it fires.
+
+SessionDeadlineManager also counts unfinished handshakes per source IP, so one host
+cannot tie up every session slot with connections that never say hello.
+"""
+
+import math
+import threading
+import time
+
+import consts
+import game_logging
+
+DEADLINE_BUDGET_HANDSHAKE = "handshake"
+DEADLINE_BUDGET_PLAYER_DECISION = "player_decision"
+DEADLINE_BUDGET_SESSION = "session"
+DEADLINE_BUDGETS = (DEADLINE_BUDGET_HANDSHAKE, DEADLINE_BUDGET_PLAYER_DECISION, DEADLINE_BUDGET_SESSION)
+
+server_logger = game_logging.get_server_logger()
+
+
+class WheelTimer:
+    __slots__ = ("expires_at_tick", "callback", "wheel_slot")
+
+    def __init__(self, expires_at_tick, callback, wheel_slot):
+        self.expires_at_tick = expires_at_tick
+        self.callback = callback
+        self.wheel_slot = wheel_slot
+
+
+class HashedTimerWheel:
+    def __init__(self, tick_seconds=consts.DEADLINE_TIMER_WHEEL_TICK_IN_SECONDS, slot_count=consts.DEADLINE_TIMER_WHEEL_SLOT_COUNT):
+        """
+        Deadlines further away than one turn of the wheel (tick_seconds * slot_count)
+        just stay in their slot and are skipped until their tick really comes.
+        Timers fire up to one tick late, never early.
+        """
+        self.tick_seconds = tick_seconds
+        self.slot_count = slot_count
+        self.wheel_slots = [set() for _ in range(slot_count)]
+        self.started_at = time.monotonic()
+        self.current_tick = 0
+        self.wheel_lock = threading.Lock()
+
+    def schedule(self, delay_seconds, callback):
+        """
+        Calls callback() (on the driver's thread) once delay_seconds have passed.
+        Returns the timer for cancel().
+        """
+        expires_at_tick = math.ceil((time.monotonic() + delay_seconds - self.started_at) / self.tick_seconds)
+        with self.wheel_lock:
+            expires_at_tick = max(expires_at_tick, self.current_tick + 1)
+            wheel_slot = self.wheel_slots[expires_at_tick % self.slot_count]
+            new_timer = WheelTimer(expires_at_tick, callback, wheel_slot)
+            wheel_slot.add(new_timer)
+        return new_timer
+
+    def cancel(self, wheel_timer):
+        # Harmless for a timer that already fired
+        with self.wheel_lock:
+            wheel_timer.wheel_slot.discard(wheel_timer)
+
+    def pending_timer_count(self):
+        return sum(len(wheel_slot) for wheel_slot in self.wheel_slots)
+
+    def advance(self):
+        """
+        Moves the wheel up to the current tick and fires every timer that is due.
+        Callbacks run outside the lock, so they may schedule new timers.
+        """
+        target_tick = int((time.monotonic() - self.started_at) / self.tick_seconds)
+        due_timers = []
+        with self.wheel_lock:
+            # After a long stall one full turn visits every slot, no need to spin through the rest
+            self.current_tick = max(self.current_tick, target_tick - self.slot_count)
+            while self.current_tick < target_tick:
+                self.current_tick += 1
+                wheel_slot = self.wheel_slots[self.current_tick % self.slot_count]
+                if not wheel_slot:
+                    continue
+                due_in_this_slot = [wheel_timer for wheel_timer in wheel_slot if wheel_timer.expires_at_tick <= self.current_tick]
+                wheel_slot.difference_update(due_in_this_slot)
+                due_timers.extend(due_in_this_slot)
+
+        for wheel_timer in due_timers:
+            try:
+                wheel_timer.callback()
+            except Exception as error_message:
+                server_logger.warning("Deadline callback failed: %s", error_message)
+
+    def run_forever(self):
+        # Body of the driver thread in the threaded server
+        while True:
+            time.sleep(self.tick_seconds)
+            self.advance()
+
+    async def run_forever_async(self, sleep_coroutine):
+        # Driver task for the event loop; sleep_coroutine is asyncio.sleep
+        while True:
+            await sleep_coroutine(self.tick_seconds)
+            self.advance()
+
+    def start_driver_thread(self):
+        threading.Thread(target=self.run_forever, name="deadline-timer-wheel", daemon=True).start()
+
+
+class SessionDeadlines:
+    __slots__ = (
+        "deadline_manager", "abort_connection", "client_ip_address", "deadlines_lock",
+        "phase_budget_name", "phase_expires_at", "phase_timer", "session_timer",
+        "expired_budget_name", "is_finished"
+    )
+
+    def __init__(self, deadline_manager, abort_connection, client_ip_address):
+        """
+        abort_connection() is called at most once, from the wheel's driver, when a
+        budget runs out. client_ip_address is set while we hold a pending handshake
+        slot for it.
+        """
+        self.deadline_manager = deadline_manager
+        self.abort_connection = abort_connection
+        self.client_ip_address = client_ip_address
+        # The session thread arms and disarms, the driver checks; the lock keeps them in step
+        self.deadlines_lock = threading.Lock()
+        self.phase_budget_name = None
+        self.phase_expires_at = None
+        self.phase_timer = None
+        self.session_timer = None
+        self.expired_budget_name = None
+        self.is_finished = False
+
+    def arm_phase_budget(self, budget_name, budget_seconds):
+        with self.deadlines_lock:
+            self.phase_budget_name = budget_name
+            self.phase_expires_at = time.monotonic() + budget_seconds
+            if self.phase_timer is None and not self.is_finished:
+                self.phase_timer = self.deadline_manager.timer_wheel.schedule(budget_seconds, self.check_phase_deadline)
+
+    def disarm_phase_budget(self):
+        # The wheel entry stays; when it fires it finds nothing armed and goes away
+        self.phase_expires_at = None
+
+    def finish_handshake(self):
+        self.disarm_phase_budget()
+        self.release_handshake_slot()
+
+    def wait_for_player(self):
+        """
+        Call right before we flush and block on the player's next packet.
+        """
+        self.arm_phase_budget(DEADLINE_BUDGET_PLAYER_DECISION, self.deadline_manager.player_decision_deadline_seconds)
+
+    def player_answered(self):
+        self.phase_expires_at = None
+
+    def check_phase_deadline(self):
+        with self.deadlines_lock:
+            self.phase_timer = None
+            if self.phase_expires_at is None or self.is_finished:
+                return
+            remaining_seconds = self.phase_expires_at - time.monotonic()
+            if remaining_seconds > 0:
+                # Re-armed since this entry was scheduled: follow the new deadline
+                self.phase_timer = self.deadline_manager.timer_wheel.schedule(remaining_seconds, self.check_phase_deadline)
+                return
+            expired_budget_name = self.phase_budget_name
+        self.expire(expired_budget_name)
+
+    def check_session_deadline(self):
+        self.session_timer = None
+        self.expire(DEADLINE_BUDGET_SESSION)
+
+    def expire(self, budget_name):
+        with self.deadlines_lock:
+            if self.is_finished or self.expired_budget_name is not None:
+                return
+            self.expired_budget_name = budget_name
+        self.deadline_manager.record_expiration(budget_name)
+        self.abort_connection()
+
+    def release_handshake_slot(self):
+        if self.client_ip_address is not None:
+            self.deadline_manager.release_pending_handshake(self.client_ip_address)
+            self.client_ip_address = None
+
+    def finish(self):
+        """
+        Always called when the session ends, however it ends.
+        """
+        with self.deadlines_lock:
+            self.is_finished = True
+            self.phase_expires_at = None
+            timer_wheel = self.deadline_manager.timer_wheel
+            if self.phase_timer is not None:
+                timer_wheel.cancel(self.phase_timer)
+                self.phase_timer = None
+            if self.session_timer is not None:
+                timer_wheel.cancel(self.session_timer)
+                self.session_timer = None
+        self.release_handshake_slot()
+
+
+class SessionDeadlineManager:
+    def __init__(self, timer_wheel, handshake_deadline_seconds, player_decision_deadline_seconds, session_deadline_seconds,
+                 max_pending_handshakes_per_ip=0, record_expiration=None):
+        """
+        max_pending_handshakes_per_ip = 0 turns the per-IP limit off.
+        record_expiration(budget_name) is told about every budget that runs out.
+        """
+        self.timer_wheel = timer_wheel
+        self.handshake_deadline_seconds = handshake_deadline_seconds
+        self.player_decision_deadline_seconds = player_decision_deadline_seconds
+        self.session_deadline_seconds = session_deadline_seconds
+        self.max_pending_handshakes_per_ip = max_pending_handshakes_per_ip
+        self.record_expiration_callback = record_expiration
+        self.pending_handshakes_by_ip = {}
+        self.pending_handshakes_lock = threading.Lock()
+
+    def try_reserve_pending_handshake(self, client_ip_address):
+        """
+        Called right after accept(). Returns False if this IP already has too many
+        connections that have not finished their handshake.
+        """
+        if not self.max_pending_handshakes_per_ip:
+            return True
+        with self.pending_handshakes_lock:
+            pending_count = self.pending_handshakes_by_ip.get(client_ip_address, 0)
+            if pending_count >= self.max_pending_handshakes_per_ip:
+                return False
+            self.pending_handshakes_by_ip[client_ip_address] = pending_count + 1
+            return True
+
+    def release_pending_handshake(self, client_ip_address):
+        if not self.max_pending_handshakes_per_ip:
+            return
+        with self.pending_handshakes_lock:
+            pending_count = self.pending_handshakes_by_ip.get(client_ip_address, 0) - 1
+            if pending_count > 0:
+                self.pending_handshakes_by_ip[client_ip_address] = pending_count
+            else:
+                self.pending_handshakes_by_ip.pop(client_ip_address, None)
+
+    def start_session(self, abort_connection, reserved_client_ip_address=None):
+        """
+        Arms the session and handshake budgets. Pass the IP the connection reserved a
+        pending handshake for (if any); it is released once the handshake is done.
+        """
+        if not self.max_pending_handshakes_per_ip:
+            reserved_client_ip_address = None
+        session_deadlines = SessionDeadlines(self, abort_connection, reserved_client_ip_address)
+        session_deadlines.session_timer = self.timer_wheel.schedule(self.session_deadline_seconds, session_deadlines.check_session_deadline)
+        session_deadlines.arm_phase_budget(DEADLINE_BUDGET_HANDSHAKE, self.handshake_deadline_seconds)
+        return session_deadlines
+
+    def record_expiration(self, budget_name):
+        if self.record_expiration_callback is not None:
+            self.record_expiration_callback(budget_name)
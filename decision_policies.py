@@ -0,0 +1,101 @@
+"""
+decision_policies.py
+Pluggable Hit/Stand strategies so the client can play without a human at the keyboard.
+Every policy answers the same question through choose_action(player_hand_value,
+dealer_visible_card_points) and returns either 'hit' or 'stand'.
+Card points follow the house rules: Ace is always 11, face cards are 10.
+"""
+
+import json
+import random
+
+PLAYER_ACTION_HIT = 'hit'
+PLAYER_ACTION_STAND = 'stand'
+
+
+class FixedThresholdPolicy:
+    def __init__(self, stand_threshold=17):
+        """
+        Keep hitting until the hand reaches stand_threshold (17 copies the dealer).
+        """
+        self.stand_threshold = stand_threshold
+
+    def choose_action(self, player_hand_value, dealer_visible_card_points):
+        if player_hand_value < self.stand_threshold:
+            return PLAYER_ACTION_HIT
+        return PLAYER_ACTION_STAND
+
+
+class AlwaysStandPolicy:
+    def choose_action(self, player_hand_value, dealer_visible_card_points):
+        return PLAYER_ACTION_STAND
+
+
+class RandomPolicy:
+    def __init__(self, hit_probability=0.5, random_generator=None):
+        """
+        Coin-flip player. Each policy owns its generator so concurrent bots never share state.
+        """
+        self.hit_probability = hit_probability
+        self.random_generator = random_generator if random_generator is not None else random.Random()
+
+    def choose_action(self, player_hand_value, dealer_visible_card_points):
+        if self.random_generator.random() < self.hit_probability:
+            return PLAYER_ACTION_HIT
+        return PLAYER_ACTION_STAND
+
+
+class TableDrivenPolicy:
+    def __init__(self, decision_lookup_table, fallback_policy=None):
+        """
+        decision_lookup_table maps (player_hand_value, dealer_visible_card_points) to
+        'hit' or 'stand'. Anything missing from the table goes to the fallback policy.
+        """
+        self.decision_lookup_table = decision_lookup_table
+        self.fallback_policy = fallback_policy if fallback_policy is not None else FixedThresholdPolicy()
+
+    def choose_action(self, player_hand_value, dealer_visible_card_points):
+        table_action = self.decision_lookup_table.get((player_hand_value, dealer_visible_card_points))
+        if table_action is not None:
+            return table_action
+        return self.fallback_policy.choose_action(player_hand_value, dealer_visible_card_points)
+
+
+def load_decision_table_from_json(table_file_path):
+    """
+    Reads a table written as {"<player value>": {"<dealer card points>": "hit" | "stand"}}.
+    """
+    with open(table_file_path, "r", encoding="utf-8") as table_file:
+        raw_table = json.load(table_file)
+
+    decision_lookup_table = {}
+    for player_value_text, actions_by_dealer_card in raw_table.items():
+        for dealer_points_text, table_action in actions_by_dealer_card.items():
+            if table_action not in (PLAYER_ACTION_HIT, PLAYER_ACTION_STAND):
+                raise ValueError(f"Unknown action '{table_action}' in decision table")
+            decision_lookup_table[(int(player_value_text), int(dealer_points_text))] = table_action
+    return decision_lookup_table
+
+
+def build_decision_policy(policy_specification):
+    """
+    Turns a command line spec into a policy object:
+      threshold[:N]   hit below N (default 17)
+      stand           always stand
+      random[:P]      hit with probability P (default 0.5)
+      table:PATH      JSON decision table, threshold 17 for anything it doesn't cover
+    """
+    policy_name, _, policy_argument = policy_specification.partition(":")
+
+    if policy_name == "threshold":
+        return FixedThresholdPolicy(int(policy_argument) if policy_argument else 17)
+    if policy_name == "stand":
+        return AlwaysStandPolicy()
+    if policy_name == "random":
+        return RandomPolicy(float(policy_argument) if policy_argument else 0.5)
+    if policy_name == "table":
+        if not policy_argument:
+            raise ValueError("The table policy needs a path, e.g. table:strategy.json")
+        return TableDrivenPolicy(load_decision_table_from_json(policy_argument))
+
+    raise ValueError(f"Unknown decision policy '{policy_specification}'")
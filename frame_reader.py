@@ -0,0 +1,137 @@
+"""
+frame_reader.py
+TCP is a byte stream: one recv() can return half a packet, or three packets glued
+together. BufferedFrameReader sits between a socket and the protocol codec and hands
+out exact-size frames, reading into one preallocated buffer with recv_into.
+When the peer pipelines several packets, a single recv drains all of them and the
+following reads are served straight from the buffer without touching the kernel.
+"""
+
+import socket
+
+import consts
+import protocol_codec
+
+# Big enough for dozens of pipelined packets, small enough to keep per-session memory flat
+DEFAULT_FRAME_BUFFER_SIZE_IN_BYTES = consts.NETWORK_BUFFER_SIZE_IN_BYTES * 4
+
+
+class BufferedFrameReader:
+    def __init__(self, connected_socket, buffer_capacity_in_bytes=DEFAULT_FRAME_BUFFER_SIZE_IN_BYTES):
+        """
+        The buffer is allocated once per connection and reused for every frame.
+        """
+        self.connected_socket = connected_socket
+        self.receive_buffer = bytearray(buffer_capacity_in_bytes)
+        self.receive_buffer_view = memoryview(self.receive_buffer)
+        # Unread bytes live in receive_buffer[read_position:write_position]
+        self.read_position = 0
+        self.write_position = 0
+
+    def buffered_byte_count(self):
+        return self.write_position - self.read_position
+
+    def read_frame(self, frame_size):
+        """
+        Blocks until frame_size bytes are available and returns the offset of the frame
+        inside receive_buffer. The bytes stay valid until the next read_* call.
+        Returns None if the peer closed the connection cleanly between frames.
+        """
+        if self.write_position - self.read_position < frame_size:
+            if not self.fill_buffer_until(frame_size):
+                return None
+
+        frame_offset = self.read_position
+        self.read_position += frame_size
+        return frame_offset
+
+    def fill_buffer_until(self, frame_size):
+        """
+        Keeps calling recv_into until at least frame_size unread bytes are buffered.
+        Each call grabs as much as the kernel has, so pipelined frames arrive together.
+        """
+        if frame_size > len(self.receive_buffer):
+            raise ValueError(f"Frame of {frame_size} bytes does not fit a {len(self.receive_buffer)} byte buffer")
+
+        # Not enough room left at the tail: slide the unread leftovers back to the front
+        if len(self.receive_buffer) - self.read_position < frame_size:
+            leftover_byte_count = self.write_position - self.read_position
+            self.receive_buffer[0:leftover_byte_count] = self.receive_buffer_view[self.read_position:self.write_position]
+            self.read_position = 0
+            self.write_position = leftover_byte_count
+
+        while self.write_position - self.read_position < frame_size:
+            received_byte_count = self.connected_socket.recv_into(self.receive_buffer_view[self.write_position:])
+
+            if received_byte_count == 0:
+                if self.write_position == self.read_position:
+                    return False
+                raise ConnectionError("Peer closed the connection in the middle of a packet")
+
+            self.write_position += received_byte_count
+
+        return True
+
+    def has_peer_closed(self):
+        """
+        Non-blocking check for a session that is waiting on something other than its
+        peer: True once the peer hung up or the connection was shut down (a missed
+        deadline does that). Bytes the peer already sent stay queued for the next read.
+        """
+        if self.write_position > self.read_position:
+            return False
+        try:
+            return self.connected_socket.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT) == b""
+        except BlockingIOError:
+            return False
+        except OSError:
+            return True
+
+    # Protocol helpers: read one frame and decode it in place
+
+    def read_request_packet(self):
+        frame_offset = self.read_frame(protocol_codec.REQUEST_PACKET_SIZE)
+        if frame_offset is None:
+            return None
+        return protocol_codec.decode_request_packet(self.receive_buffer, frame_offset)
+
+    def read_client_decision(self):
+        frame_offset = self.read_frame(protocol_codec.CLIENT_PAYLOAD_SIZE)
+        if frame_offset is None:
+            return None
+        return protocol_codec.decode_client_decision(self.receive_buffer, frame_offset)
+
+    def read_multiplexed_table_count(self):
+        frame_offset = self.read_frame(protocol_codec.MULTIPLEXED_REQUEST_TRAILER_SIZE)
+        if frame_offset is None:
+            return None
+        return protocol_codec.decode_multiplexed_request_trailer(self.receive_buffer, frame_offset)
+
+    def read_multiplexed_client_decision(self):
+        frame_offset = self.read_frame(protocol_codec.MULTIPLEXED_CLIENT_PAYLOAD_SIZE)
+        if frame_offset is None:
+            return None
+        return protocol_codec.decode_multiplexed_client_decision(self.receive_buffer, frame_offset)
+
+    def read_multiplexed_server_payload(self):
+        frame_offset = self.read_frame(protocol_codec.MULTIPLEXED_SERVER_PAYLOAD_SIZE)
+        if frame_offset is None:
+            return None
+        return protocol_codec.decode_multiplexed_server_payload(self.receive_buffer, frame_offset)
+
+    def peek_packet_type(self):
+        """
+        Returns the Type byte of the next packet without consuming anything, or None if
+        the peer closed cleanly. Lets a multiplexed client spot a standard sized
+        packet (the busy notice) before it reads a whole multiplexed frame.
+        """
+        if self.write_position - self.read_position < protocol_codec.PACKET_HEADER_SIZE:
+            if not self.fill_buffer_until(protocol_codec.PACKET_HEADER_SIZE):
+                return None
+        return self.receive_buffer[self.read_position + protocol_codec.PACKET_TYPE_OFFSET]
+
+    def read_server_payload(self):
+        frame_offset = self.read_frame(protocol_codec.SERVER_PAYLOAD_SIZE)
+        if frame_offset is None:
+            return None
+        return protocol_codec.decode_server_payload(self.receive_buffer, frame_offset)
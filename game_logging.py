@@ -0,0 +1,180 @@
+"""
+game_logging.py
+Non-blocking logging for the game server.
+Session threads never touch stdout: a record is only created if its level is enabled,
+its message is formatted lazily (%-style args), and it is handed to an in-memory queue.
+One background thread drains that queue, formats the records and writes them to the
+stream in batches, one write + flush per batch instead of one per line.
+Output is either plain text or compact JSON lines for log shippers.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+
+SERVER_LOGGER_NAME = "blackjack.server"
+
+# Upper bound on records written per batch, keeps a burst from building a huge string
+MAX_RECORDS_PER_WRITE_BATCH = 512
+
+LOG_FORMAT_TEXT = "text"
+LOG_FORMAT_JSON_LINES = "json"
+
+TEXT_LOG_LINE_FORMAT = "%(asctime)s %(levelname)-7s %(message)s"
+
+
+def get_server_logger():
+    return logging.getLogger(SERVER_LOGGER_NAME)
+
+
+class DeferredFormattingQueueHandler(logging.Handler):
+    """
+    Like logging.handlers.QueueHandler, but it does not format the message on the
+    calling thread. Our log args are plain strings and ints, so it is safe to let the
+    writer thread build the final text.
+    """
+
+    def __init__(self, record_queue):
+        super().__init__()
+        self.record_queue = record_queue
+
+    def emit(self, record):
+        self.record_queue.put(record)
+
+    # The base class takes a lock around emit(); a queue put is already thread-safe
+    def handle(self, record):
+        if self.filter(record):
+            self.emit(record)
+        return True
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    One compact JSON object per line: time, level, thread and message (+ exception).
+    """
+
+    def format(self, record):
+        structured_record = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            structured_record["exc"] = self.formatException(record.exc_info)
+        return json.dumps(structured_record, separators=(",", ":"))
+
+
+class BatchingLogWriter:
+    def __init__(self, record_queue, output_stream, log_formatter):
+        """
+        Background consumer of the record queue. It blocks for the first record, then
+        grabs whatever else is already waiting and writes the whole batch at once.
+        """
+        self.record_queue = record_queue
+        self.output_stream = output_stream
+        self.log_formatter = log_formatter
+        self.writer_thread = threading.Thread(target=self.drain_queue_forever, name="log-writer", daemon=True)
+
+    def start(self):
+        self.writer_thread.start()
+
+    def stop(self):
+        """
+        Pushes a sentinel through the queue and waits until everything before it is written.
+        """
+        if self.writer_thread.is_alive():
+            self.record_queue.put(None)
+            self.writer_thread.join(timeout=5)
+
+    def drain_queue_forever(self):
+        while True:
+            pending_records = [self.record_queue.get()]
+            while len(pending_records) < MAX_RECORDS_PER_WRITE_BATCH:
+                try:
+                    pending_records.append(self.record_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            should_stop = None in pending_records
+            self.write_batch([record for record in pending_records if record is not None])
+            if should_stop:
+                return
+
+    def write_batch(self, log_records):
+        if not log_records:
+            return
+        formatted_lines = []
+        for log_record in log_records:
+            try:
+                formatted_lines.append(self.log_formatter.format(log_record))
+            except Exception as formatting_error:
+                formatted_lines.append(f"<unformattable log record {log_record.msg!r}: {formatting_error}>")
+        try:
+            self.output_stream.write("\n".join(formatted_lines) + "\n")
+            self.output_stream.flush()
+        except (OSError, ValueError):
+            # Nowhere left to write (closed pipe / stream), drop the batch rather than die
+            pass
+
+
+# The pipeline is per process; a forked worker rebuilds its own (threads do not survive fork)
+_active_log_writer = None
+_active_logging_settings = None
+_active_logging_pid = None
+
+
+def configure_server_logging(level_name="INFO", log_format=LOG_FORMAT_TEXT, output_stream=None):
+    """
+    Routes the server logger through the queue + batching writer. Safe to call again,
+    the previous pipeline is flushed and replaced.
+    """
+    global _active_log_writer, _active_logging_settings, _active_logging_pid
+
+    shutdown_server_logging()
+
+    server_logger = get_server_logger()
+    server_logger.setLevel(getattr(logging, level_name.upper()))
+    server_logger.propagate = False
+    for old_handler in list(server_logger.handlers):
+        server_logger.removeHandler(old_handler)
+
+    if log_format == LOG_FORMAT_JSON_LINES:
+        log_formatter = JsonLinesFormatter()
+    else:
+        log_formatter = logging.Formatter(TEXT_LOG_LINE_FORMAT)
+
+    record_queue = queue.SimpleQueue()
+    server_logger.addHandler(DeferredFormattingQueueHandler(record_queue))
+
+    _active_log_writer = BatchingLogWriter(record_queue, output_stream or sys.stdout, log_formatter)
+    _active_log_writer.start()
+    _active_logging_settings = (level_name, log_format, output_stream)
+    _active_logging_pid = os.getpid()
+
+
+def restart_server_logging_after_fork():
+    """
+    Called at the start of a forked worker: same settings, fresh queue and writer thread.
+    """
+    global _active_log_writer
+    if _active_logging_settings is None or _active_logging_pid == os.getpid():
+        return
+    # The parent's writer thread does not exist here, so there is nothing to stop
+    _active_log_writer = None
+    configure_server_logging(*_active_logging_settings)
+
+
+def shutdown_server_logging():
+    global _active_log_writer
+    if _active_log_writer is not None and _active_logging_pid == os.getpid():
+        _active_log_writer.stop()
+    _active_log_writer = None
+
+
+# Make sure the last batch reaches the stream when the process exits normally
+atexit.register(shutdown_server_logging)
@@ -0,0 +1,225 @@
+"""
+house_rules_simulator.py
+Monte Carlo simulator for our house rules (Ace is ALWAYS 11, face cards are 10,
+dealer hits below 17, player loses on anything over 21). Millions of rounds are dealt
+at once as NumPy arrays: one shuffled deck per row, cumulative sums for the hand
+totals and a vectorized dealer draw, so we can measure the house edge of a policy
+without playing a single round over the network.
+
+Cards are consumed in exactly the order the server pops them: player, player,
+dealer face-up, dealer hidden, then the player's hits, then the dealer's draws.
+verify_against_server_rules replays deck rows through the server's own round engine
+to prove both agree.
+
+NumPy is only needed for this module:  pip install numpy
+Usage: python house_rules_simulator.py --rounds 10000000 --policy threshold:17
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+import consts
+import decision_policies
+
+# Point value of every rank under the house rules, indexed by rank (index 0 unused)
+RANK_POINT_VALUES = np.array([0, 11, 2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10], dtype=np.int16)
+
+# One full deck as ranks, 4 suits x 13 ranks
+SINGLE_DECK_RANKS = np.tile(np.arange(1, 14, dtype=np.int8), 4)
+
+# Every total we may have to look up (21 + an Ace = 32) and every face-up card value (2..11)
+HIT_TABLE_PLAYER_TOTALS = 33
+HIT_TABLE_DEALER_CARD_POINTS = 12
+
+# Enough cards that every hand is guaranteed to finish: 2 + 10 hits of at least 2 points is > 21,
+# and the dealer needs at most 7 draws of 2 to get from 4 to 17
+MAX_PLAYER_HITS = 10
+MAX_DEALER_DRAWS = 8
+
+# Player card columns in deal order: the first two cards, then hits starting after the dealer's two
+PLAYER_CARD_COLUMNS = np.array([0, 1] + list(range(4, 4 + MAX_PLAYER_HITS)))
+
+DEFAULT_SIMULATION_BATCH_SIZE = 250_000
+
+
+def build_hit_table(decision_policy):
+    """
+    Evaluates a deterministic policy (threshold, stand, table) for every
+    (player total, dealer face-up points) pair and returns a boolean hit matrix.
+    """
+    hit_table = np.zeros((HIT_TABLE_PLAYER_TOTALS, HIT_TABLE_DEALER_CARD_POINTS), dtype=bool)
+    for player_total in range(4, 22):
+        for dealer_card_points in range(2, 12):
+            policy_action = decision_policy.choose_action(player_total, dealer_card_points)
+            hit_table[player_total, dealer_card_points] = policy_action == decision_policies.PLAYER_ACTION_HIT
+    return hit_table
+
+
+def deal_shuffled_decks(round_count, random_generator):
+    """
+    One independently shuffled 52 card deck (as ranks) per row.
+    """
+    deck_matrix = np.tile(SINGLE_DECK_RANKS, (round_count, 1))
+    random_generator.permuted(deck_matrix, axis=1, out=deck_matrix)
+    return deck_matrix
+
+
+def play_dealt_rounds(deck_matrix, hit_table):
+    """
+    Plays every row of deck_matrix to the end and returns the result codes
+    (consts.GAME_RESULT_INDICATOR_*) plus the final player and dealer totals.
+    """
+    round_count = deck_matrix.shape[0]
+    row_indices = np.arange(round_count)
+    card_points = RANK_POINT_VALUES[deck_matrix]
+
+    dealer_visible_points = card_points[:, 2]
+
+    # Player: running totals after 2, 3, 4... cards. Keep hitting while the table says so
+    # and we are not bust; the first "no" marks the final hand.
+    player_running_totals = np.cumsum(card_points[:, PLAYER_CARD_COLUMNS], axis=1)
+    wants_another_card = (player_running_totals[:, 1:] <= 21) & hit_table[
+        np.minimum(player_running_totals[:, 1:], HIT_TABLE_PLAYER_TOTALS - 1),
+        dealer_visible_points[:, None]
+    ]
+    player_hit_count = np.argmin(wants_another_card, axis=1)
+    final_player_totals = player_running_totals[row_indices, player_hit_count + 1]
+    did_player_bust = final_player_totals > 21
+
+    # Dealer: face-up + hidden, then draws right after the player's last hit, until 17 or more
+    dealer_draw_columns = (4 + player_hit_count)[:, None] + np.arange(MAX_DEALER_DRAWS)
+    dealer_running_totals = np.empty((round_count, MAX_DEALER_DRAWS + 1), dtype=np.int16)
+    dealer_running_totals[:, 0] = card_points[:, 2] + card_points[:, 3]
+    np.cumsum(card_points[row_indices[:, None], dealer_draw_columns], axis=1, out=dealer_running_totals[:, 1:])
+    dealer_running_totals[:, 1:] += dealer_running_totals[:, :1]
+    dealer_draw_count = np.argmax(dealer_running_totals >= 17, axis=1)
+    final_dealer_totals = dealer_running_totals[row_indices, dealer_draw_count]
+
+    # The dealer never plays against a busted player, only the two visible cards count then
+    final_dealer_totals = np.where(did_player_bust, dealer_running_totals[:, 0], final_dealer_totals)
+
+    # Same order of checks as round_engine.determine_round_result
+    round_results = np.full(round_count, consts.GAME_RESULT_INDICATOR_TIE, dtype=np.int8)
+    round_results[final_player_totals < final_dealer_totals] = consts.GAME_RESULT_INDICATOR_PLAYER_LOSS
+    round_results[final_player_totals > final_dealer_totals] = consts.GAME_RESULT_INDICATOR_PLAYER_WIN
+    round_results[final_dealer_totals > 21] = consts.GAME_RESULT_INDICATOR_PLAYER_WIN
+    round_results[did_player_bust] = consts.GAME_RESULT_INDICATOR_PLAYER_LOSS
+
+    return round_results, final_player_totals, final_dealer_totals
+
+
+def simulate_house_rules(round_count, hit_table, random_seed=None, batch_size=DEFAULT_SIMULATION_BATCH_SIZE):
+    """
+    Deals round_count rounds in batches and returns a summary dict with win / loss /
+    tie rates, bust rates and the expected value of one unit bet (a tie is a push).
+    """
+    random_generator = np.random.default_rng(random_seed)
+    win_count = loss_count = tie_count = player_bust_count = dealer_bust_count = 0
+
+    rounds_left_to_play = round_count
+    while rounds_left_to_play > 0:
+        current_batch_size = min(batch_size, rounds_left_to_play)
+        round_results, final_player_totals, final_dealer_totals = play_dealt_rounds(
+            deal_shuffled_decks(current_batch_size, random_generator), hit_table
+        )
+
+        result_counts = np.bincount(round_results, minlength=4)
+        win_count += int(result_counts[consts.GAME_RESULT_INDICATOR_PLAYER_WIN])
+        loss_count += int(result_counts[consts.GAME_RESULT_INDICATOR_PLAYER_LOSS])
+        tie_count += int(result_counts[consts.GAME_RESULT_INDICATOR_TIE])
+        player_bust_count += int(np.count_nonzero(final_player_totals > 21))
+        dealer_bust_count += int(np.count_nonzero((final_player_totals <= 21) & (final_dealer_totals > 21)))
+
+        rounds_left_to_play -= current_batch_size
+
+    return {
+        "rounds": round_count,
+        "win_rate": win_count / round_count,
+        "loss_rate": loss_count / round_count,
+        "tie_rate": tie_count / round_count,
+        "player_bust_rate": player_bust_count / round_count,
+        "dealer_bust_rate": dealer_bust_count / round_count,
+        "expected_value": (win_count - loss_count) / round_count,
+    }
+
+
+def verify_against_server_rules(sample_round_count, hit_table, random_seed=None):
+    """
+    Replays the same shuffled decks card by card through round_engine.BlackjackRoundEngine,
+    the state machine every server session plays (RunningHand scoring and
+    determine_round_result included), and returns how many rounds disagree with the
+    vectorized simulator (0 = good).
+    """
+    # Imported here so the simulator itself does not pull in the table code
+    import protocol_codec
+    from card_shoe import CARD_POINTS_BY_ID, CardShoe, card_id_from_rank_and_suit
+    from round_engine import BlackjackRoundEngine
+
+    deck_matrix = deal_shuffled_decks(sample_round_count, np.random.default_rng(random_seed))
+    vectorized_results, _, _ = play_dealt_rounds(deck_matrix, hit_table)
+
+    mismatching_round_count = 0
+    for deck_row, vectorized_result in zip(deck_matrix.tolist(), vectorized_results.tolist()):
+        # A shoe stacked with this row, dealt front to back like every server shoe
+        fixed_shoe = CardShoe()
+        fixed_shoe.shoe_cards = [card_id_from_rank_and_suit(card_rank, 0) for card_rank in deck_row]
+        reference_engine = BlackjackRoundEngine(lambda current_shoe: fixed_shoe)
+
+        round_events = []
+        reference_engine.start_round(round_events)
+        dealer_visible_points = CARD_POINTS_BY_ID[reference_engine.cards_held_by_dealer.card_ids[0]]
+        while reference_engine.is_waiting_for_player_decision:
+            if hit_table[reference_engine.cards_held_by_player.total_points, dealer_visible_points]:
+                reference_engine.apply_player_decision(protocol_codec.PLAYER_DECISION_HIT, round_events)
+            else:
+                reference_engine.apply_player_decision(protocol_codec.PLAYER_DECISION_STAND, round_events)
+
+        if reference_engine.final_round_result != vectorized_result:
+            mismatching_round_count += 1
+
+    return mismatching_round_count
+
+
+def parse_command_line_arguments():
+    argument_parser = argparse.ArgumentParser(description="Vectorized Monte Carlo simulator of the house rules")
+    argument_parser.add_argument("--rounds", type=int, default=1_000_000, help="number of rounds to simulate")
+    argument_parser.add_argument(
+        "--policy", default="threshold:17",
+        help="player policy: threshold[:N], stand or table:PATH (must be deterministic)"
+    )
+    argument_parser.add_argument("--seed", type=int, default=None, help="seed for reproducible runs")
+    argument_parser.add_argument("--batch-size", type=int, default=DEFAULT_SIMULATION_BATCH_SIZE, help="rounds dealt per NumPy batch")
+    argument_parser.add_argument(
+        "--verify", type=int, default=0, metavar="N",
+        help="also replay N rounds through the server's round engine and report mismatches"
+    )
+    return argument_parser.parse_args()
+
+
+if __name__ == "__main__":
+    command_line_arguments = parse_command_line_arguments()
+    if command_line_arguments.policy.startswith("random"):
+        raise SystemExit("The simulator needs a deterministic policy (threshold, stand or table).")
+
+    player_hit_table = build_hit_table(decision_policies.build_decision_policy(command_line_arguments.policy))
+
+    simulation_started_at = time.perf_counter()
+    simulation_summary = simulate_house_rules(
+        command_line_arguments.rounds,
+        player_hit_table,
+        command_line_arguments.seed,
+        command_line_arguments.batch_size
+    )
+    elapsed_seconds = time.perf_counter() - simulation_started_at
+
+    print(f"Policy {command_line_arguments.policy}: {simulation_summary['rounds']} rounds in {elapsed_seconds:.2f}s "
+          f"({simulation_summary['rounds'] / elapsed_seconds * 60 / 1e6:.1f}M rounds/min)")
+    print(f"  Win  {simulation_summary['win_rate']:.4%}   Loss {simulation_summary['loss_rate']:.4%}   Tie {simulation_summary['tie_rate']:.4%}")
+    print(f"  Player bust {simulation_summary['player_bust_rate']:.4%}   Dealer bust {simulation_summary['dealer_bust_rate']:.4%}")
+    print(f"  Expected value per unit bet: {simulation_summary['expected_value']:+.5f}")
+
+    if command_line_arguments.verify:
+        mismatches = verify_against_server_rules(command_line_arguments.verify, player_hit_table, command_line_arguments.seed)
+        print(f"  Server replay check: {mismatches} mismatches in {command_line_arguments.verify} rounds")
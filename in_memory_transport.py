@@ -0,0 +1,165 @@
+"""
+in_memory_transport.py
+Plays the exact wire protocol with no sockets in between: the server side is the same
+BlackjackTableSession every real session uses, the player side decodes the very same
+payload bytes the way Client does and answers with the same decision packets, asking
+any Client-compatible decision policy (decision_policies.py) what to do.
+Everything stays in one thread, so a run is only as fast as the rules and the codec,
+which makes it the tool for testing strategies, checking rule changes and capacity
+planning (how many rounds per second can the game logic itself sustain?).
+
+Usage:
+    python in_memory_transport.py --rounds 1000000 --policy threshold:17
+    python in_memory_transport.py --rounds 100000 --policy table:strategy.json --seed 7
+"""
+
+import argparse
+import time
+
+import consts
+import decision_policies
+import protocol_codec
+from card_shoe import ShuffledShoeSource, SeededShoeSource, CARD_POINTS_BY_ID, card_id_from_rank_and_suit
+from round_engine import BlackjackRoundEngine, BlackjackTableSession
+
+# Card points by (rank, suit) straight from the payload fields, without building a card_id
+CARD_POINTS_BY_RANK = {
+    card_rank: CARD_POINTS_BY_ID[card_id_from_rank_and_suit(card_rank, 0)]
+    for card_rank in consts.CARD_RANKS_MAPPING_DICTIONARY
+}
+
+
+class InMemoryPlayer:
+    __slots__ = (
+        "decision_policy", "player_hand_points", "player_card_count", "dealer_visible_card_points",
+        "has_dealer_visible_card_been_shown", "is_it_my_turn", "rounds_completed", "results_by_code"
+    )
+
+    def __init__(self, decision_policy):
+        """
+        The player's half of the protocol, with the same bookkeeping as
+        Client.main_gameplay_execution_loop: the first two cards are ours, the third is the
+        dealer's face-up card, then our hits until we stand; the rest is the dealer's.
+        """
+        self.decision_policy = decision_policy
+        self.rounds_completed = 0
+        self.results_by_code = {
+            consts.GAME_RESULT_INDICATOR_TIE: 0,
+            consts.GAME_RESULT_INDICATOR_PLAYER_LOSS: 0,
+            consts.GAME_RESULT_INDICATOR_PLAYER_WIN: 0,
+        }
+        self.reset_for_next_round()
+
+    def reset_for_next_round(self):
+        self.player_hand_points = 0
+        self.player_card_count = 0
+        self.dealer_visible_card_points = 0
+        self.has_dealer_visible_card_been_shown = False
+        self.is_it_my_turn = True
+
+    def receive_payloads(self, server_payloads):
+        """
+        Reads a batch of server payloads. Returns the decision packet to send back, or
+        None when the batch did not end with a question for us.
+        """
+        decision_packet = None
+        unpack_server_payload = protocol_codec.SERVER_PAYLOAD_STRUCT.unpack
+        for server_payload in server_payloads:
+            payload_cookie, payload_type, payload_result, card_rank_val, _ = unpack_server_payload(server_payload)
+            if payload_cookie != consts.PROTOCOL_MAGIC_COOKIE_IDENTIFIER or payload_type != consts.MESSAGE_TYPE_GAME_PAYLOAD:
+                raise ValueError("Invalid packet received")
+
+            if payload_result != consts.GAME_RESULT_INDICATOR_ROUND_STILL_ACTIVE:
+                self.rounds_completed += 1
+                self.results_by_code[payload_result] += 1
+                self.reset_for_next_round()
+            elif not self.is_it_my_turn:
+                # The dealer's cards
+                continue
+            elif self.player_card_count < 2:
+                self.player_hand_points += CARD_POINTS_BY_RANK[card_rank_val]
+                self.player_card_count += 1
+            elif not self.has_dealer_visible_card_been_shown:
+                self.has_dealer_visible_card_been_shown = True
+                self.dealer_visible_card_points = CARD_POINTS_BY_RANK[card_rank_val]
+                decision_packet = self.choose_decision_packet()
+            else:
+                self.player_hand_points += CARD_POINTS_BY_RANK[card_rank_val]
+                self.player_card_count += 1
+                decision_packet = self.choose_decision_packet()
+        return decision_packet
+
+    def choose_decision_packet(self):
+        # A bust hand gets its verdict without us saying anything
+        if self.player_hand_points > 21:
+            return None
+        if self.decision_policy.choose_action(self.player_hand_points, self.dealer_visible_card_points) == decision_policies.PLAYER_ACTION_HIT:
+            return protocol_codec.PREBUILT_DECISION_PAYLOADS[protocol_codec.PLAYER_DECISION_HIT]
+        self.is_it_my_turn = False
+        return protocol_codec.PREBUILT_DECISION_PAYLOADS[protocol_codec.PLAYER_DECISION_STAND]
+
+
+def play_in_memory_rounds(decision_policy, round_count, shoe_source, round_finished_callback=None):
+    """
+    Plays round_count rounds of one table against decision_policy and returns the
+    InMemoryPlayer with its tallies. shoe_source is anything with acquire_shoe()
+    (a ShuffledShoeSource, or a SeededShoeSource for a reproducible run).
+    """
+    def acquire_shoe_for_round(current_shoe):
+        if current_shoe is None or current_shoe.needs_replacement():
+            return shoe_source.acquire_shoe()
+        return current_shoe
+
+    server_payloads = []
+    in_memory_player = InMemoryPlayer(decision_policy)
+    table_session = BlackjackTableSession(
+        BlackjackRoundEngine(acquire_shoe_for_round),
+        protocol_codec.PREBUILT_CARD_PAYLOADS_BY_CARD_ID,
+        protocol_codec.PREBUILT_RESULT_PAYLOADS,
+        server_payloads.append,
+        round_finished_callback
+    )
+
+    is_waiting_for_player = table_session.start_batch(round_count)
+    while True:
+        decision_packet = in_memory_player.receive_payloads(server_payloads)
+        server_payloads.clear()
+        if not is_waiting_for_player:
+            break
+        if decision_packet is None:
+            raise RuntimeError("The table waits for a decision the player did not send")
+        _, _, player_decision_string = protocol_codec.decode_client_decision(decision_packet)
+        is_waiting_for_player = table_session.receive_decision(player_decision_string)
+    return in_memory_player
+
+
+def parse_command_line_arguments():
+    argument_parser = argparse.ArgumentParser(description="Play rounds in-process over the exact protocol, no sockets")
+    argument_parser.add_argument("--rounds", type=int, default=100000, help="rounds to play")
+    argument_parser.add_argument("--policy", default="threshold:17", help="threshold[:N], stand, random[:P] or table:PATH")
+    argument_parser.add_argument("--decks", type=int, default=1, help="decks per shoe, like server.py --decks")
+    argument_parser.add_argument("--seed", type=int, default=None, help="shuffle from this seed for a reproducible run")
+    return argument_parser.parse_args()
+
+
+if __name__ == "__main__":
+    command_line_arguments = parse_command_line_arguments()
+    if command_line_arguments.seed is None:
+        selected_shoe_source = ShuffledShoeSource(command_line_arguments.decks)
+    else:
+        selected_shoe_source = SeededShoeSource(command_line_arguments.decks, None, command_line_arguments.seed)
+
+    run_started_at = time.perf_counter()
+    finished_player = play_in_memory_rounds(
+        decision_policies.build_decision_policy(command_line_arguments.policy), command_line_arguments.rounds, selected_shoe_source
+    )
+    elapsed_seconds = time.perf_counter() - run_started_at
+
+    win_count = finished_player.results_by_code[consts.GAME_RESULT_INDICATOR_PLAYER_WIN]
+    print(
+        f"Played {finished_player.rounds_completed} rounds in {elapsed_seconds:.2f}s "
+        f"({finished_player.rounds_completed / elapsed_seconds:,.0f} rounds/s). "
+        f"Wins {win_count}, losses {finished_player.results_by_code[consts.GAME_RESULT_INDICATOR_PLAYER_LOSS]}, "
+        f"ties {finished_player.results_by_code[consts.GAME_RESULT_INDICATOR_TIE]} "
+        f"(win rate {win_count / max(finished_player.rounds_completed, 1):.3f})"
+    )
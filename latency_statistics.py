@@ -0,0 +1,42 @@
+"""
+latency_statistics.py
+Small helpers for turning raw latency samples (in seconds) into the numbers we care
+about: percentiles, mean and a printable one-line summary in milliseconds.
+"""
+
+
+def compute_latency_percentile(sorted_latency_samples, requested_percentile):
+    """
+    Nearest-rank percentile over an already sorted list. Returns 0.0 for no samples.
+    """
+    if not sorted_latency_samples:
+        return 0.0
+    sample_index = int(round(requested_percentile / 100.0 * (len(sorted_latency_samples) - 1)))
+    return sorted_latency_samples[sample_index]
+
+
+def summarize_latency_samples(latency_samples):
+    """
+    Returns a dict with count, mean, p50, p90, p99 and max (all in seconds).
+    """
+    sorted_latency_samples = sorted(latency_samples)
+    sample_count = len(sorted_latency_samples)
+    return {
+        "count": sample_count,
+        "mean": sum(sorted_latency_samples) / sample_count if sample_count else 0.0,
+        "p50": compute_latency_percentile(sorted_latency_samples, 50),
+        "p90": compute_latency_percentile(sorted_latency_samples, 90),
+        "p99": compute_latency_percentile(sorted_latency_samples, 99),
+        "max": sorted_latency_samples[-1] if sample_count else 0.0,
+    }
+
+
+def format_latency_summary(latency_summary):
+    return (
+        f"n={latency_summary['count']} "
+        f"mean={latency_summary['mean'] * 1000:.3f}ms "
+        f"p50={latency_summary['p50'] * 1000:.3f}ms "
+        f"p90={latency_summary['p90'] * 1000:.3f}ms "
+        f"p99={latency_summary['p99'] * 1000:.3f}ms "
+        f"max={latency_summary['max'] * 1000:.3f}ms"
+    )
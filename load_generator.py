@@ -0,0 +1,143 @@
+"""
+load_generator.py
+Opens N concurrent headless client sessions of R rounds each against one server and
+reports rounds/sec, connect latency, per-decision latency percentiles and errors.
+Every session is a real Client driven by a decision policy, so the exact same packet
+handling as a human player is exercised.
+
+Usage:
+    python load_generator.py --sessions 200 --rounds 50 --policy threshold:17
+    python load_generator.py --host 10.0.0.5 --port 40123 --sessions 1000
+Without --host/--port we wait for the first UDP offer, just like a player would.
+"""
+
+import argparse
+import threading
+import time
+
+import consts
+import decision_policies
+from client import Client
+from latency_statistics import summarize_latency_samples, format_latency_summary
+
+
+def run_load_test(server_ip, server_port, session_count, rounds_per_session, policy_specification, tables_per_session=1):
+    """
+    Plays all sessions at once (one thread each) and returns the finished Client objects
+    together with the wall-clock duration of the whole run. With tables_per_session > 1
+    every session multiplexes that many tables over its single connection.
+    """
+    bot_clients = [
+        Client(
+            decision_policy=decision_policies.build_decision_policy(policy_specification),
+            rounds_per_session=rounds_per_session,
+            player_display_name=f"LoadGen {session_index}",
+            is_output_quiet=True
+        )
+        for session_index in range(session_count)
+    ]
+
+    if tables_per_session > 1:
+        session_threads = [
+            threading.Thread(target=bot_client.play_multiplexed_session_against, args=(server_ip, server_port, tables_per_session), daemon=True)
+            for bot_client in bot_clients
+        ]
+    else:
+        session_threads = [
+            threading.Thread(target=bot_client.play_session_against, args=(server_ip, server_port), daemon=True)
+            for bot_client in bot_clients
+        ]
+
+    load_test_started_at = time.perf_counter()
+    for session_thread in session_threads:
+        session_thread.start()
+    for session_thread in session_threads:
+        session_thread.join()
+    elapsed_seconds = time.perf_counter() - load_test_started_at
+
+    return bot_clients, elapsed_seconds
+
+
+def print_load_test_report(bot_clients, elapsed_seconds, rounds_per_session, tables_per_session=1):
+    total_rounds_played = sum(bot_client.rounds_completed_in_last_session for bot_client in bot_clients)
+    total_wins = sum(bot_client.wins_in_last_session for bot_client in bot_clients)
+
+    connect_latencies = [
+        bot_client.connect_latency_seconds for bot_client in bot_clients
+        if bot_client.connect_latency_seconds is not None
+    ]
+    decision_latencies = [
+        latency_sample for bot_client in bot_clients
+        for latency_sample in bot_client.decision_latency_samples
+    ]
+
+    # A session counts as failed if it reported an error or quit early
+    failed_sessions = [
+        bot_client for bot_client in bot_clients
+        if bot_client.last_session_error is not None or bot_client.rounds_completed_in_last_session < rounds_per_session * tables_per_session
+    ]
+
+    print(f"Sessions:            {len(bot_clients)} ({len(failed_sessions)} with errors)")
+    print(f"Rounds played:       {total_rounds_played} in {elapsed_seconds:.2f}s")
+    print(f"Throughput:          {total_rounds_played / elapsed_seconds if elapsed_seconds else 0.0:.1f} rounds/sec")
+    print(f"Win rate:            {total_wins}/{total_rounds_played}")
+    print(f"Connect latency:     {format_latency_summary(summarize_latency_samples(connect_latencies))}")
+    print(f"Decision latency:    {format_latency_summary(summarize_latency_samples(decision_latencies))}")
+
+    # Group identical errors so a thousand timeouts print as one line
+    error_counts = {}
+    for failed_client in failed_sessions:
+        error_text = failed_client.last_session_error or "Session ended before all rounds were played"
+        error_counts[error_text] = error_counts.get(error_text, 0) + 1
+    for error_text, error_count in sorted(error_counts.items(), key=lambda item: -item[1]):
+        print(f"  {error_count:6d} x {error_text}")
+
+
+def parse_command_line_arguments():
+    argument_parser = argparse.ArgumentParser(description="Concurrent headless load generator for the Blackjack server")
+    argument_parser.add_argument("--host", default=None, help="server IP (default: wait for a UDP offer)")
+    argument_parser.add_argument("--port", type=int, default=None, help="server TCP port (default: from the UDP offer)")
+    argument_parser.add_argument("--sessions", type=int, default=100, help="number of concurrent sessions")
+    argument_parser.add_argument("--rounds", type=int, default=20, help="rounds per session, per table when multiplexing (1-255)")
+    argument_parser.add_argument(
+        "--tables", type=int, default=1,
+        help="tables multiplexed over each session's single connection (1 = classic protocol)"
+    )
+    argument_parser.add_argument(
+        "--policy", default="threshold:17",
+        help="decision policy: threshold[:N], stand, random[:P] or table:PATH"
+    )
+    command_line_arguments = argument_parser.parse_args()
+
+    if not 1 <= command_line_arguments.rounds <= 255:
+        argument_parser.error("--rounds must be between 1 and 255")
+    if not 1 <= command_line_arguments.tables <= consts.MAX_MULTIPLEXED_TABLES_PER_CONNECTION:
+        argument_parser.error(f"--tables must be between 1 and {consts.MAX_MULTIPLEXED_TABLES_PER_CONNECTION}")
+    if (command_line_arguments.host is None) != (command_line_arguments.port is None):
+        argument_parser.error("--host and --port go together")
+    return command_line_arguments
+
+
+if __name__ == "__main__":
+    command_line_arguments = parse_command_line_arguments()
+
+    target_server_ip = command_line_arguments.host
+    target_server_port = command_line_arguments.port
+    if target_server_ip is None:
+        discovery_client = Client()
+        discovery_client.wait_for_server_offer()
+        target_server_ip = discovery_client.target_server_ip
+        target_server_port = discovery_client.target_server_port
+        discovery_client.offer_discovery_cache.close()
+
+    print(f"Starting {command_line_arguments.sessions} sessions x {command_line_arguments.tables} tables x "
+          f"{command_line_arguments.rounds} rounds against {target_server_ip}:{target_server_port}")
+    finished_clients, total_elapsed_seconds = run_load_test(
+        target_server_ip,
+        target_server_port,
+        command_line_arguments.sessions,
+        command_line_arguments.rounds,
+        command_line_arguments.policy,
+        command_line_arguments.tables
+    )
+    print_load_test_report(finished_clients, total_elapsed_seconds, command_line_arguments.rounds, command_line_arguments.tables)
@@ -0,0 +1,150 @@
+"""
+network_interfaces.py
+Finds this machine's IPv4 interfaces and their broadcast addresses locally, without
+sending a single packet: no route to 8.8.8.8 or working DNS needed, so air-gapped and
+multi-homed hosts work like any other. On Linux every interface is asked through
+ioctl (flags, address, netmask, broadcast address). Elsewhere we fall back to the
+address the routing table picks for outside traffic, which connect() on a UDP socket
+reveals without transmitting anything.
+
+The list is read once per process and cached, since the server picks its interfaces
+once at start. select_broadcast_interfaces() turns the --interfaces option into the
+interfaces the server announces itself on.
+"""
+
+import functools
+import ipaddress
+import socket
+import struct
+import sys
+
+try:
+    # Unix only; without it we use the routing table fallback
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Linux ioctl requests on an ifreq (sockios.h) and the interface flags (if.h) we look at
+SIOCGIFFLAGS = 0x8913
+SIOCGIFADDR = 0x8915
+SIOCGIFBRDADDR = 0x8919
+SIOCGIFNETMASK = 0x891B
+IFF_UP = 0x1
+IFF_BROADCAST = 0x2
+IFF_LOOPBACK = 0x8
+
+# struct ifreq: the name (16 bytes) followed by a 24 byte union; a sockaddr_in keeps its IPv4 address at bytes 20..24
+IFREQ_NAME_SIZE = 16
+IFREQ_STRUCT = struct.Struct("16s24x")
+IFREQ_FLAGS_STRUCT = struct.Struct("16xH")
+IFREQ_IPV4_ADDRESS_SLICE = slice(20, 24)
+
+LIMITED_BROADCAST_ADDRESS = "255.255.255.255"
+
+
+class NetworkInterface:
+    __slots__ = ("interface_name", "ip_address", "broadcast_address", "is_loopback")
+
+    def __init__(self, interface_name, ip_address, broadcast_address, is_loopback=False):
+        self.interface_name = interface_name
+        self.ip_address = ip_address
+        self.broadcast_address = broadcast_address
+        self.is_loopback = is_loopback
+
+    def __repr__(self):
+        return f"NetworkInterface({self.interface_name!r}, {self.ip_address!r}, broadcast {self.broadcast_address!r})"
+
+
+def query_interface(query_socket, interface_name, ioctl_request):
+    request_bytes = IFREQ_STRUCT.pack(interface_name.encode("utf-8")[:IFREQ_NAME_SIZE - 1])
+    return fcntl.ioctl(query_socket.fileno(), ioctl_request, request_bytes)
+
+
+def query_interface_ipv4_address(query_socket, interface_name, ioctl_request):
+    return socket.inet_ntoa(query_interface(query_socket, interface_name, ioctl_request)[IFREQ_IPV4_ADDRESS_SLICE])
+
+
+def list_interfaces_with_ioctl():
+    """
+    Every interface that is up and has an IPv4 address (its primary one; labelled
+    aliases like eth0:1 are not listed).
+    """
+    found_interfaces = []
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as query_socket:
+        for _, interface_name in socket.if_nameindex():
+            try:
+                (interface_flags,) = IFREQ_FLAGS_STRUCT.unpack_from(query_interface(query_socket, interface_name, SIOCGIFFLAGS))
+                if not interface_flags & IFF_UP:
+                    continue
+                ip_address = query_interface_ipv4_address(query_socket, interface_name, SIOCGIFADDR)
+                if interface_flags & IFF_BROADCAST:
+                    broadcast_address = query_interface_ipv4_address(query_socket, interface_name, SIOCGIFBRDADDR)
+                else:
+                    # Loopback and point-to-point links have no broadcast address of their own
+                    netmask = query_interface_ipv4_address(query_socket, interface_name, SIOCGIFNETMASK)
+                    broadcast_address = str(ipaddress.IPv4Network(f"{ip_address}/{netmask}", strict=False).broadcast_address)
+                    if broadcast_address == ip_address:
+                        broadcast_address = LIMITED_BROADCAST_ADDRESS
+            except OSError:
+                # No IPv4 address (EADDRNOTAVAIL), or gone since if_nameindex()
+                continue
+            found_interfaces.append(NetworkInterface(interface_name, ip_address, broadcast_address, bool(interface_flags & IFF_LOOPBACK)))
+    return found_interfaces
+
+
+def guess_interface_from_routing_table():
+    """
+    The interface the OS would use for outside traffic. connect() on a UDP socket only
+    consults the routing table, nothing is sent; with no route at all we get loopback.
+    """
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as route_probe_socket:
+            route_probe_socket.connect(("192.0.2.1", 9))
+            ip_address = route_probe_socket.getsockname()[0]
+    except OSError:
+        ip_address = "127.0.0.1"
+    is_loopback = ipaddress.IPv4Address(ip_address).is_loopback
+    return [NetworkInterface("lo" if is_loopback else "default", ip_address, LIMITED_BROADCAST_ADDRESS, is_loopback)]
+
+
+@functools.lru_cache(maxsize=1)
+def list_network_interfaces():
+    """
+    All IPv4 interfaces that are up, loopback included. Cached for the process.
+    """
+    if fcntl is not None and sys.platform.startswith("linux"):
+        try:
+            found_interfaces = list_interfaces_with_ioctl()
+        except OSError:
+            found_interfaces = []
+        if found_interfaces:
+            return tuple(found_interfaces)
+    return tuple(guess_interface_from_routing_table())
+
+
+def select_broadcast_interfaces(requested_interfaces=None):
+    """
+    requested_interfaces is a list of interface names or IPv4 addresses. Without one
+    we take every interface except loopback, or loopback if that is all there is.
+    Raises ValueError for a name or address this machine does not have.
+    """
+    available_interfaces = list_network_interfaces()
+    if not requested_interfaces:
+        outside_interfaces = [network_interface for network_interface in available_interfaces if not network_interface.is_loopback]
+        return outside_interfaces or list(available_interfaces)
+
+    selected_interfaces = []
+    for requested_interface in requested_interfaces:
+        matching_interfaces = [
+            network_interface for network_interface in available_interfaces
+            if requested_interface in (network_interface.interface_name, network_interface.ip_address)
+        ]
+        if not matching_interfaces:
+            available_descriptions = ", ".join(
+                f"{network_interface.interface_name} ({network_interface.ip_address})" for network_interface in available_interfaces
+            )
+            raise ValueError(f"No IPv4 interface '{requested_interface}', available: {available_descriptions}")
+        selected_interfaces.extend(
+            network_interface for network_interface in matching_interfaces if network_interface not in selected_interfaces
+        )
+    return selected_interfaces
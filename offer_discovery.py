@@ -0,0 +1,173 @@
+"""
+offer_discovery.py
+Client-side cache of dealer offers heard on UDP 13122.
+One discovery socket stays open for the life of the client, so offers keep piling
+up in the kernel buffer while we play; the next lookup just drains them instead of
+waiting for a fresh broadcast. Offers are deduplicated per (ip, port), expire when
+a server goes quiet, and are handed out least-loaded first. Servers that only send
+the standard offer are still used, after the ones that told us their load.
+An offer is dated by when it can have arrived, not when we got round to reading it:
+whatever was already queued when we come back is only known to be younger than the
+last time we found the socket empty, so a server that died while we played expires
+on schedule instead of looking fresh.
+Packets are told apart by size and type before unpacking, so junk on the port never
+costs an exception.
+"""
+
+import select
+import socket
+import time
+
+import consts
+import protocol_codec
+
+
+class ServerOffer:
+    __slots__ = ("server_ip", "tcp_port", "server_name", "active_session_count", "session_capacity", "last_seen_at")
+
+    def __init__(self, server_ip, tcp_port, server_name, active_session_count=None, session_capacity=0, last_seen_at=0.0):
+        """
+        active_session_count stays None for servers that only send the standard offer.
+        """
+        self.server_ip = server_ip
+        self.tcp_port = tcp_port
+        self.server_name = server_name
+        self.active_session_count = active_session_count
+        self.session_capacity = session_capacity
+        self.last_seen_at = last_seen_at
+
+    def has_load_information(self):
+        return self.active_session_count is not None
+
+    def is_at_capacity(self):
+        return self.has_load_information() and 0 < self.session_capacity <= self.active_session_count
+
+    def selection_sort_key(self):
+        """
+        Known and not full first, then the emptiest (as a share of capacity when one is
+        given), and servers without load information last.
+        """
+        if not self.has_load_information():
+            return (1, False, 0.0, 0)
+        load_fraction = self.active_session_count / self.session_capacity if self.session_capacity else 0.0
+        return (0, self.is_at_capacity(), load_fraction, self.active_session_count)
+
+
+class OfferDiscoveryCache:
+    def __init__(self, collection_window_seconds=consts.OFFER_COLLECTION_WINDOW_IN_SECONDS, expiry_seconds=consts.OFFER_CACHE_EXPIRY_IN_SECONDS):
+        self.collection_window_seconds = collection_window_seconds
+        self.expiry_seconds = expiry_seconds
+        self.discovery_socket = None
+        self.offers_by_server_address = {}
+        # The last time we saw the socket with nothing queued: the oldest a queued offer can be
+        self.socket_emptied_at = 0.0
+
+    def open_discovery_socket(self):
+        if self.discovery_socket is not None:
+            return
+        self.discovery_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            # Need REUSEPORT to allow multiple clients on one machine if needed
+            self.discovery_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        except AttributeError:
+            # Fallback for Windows which uses REUSEADDR
+            self.discovery_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.discovery_socket.bind(("", consts.LISTENING_UDP_PORT_FOR_CLIENT_DISCOVERY))
+        self.socket_emptied_at = time.monotonic()
+
+    def close(self):
+        if self.discovery_socket is not None:
+            self.discovery_socket.close()
+            self.discovery_socket = None
+
+    def record_offer_datagram(self, raw_udp_data, sender_ip, received_at):
+        """
+        Parses one datagram and updates the cache. Returns True if it was a valid offer.
+        An extended offer carries everything the standard one does, so whichever arrives
+        last refreshes the entry, but a standard offer never erases known load numbers.
+        """
+        packet_length = len(raw_udp_data)
+        if packet_length == protocol_codec.EXTENDED_OFFER_PACKET_SIZE:
+            cookie_val, msg_type_val, server_tcp_port, server_name, active_session_count, session_capacity = (
+                protocol_codec.decode_extended_offer_packet(raw_udp_data)
+            )
+            if cookie_val != consts.PROTOCOL_MAGIC_COOKIE_IDENTIFIER or msg_type_val != consts.MESSAGE_TYPE_EXTENDED_OFFER_ANNOUNCEMENT:
+                return False
+        elif packet_length == protocol_codec.OFFER_PACKET_SIZE:
+            cookie_val, msg_type_val, server_tcp_port, server_name = protocol_codec.decode_offer_packet(raw_udp_data)
+            if cookie_val != consts.PROTOCOL_MAGIC_COOKIE_IDENTIFIER or msg_type_val != consts.MESSAGE_TYPE_OFFER_ANNOUNCEMENT:
+                return False
+            active_session_count = session_capacity = None
+        else:
+            return False
+
+        server_address = (sender_ip, server_tcp_port)
+        cached_offer = self.offers_by_server_address.get(server_address)
+        if cached_offer is None:
+            cached_offer = ServerOffer(sender_ip, server_tcp_port, server_name)
+            self.offers_by_server_address[server_address] = cached_offer
+
+        cached_offer.server_name = server_name
+        # A backlog offer can be dated before a live one we already read
+        cached_offer.last_seen_at = max(cached_offer.last_seen_at, received_at)
+        if active_session_count is not None:
+            cached_offer.active_session_count = active_session_count
+            cached_offer.session_capacity = session_capacity
+        return True
+
+    def receive_offers_until(self, deadline):
+        """
+        Reads offers until deadline (None = until the socket has nothing more queued).
+        Returns how many valid offers arrived.
+        """
+        valid_offer_count = 0
+        # First the backlog, which may have sat in the buffer for as long as we were away
+        backlog_queued_since = self.socket_emptied_at
+        while select.select([self.discovery_socket], [], [], 0.0)[0]:
+            raw_udp_data, sender_address_tuple = self.discovery_socket.recvfrom(consts.NETWORK_BUFFER_SIZE_IN_BYTES)
+            if self.record_offer_datagram(raw_udp_data, sender_address_tuple[0], backlog_queued_since):
+                valid_offer_count += 1
+        self.socket_emptied_at = time.monotonic()
+
+        # Then whatever comes in while we wait, read as soon as it arrives
+        while deadline is not None:
+            readable_sockets, _, _ = select.select([self.discovery_socket], [], [], max(0.0, deadline - time.monotonic()))
+            if not readable_sockets:
+                break
+            raw_udp_data, sender_address_tuple = self.discovery_socket.recvfrom(consts.NETWORK_BUFFER_SIZE_IN_BYTES)
+            if self.record_offer_datagram(raw_udp_data, sender_address_tuple[0], time.monotonic()):
+                valid_offer_count += 1
+        self.socket_emptied_at = time.monotonic()
+        return valid_offer_count
+
+    def forget_expired_offers(self):
+        expired_before = time.monotonic() - self.expiry_seconds
+        for server_address, cached_offer in list(self.offers_by_server_address.items()):
+            if cached_offer.last_seen_at < expired_before:
+                del self.offers_by_server_address[server_address]
+
+    def forget_server(self, server_offer):
+        """
+        Called after a failed connect, so the server is not picked again until it
+        broadcasts another offer.
+        """
+        self.offers_by_server_address.pop((server_offer.server_ip, server_offer.tcp_port), None)
+
+    def find_candidate_servers(self):
+        """
+        Returns every live offer, best candidate first. Blocks until at least one server
+        is known; after the first offer of an empty cache we listen for one collection
+        window more so we have something to compare it with.
+        """
+        self.open_discovery_socket()
+
+        # Whatever arrived while we were busy playing is already waiting in the socket
+        self.receive_offers_until(None)
+        self.forget_expired_offers()
+
+        if not self.offers_by_server_address:
+            while not self.offers_by_server_address:
+                self.receive_offers_until(time.monotonic() + consts.OFFER_BROADCAST_INTERVAL_IN_SECONDS)
+            self.receive_offers_until(time.monotonic() + self.collection_window_seconds)
+
+        return sorted(self.offers_by_server_address.values(), key=ServerOffer.selection_sort_key)
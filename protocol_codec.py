@@ -0,0 +1,284 @@
+"""
+protocol_codec.py
+Precompiled encoders/decoders for every packet format defined in consts.py.
+The format strings are parsed exactly once here (struct.Struct), and since the game
+can only ever send 52 different cards, 3 results and 2 decisions, every one of those
+payloads is packed once at import time and reused as an immutable bytes object.
+"""
+
+import struct
+import consts
+from card_shoe import CARDS_PER_DECK, CARD_RANK_BY_ID, CARD_SUIT_BY_ID
+
+# Precompiled packet layouts
+
+OFFER_PACKET_STRUCT = struct.Struct(consts.STRUCT_PACKING_FORMAT_FOR_OFFER)
+EXTENDED_OFFER_PACKET_STRUCT = struct.Struct(consts.STRUCT_PACKING_FORMAT_FOR_EXTENDED_OFFER)
+REQUEST_PACKET_STRUCT = struct.Struct(consts.STRUCT_PACKING_FORMAT_FOR_REQUEST)
+CLIENT_PAYLOAD_STRUCT = struct.Struct(consts.STRUCT_PACKING_FORMAT_FOR_CLIENT_PAYLOAD)
+SERVER_PAYLOAD_STRUCT = struct.Struct(consts.STRUCT_PACKING_FORMAT_FOR_SERVER_PAYLOAD)
+MULTIPLEXED_REQUEST_STRUCT = struct.Struct(consts.STRUCT_PACKING_FORMAT_FOR_MULTIPLEXED_REQUEST)
+MULTIPLEXED_CLIENT_PAYLOAD_STRUCT = struct.Struct(consts.STRUCT_PACKING_FORMAT_FOR_MULTIPLEXED_CLIENT_PAYLOAD)
+MULTIPLEXED_SERVER_PAYLOAD_STRUCT = struct.Struct(consts.STRUCT_PACKING_FORMAT_FOR_MULTIPLEXED_SERVER_PAYLOAD)
+
+OFFER_PACKET_SIZE = OFFER_PACKET_STRUCT.size
+EXTENDED_OFFER_PACKET_SIZE = EXTENDED_OFFER_PACKET_STRUCT.size
+REQUEST_PACKET_SIZE = REQUEST_PACKET_STRUCT.size
+CLIENT_PAYLOAD_SIZE = CLIENT_PAYLOAD_STRUCT.size
+SERVER_PAYLOAD_SIZE = SERVER_PAYLOAD_STRUCT.size
+MULTIPLEXED_REQUEST_SIZE = MULTIPLEXED_REQUEST_STRUCT.size
+MULTIPLEXED_CLIENT_PAYLOAD_SIZE = MULTIPLEXED_CLIENT_PAYLOAD_STRUCT.size
+MULTIPLEXED_SERVER_PAYLOAD_SIZE = MULTIPLEXED_SERVER_PAYLOAD_STRUCT.size
+
+# Every packet starts with Cookie(4), Type(1), which is enough to tell what the rest will look like
+PACKET_HEADER_SIZE = 5
+PACKET_TYPE_OFFSET = 4
+
+# The server reads a standard request first; a multiplexed one then has this many bytes left
+MULTIPLEXED_REQUEST_TRAILER_SIZE = MULTIPLEXED_REQUEST_SIZE - REQUEST_PACKET_SIZE
+
+# Names are fixed 32 byte fields, padded with zeros
+PADDED_NAME_FIELD_LENGTH = 32
+
+# Session counts in the extended offer are unsigned shorts
+MAX_ADVERTISED_SESSION_COUNT = 0xFFFF
+
+# The two decisions a player can send (5 chars each, per protocol)
+PLAYER_DECISION_HIT = "Hittt"
+PLAYER_DECISION_STAND = "Stand"
+
+# Prebuilt payload tables
+
+# Every card the server can deal, keyed by (rank, suit)
+PREBUILT_CARD_PAYLOADS = {
+    (card_rank_value, card_suit_id): SERVER_PAYLOAD_STRUCT.pack(
+        consts.PROTOCOL_MAGIC_COOKIE_IDENTIFIER,
+        consts.MESSAGE_TYPE_GAME_PAYLOAD,
+        consts.GAME_RESULT_INDICATOR_ROUND_STILL_ACTIVE,
+        card_rank_value,
+        card_suit_id
+    )
+    for card_suit_id in consts.CARD_SUITS_MAPPING_DICTIONARY
+    for card_rank_value in consts.CARD_RANKS_MAPPING_DICTIONARY
+}
+
+# The same card payloads indexed by compact card_id (see card_shoe.py)
+PREBUILT_CARD_PAYLOADS_BY_CARD_ID = tuple(
+    PREBUILT_CARD_PAYLOADS[(CARD_RANK_BY_ID[card_id], CARD_SUIT_BY_ID[card_id])]
+    for card_id in range(CARDS_PER_DECK)
+)
+
+# Every end-of-round verdict, keyed by result code (the card fields are zero)
+PREBUILT_RESULT_PAYLOADS = {
+    game_result_code: SERVER_PAYLOAD_STRUCT.pack(
+        consts.PROTOCOL_MAGIC_COOKIE_IDENTIFIER,
+        consts.MESSAGE_TYPE_GAME_PAYLOAD,
+        game_result_code,
+        0,
+        0
+    )
+    for game_result_code in (
+        consts.GAME_RESULT_INDICATOR_TIE,
+        consts.GAME_RESULT_INDICATOR_PLAYER_LOSS,
+        consts.GAME_RESULT_INDICATOR_PLAYER_WIN
+    )
+}
+
+# Both decisions the client can send, keyed by the decision string
+PREBUILT_DECISION_PAYLOADS = {
+    decision_string: CLIENT_PAYLOAD_STRUCT.pack(
+        consts.PROTOCOL_MAGIC_COOKIE_IDENTIFIER,
+        consts.MESSAGE_TYPE_GAME_PAYLOAD,
+        decision_string.encode('utf-8')
+    )
+    for decision_string in (PLAYER_DECISION_HIT, PLAYER_DECISION_STAND)
+}
+
+# The "server busy" notice, the same bytes for every rejected connection
+PREBUILT_SERVER_BUSY_PAYLOAD = SERVER_PAYLOAD_STRUCT.pack(
+    consts.PROTOCOL_MAGIC_COOKIE_IDENTIFIER,
+    consts.MESSAGE_TYPE_SERVER_BUSY,
+    0,
+    consts.SERVER_BUSY_RETRY_AFTER_IN_SECONDS,
+    0
+)
+
+# Multiplexed payloads, indexed by table id first (card payloads then by card_id)
+PREBUILT_MULTIPLEXED_CARD_PAYLOADS = tuple(
+    tuple(
+        MULTIPLEXED_SERVER_PAYLOAD_STRUCT.pack(
+            consts.PROTOCOL_MAGIC_COOKIE_IDENTIFIER,
+            consts.MESSAGE_TYPE_MULTIPLEXED_GAME_PAYLOAD,
+            table_id,
+            consts.GAME_RESULT_INDICATOR_ROUND_STILL_ACTIVE,
+            CARD_RANK_BY_ID[card_id],
+            CARD_SUIT_BY_ID[card_id]
+        )
+        for card_id in range(CARDS_PER_DECK)
+    )
+    for table_id in range(consts.MAX_MULTIPLEXED_TABLES_PER_CONNECTION)
+)
+
+PREBUILT_MULTIPLEXED_RESULT_PAYLOADS = tuple(
+    {
+        game_result_code: MULTIPLEXED_SERVER_PAYLOAD_STRUCT.pack(
+            consts.PROTOCOL_MAGIC_COOKIE_IDENTIFIER,
+            consts.MESSAGE_TYPE_MULTIPLEXED_GAME_PAYLOAD,
+            table_id,
+            game_result_code,
+            0,
+            0
+        )
+        for game_result_code in PREBUILT_RESULT_PAYLOADS
+    }
+    for table_id in range(consts.MAX_MULTIPLEXED_TABLES_PER_CONNECTION)
+)
+
+PREBUILT_MULTIPLEXED_DECISION_PAYLOADS = tuple(
+    {
+        decision_string: MULTIPLEXED_CLIENT_PAYLOAD_STRUCT.pack(
+            consts.PROTOCOL_MAGIC_COOKIE_IDENTIFIER,
+            consts.MESSAGE_TYPE_MULTIPLEXED_GAME_PAYLOAD,
+            table_id,
+            decision_string.encode('utf-8')
+        )
+        for decision_string in PREBUILT_DECISION_PAYLOADS
+    }
+    for table_id in range(consts.MAX_MULTIPLEXED_TABLES_PER_CONNECTION)
+)
+
+# Raw 5 byte decision field -> interned decision string, so decoding skips decode()/strip()
+_DECISION_STRINGS_BY_RAW_FIELD = {
+    decision_string.encode('utf-8'): decision_string
+    for decision_string in PREBUILT_DECISION_PAYLOADS
+}
+
+
+def pad_name_field(display_name):
+    return display_name.encode('utf-8')[:PADDED_NAME_FIELD_LENGTH].ljust(PADDED_NAME_FIELD_LENGTH, b'\0')
+
+
+def unpad_name_field(raw_name_bytes):
+    return raw_name_bytes.decode('utf-8', errors='replace').strip('\x00')
+
+
+# Encoders
+
+def encode_offer_packet(tcp_port_number, server_name):
+    return OFFER_PACKET_STRUCT.pack(
+        consts.PROTOCOL_MAGIC_COOKIE_IDENTIFIER,
+        consts.MESSAGE_TYPE_OFFER_ANNOUNCEMENT,
+        tcp_port_number,
+        pad_name_field(server_name)
+    )
+
+
+def encode_extended_offer_packet(tcp_port_number, server_name, active_session_count, session_capacity):
+    return EXTENDED_OFFER_PACKET_STRUCT.pack(
+        consts.PROTOCOL_MAGIC_COOKIE_IDENTIFIER,
+        consts.MESSAGE_TYPE_EXTENDED_OFFER_ANNOUNCEMENT,
+        tcp_port_number,
+        pad_name_field(server_name),
+        min(max(active_session_count, 0), MAX_ADVERTISED_SESSION_COUNT),
+        min(max(session_capacity, 0), MAX_ADVERTISED_SESSION_COUNT)
+    )
+
+
+def encode_request_packet(requested_rounds_count, team_name, request_message_type=consts.MESSAGE_TYPE_GAME_REQUEST):
+    return REQUEST_PACKET_STRUCT.pack(
+        consts.PROTOCOL_MAGIC_COOKIE_IDENTIFIER,
+        request_message_type,
+        requested_rounds_count,
+        pad_name_field(team_name)
+    )
+
+
+def encode_multiplexed_request_packet(rounds_per_table, team_name, table_count):
+    return MULTIPLEXED_REQUEST_STRUCT.pack(
+        consts.PROTOCOL_MAGIC_COOKIE_IDENTIFIER,
+        consts.MESSAGE_TYPE_MULTIPLEXED_GAME_REQUEST,
+        rounds_per_table,
+        pad_name_field(team_name),
+        table_count
+    )
+
+
+def encode_client_decision(decision_string):
+    prebuilt_payload = PREBUILT_DECISION_PAYLOADS.get(decision_string)
+    if prebuilt_payload is not None:
+        return prebuilt_payload
+
+    return CLIENT_PAYLOAD_STRUCT.pack(
+        consts.PROTOCOL_MAGIC_COOKIE_IDENTIFIER,
+        consts.MESSAGE_TYPE_GAME_PAYLOAD,
+        decision_string.encode('utf-8')
+    )
+
+
+# Decoders
+# All of them read in place with unpack_from, so callers can hand us a memoryview over
+# a receive buffer (plus an offset) and no intermediate bytes slice is ever created.
+
+def decode_offer_packet(packet_buffer, buffer_offset=0):
+    """
+    Returns (cookie, msg_type, tcp_port, server_name).
+    """
+    cookie_val, msg_type_val, server_tcp_port, server_name_bytes = OFFER_PACKET_STRUCT.unpack_from(packet_buffer, buffer_offset)
+    return cookie_val, msg_type_val, server_tcp_port, unpad_name_field(server_name_bytes)
+
+
+def decode_extended_offer_packet(packet_buffer, buffer_offset=0):
+    """
+    Returns (cookie, msg_type, tcp_port, server_name, active_sessions, session_capacity).
+    """
+    cookie_val, msg_type_val, server_tcp_port, server_name_bytes, active_session_count, session_capacity = (
+        EXTENDED_OFFER_PACKET_STRUCT.unpack_from(packet_buffer, buffer_offset)
+    )
+    return cookie_val, msg_type_val, server_tcp_port, unpad_name_field(server_name_bytes), active_session_count, session_capacity
+
+
+def decode_request_packet(packet_buffer, buffer_offset=0):
+    """
+    Returns (cookie, msg_type, rounds, team_name).
+    """
+    cookie_val, msg_type_val, requested_rounds_count, raw_team_name_bytes = REQUEST_PACKET_STRUCT.unpack_from(packet_buffer, buffer_offset)
+    return cookie_val, msg_type_val, requested_rounds_count, unpad_name_field(raw_team_name_bytes)
+
+
+# Returns (cookie, msg_type, result, rank, suit). Bound once so the per-card path skips
+# the attribute lookup. Apart from the cookie, every field is a small cached int.
+decode_server_payload = SERVER_PAYLOAD_STRUCT.unpack_from
+
+
+# Returns (cookie, msg_type, table_id, result, rank, suit)
+decode_multiplexed_server_payload = MULTIPLEXED_SERVER_PAYLOAD_STRUCT.unpack_from
+
+
+def decode_multiplexed_request_trailer(packet_buffer, buffer_offset=0):
+    """
+    The table count that follows the standard request fields of a multiplexed request.
+    """
+    return packet_buffer[buffer_offset]
+
+
+def decode_multiplexed_client_decision(packet_buffer, buffer_offset=0):
+    """
+    Returns (cookie, msg_type, table_id, decision_string).
+    """
+    cookie_val, msg_type_val, table_id, raw_decision_field = MULTIPLEXED_CLIENT_PAYLOAD_STRUCT.unpack_from(packet_buffer, buffer_offset)
+    decision_string = _DECISION_STRINGS_BY_RAW_FIELD.get(raw_decision_field)
+    if decision_string is None:
+        decision_string = unpad_name_field(raw_decision_field)
+    return cookie_val, msg_type_val, table_id, decision_string
+
+
+def decode_client_decision(packet_buffer, buffer_offset=0):
+    """
+    Returns (cookie, msg_type, decision_string). Known decisions map straight to the
+    interned strings above.
+    """
+    cookie_val, msg_type_val, raw_decision_field = CLIENT_PAYLOAD_STRUCT.unpack_from(packet_buffer, buffer_offset)
+    decision_string = _DECISION_STRINGS_BY_RAW_FIELD.get(raw_decision_field)
+    if decision_string is None:
+        decision_string = unpad_name_field(raw_decision_field)
+    return cookie_val, msg_type_val, decision_string
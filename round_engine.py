@@ -0,0 +1,202 @@
+"""
+round_engine.py
+The rules of one Blackjack table as a small state machine with no networking in it.
+Decisions go in, round events come out: (event kind, card_id) for every card the
+player has to see and (ROUND_EVENT_ROUND_RESULT, result code) for the verdict.
+BlackjackTableSession wraps an engine for one table of a session: it plays batches of
+rounds and turns the events into the prebuilt wire payloads. Every transport (threaded
+and async sessions, multiplexed tables, in_memory_transport.py) only moves those bytes
+and the player's decisions; none of them knows the rules.
+
+House rules, same as everywhere else: Ace is ALWAYS 11, face cards are 10, the dealer
+hits below 17 and never plays against a busted player.
+"""
+
+import time
+
+import consts
+import protocol_codec
+from card_shoe import RunningHand
+
+ROUND_EVENT_PLAYER_CARD = "player_card"
+ROUND_EVENT_DEALER_UP_CARD = "dealer_up_card"
+ROUND_EVENT_DEALER_HIDDEN_REVEAL = "dealer_hidden_reveal"
+ROUND_EVENT_DEALER_DRAW = "dealer_draw"
+ROUND_EVENT_ROUND_RESULT = "round_result"
+
+DEALER_STANDS_ON_POINTS = 17
+
+
+def determine_round_result(final_player_score, dealer_total_score, did_player_bust):
+    """
+    Decides who won the round. Returns the result code for the client together
+    with a short human readable summary for the server log.
+    """
+    if did_player_bust:
+        return consts.GAME_RESULT_INDICATOR_PLAYER_LOSS, "Player Bust! Dealer Wins."
+
+    if dealer_total_score > 21:
+        return consts.GAME_RESULT_INDICATOR_PLAYER_WIN, "Dealer Bust! Player Wins."
+
+    if final_player_score > dealer_total_score:
+        return consts.GAME_RESULT_INDICATOR_PLAYER_WIN, f"Player ({final_player_score}) > Dealer ({dealer_total_score}). Player Wins."
+
+    if dealer_total_score > final_player_score:
+        return consts.GAME_RESULT_INDICATOR_PLAYER_LOSS, f"Dealer ({dealer_total_score}) > Player ({final_player_score}). Dealer Wins."
+
+    return consts.GAME_RESULT_INDICATOR_TIE, f"Tie ({final_player_score})."
+
+
+class BlackjackRoundEngine:
+    def __init__(self, acquire_shoe_for_round):
+        """
+        acquire_shoe_for_round(current_shoe) returns the shoe to deal the next round
+        from (Server.acquire_shoe_for_round keeps a shoe until its cut card).
+        """
+        self.acquire_shoe_for_round = acquire_shoe_for_round
+        self.current_shoe = None
+        self.cards_held_by_player = None
+        self.cards_held_by_dealer = None
+        self.dealer_hidden_card = None
+        self.is_waiting_for_player_decision = False
+        self.did_player_bust = False
+        self.final_round_result = None
+        self.round_summary_text = None
+
+    def start_round(self, round_events):
+        """
+        Deals two cards to the player and two to the dealer. Appends the player's cards
+        and the dealer's face-up card to round_events; a player who is already bust
+        (two Aces) gets the verdict right away.
+        """
+        self.current_shoe = self.acquire_shoe_for_round(self.current_shoe)
+        self.cards_held_by_player = RunningHand()
+        self.cards_held_by_dealer = RunningHand()
+        self.did_player_bust = False
+        self.final_round_result = None
+        self.round_summary_text = None
+
+        for _ in range(2):
+            self.deal_player_card(round_events)
+
+        dealer_visible_card = self.current_shoe.deal_card()
+        self.dealer_hidden_card = self.current_shoe.deal_card()
+        self.cards_held_by_dealer.add_card(dealer_visible_card)
+        self.cards_held_by_dealer.add_card(self.dealer_hidden_card)
+        round_events.append((ROUND_EVENT_DEALER_UP_CARD, dealer_visible_card))
+
+        self.continue_player_turn(round_events)
+
+    def deal_player_card(self, round_events):
+        player_card = self.current_shoe.deal_card()
+        self.cards_held_by_player.add_card(player_card)
+        round_events.append((ROUND_EVENT_PLAYER_CARD, player_card))
+
+    def continue_player_turn(self, round_events):
+        if self.cards_held_by_player.is_bust():
+            self.did_player_bust = True
+            self.finish_round(round_events)
+        else:
+            self.is_waiting_for_player_decision = True
+
+    def apply_player_decision(self, player_decision_string, round_events):
+        """
+        Hit deals one more card (and ends the round on a bust). Anything else counts as
+        a Stand, exactly like the original session loop.
+        """
+        self.is_waiting_for_player_decision = False
+        if player_decision_string == protocol_codec.PLAYER_DECISION_HIT:
+            self.deal_player_card(round_events)
+            self.continue_player_turn(round_events)
+        else:
+            self.finish_round(round_events)
+
+    def finish_round(self, round_events):
+        if not self.did_player_bust:
+            round_events.append((ROUND_EVENT_DEALER_HIDDEN_REVEAL, self.dealer_hidden_card))
+            while self.cards_held_by_dealer.total_points < DEALER_STANDS_ON_POINTS:
+                dealer_new_card = self.current_shoe.deal_card()
+                self.cards_held_by_dealer.add_card(dealer_new_card)
+                round_events.append((ROUND_EVENT_DEALER_DRAW, dealer_new_card))
+
+        self.final_round_result, self.round_summary_text = determine_round_result(
+            self.cards_held_by_player.total_points, self.cards_held_by_dealer.total_points, self.did_player_bust
+        )
+        round_events.append((ROUND_EVENT_ROUND_RESULT, self.final_round_result))
+
+
+class BlackjackTableSession:
+    __slots__ = (
+        "table_engine", "card_payloads", "result_payloads", "queue_outgoing_payload", "round_finished_callback",
+        "round_events", "rounds_left_in_batch", "rounds_finished", "round_payload_count",
+        "round_started_at", "player_turn_started_at", "last_decision_received_at"
+    )
+
+    def __init__(self, table_engine, card_payloads, result_payloads, queue_outgoing_payload, round_finished_callback=None):
+        """
+        card_payloads[card_id] and result_payloads[result code] are the table's prebuilt
+        packets from protocol_codec; every payload is handed to queue_outgoing_payload.
+        round_finished_callback(table_session), if given, runs once per round right after
+        its verdict was queued. The timestamps (perf_counter) let it time the phases.
+        """
+        self.table_engine = table_engine
+        self.card_payloads = card_payloads
+        self.result_payloads = result_payloads
+        self.queue_outgoing_payload = queue_outgoing_payload
+        self.round_finished_callback = round_finished_callback
+        self.round_events = []
+        self.rounds_left_in_batch = 0
+        self.rounds_finished = 0
+        self.round_payload_count = 0
+        self.round_started_at = 0.0
+        self.player_turn_started_at = 0.0
+        # None until the player answered in the current round
+        self.last_decision_received_at = None
+
+    def start_batch(self, round_count):
+        """
+        Deals until the player has to decide. Returns True while the table waits for a
+        decision, False once all round_count rounds are played.
+        """
+        self.rounds_left_in_batch = round_count
+        if not round_count:
+            return False
+        self.start_next_round()
+        return self.play_until_player_decision()
+
+    def receive_decision(self, player_decision_string):
+        # Only call while the table waits for a decision; anything but Hit counts as Stand
+        self.last_decision_received_at = time.perf_counter()
+        self.table_engine.apply_player_decision(player_decision_string, self.round_events)
+        return self.play_until_player_decision()
+
+    def start_next_round(self):
+        self.round_started_at = time.perf_counter()
+        self.last_decision_received_at = None
+        self.round_payload_count = 0
+        self.table_engine.start_round(self.round_events)
+        self.player_turn_started_at = time.perf_counter()
+
+    def play_until_player_decision(self):
+        while True:
+            self.queue_round_events()
+            if self.table_engine.is_waiting_for_player_decision:
+                return True
+
+            self.rounds_finished += 1
+            self.rounds_left_in_batch -= 1
+            if self.round_finished_callback is not None:
+                self.round_finished_callback(self)
+            if not self.rounds_left_in_batch:
+                return False
+            self.start_next_round()
+
+    def queue_round_events(self):
+        queue_outgoing_payload = self.queue_outgoing_payload
+        for round_event_kind, round_event_value in self.round_events:
+            if round_event_kind == ROUND_EVENT_ROUND_RESULT:
+                queue_outgoing_payload(self.result_payloads[round_event_value])
+            else:
+                queue_outgoing_payload(self.card_payloads[round_event_value])
+        self.round_payload_count += len(self.round_events)
+        self.round_events.clear()
@@ -0,0 +1,401 @@
+"""
+round_journal.py
+Append-only binary journal of every round the server plays, for audits and analysis.
+
+Each server process writes its own segment pairs into the journal directory:
+  journal-<writer>-<segment>.rounds    fixed-size round records (ROUND_RECORD_STRUCT)
+  journal-<writer>-<segment>.sessions  fixed-size session records (SESSION_RECORD_STRUCT)
+A round is a run of records in dealing order: player, player, dealer face-up, dealer
+hole card, then (Hit decision, player card) per hit, a Stand decision if the player
+did not bust, the dealer's draws and finally the result. A round is always written as
+one block, so rounds never interleave and the result record closes each one. Every
+record of a round carries the same timestamp, the moment the round was decided.
+
+Session threads only pack bytes and put them on a queue. One background thread writes
+them in groups (one write per group) and starts a new segment once the current one is
+full. The reader memory-maps the segments, never parses text, and indexes rounds by
+team name and time by looking only at the record-kind column.
+
+Usage: python round_journal.py JOURNAL_DIR [--team NAME] [--since UNIX] [--until UNIX] [--replay] [--limit N]
+"""
+
+import argparse
+import array
+import atexit
+import bisect
+import itertools
+import mmap
+import os
+import queue
+import re
+import struct
+import threading
+import time
+
+import consts
+import game_logging
+import protocol_codec
+from card_shoe import CARD_DISPLAY_NAMES_BY_ID
+
+# Round record: Timestamp in microseconds(8), Session(4), Round sequence in session(4), Table(1), Kind(1), Value(1), Reserved(1)
+ROUND_RECORD_STRUCT = struct.Struct("<qIIBBBB")
+ROUND_RECORD_SIZE = ROUND_RECORD_STRUCT.size
+ROUND_RECORD_KIND_OFFSET = 17
+
+# Session record: Session(4), Started at in microseconds(8), Team name(32)
+SESSION_RECORD_STRUCT = struct.Struct("<Iq32s")
+SESSION_RECORD_SIZE = SESSION_RECORD_STRUCT.size
+
+RECORD_KIND_PLAYER_CARD = 1
+RECORD_KIND_DEALER_UP_CARD = 2
+RECORD_KIND_DEALER_HOLE_CARD = 3
+RECORD_KIND_DEALER_DRAW = 4
+RECORD_KIND_PLAYER_DECISION = 5
+RECORD_KIND_ROUND_RESULT = 6
+
+# Value of a decision record
+DECISION_CODE_STAND = 0
+DECISION_CODE_HIT = 1
+
+RECORD_KIND_NAMES = {
+    RECORD_KIND_PLAYER_CARD: "player card",
+    RECORD_KIND_DEALER_UP_CARD: "dealer face-up",
+    RECORD_KIND_DEALER_HOLE_CARD: "dealer hole card",
+    RECORD_KIND_DEALER_DRAW: "dealer draws",
+    RECORD_KIND_PLAYER_DECISION: "player decides",
+    RECORD_KIND_ROUND_RESULT: "result",
+}
+DECISION_NAMES_BY_CODE = {DECISION_CODE_STAND: protocol_codec.PLAYER_DECISION_STAND, DECISION_CODE_HIT: protocol_codec.PLAYER_DECISION_HIT}
+RESULT_NAMES_BY_CODE = {
+    consts.GAME_RESULT_INDICATOR_PLAYER_WIN: "player wins",
+    consts.GAME_RESULT_INDICATOR_PLAYER_LOSS: "dealer wins",
+    consts.GAME_RESULT_INDICATOR_TIE: "tie",
+}
+
+DEFAULT_SEGMENT_SIZE_IN_BYTES = 64 * 1024 * 1024
+DEFAULT_FLUSH_INTERVAL_IN_SECONDS = 0.5
+DEFAULT_FLUSH_GROUP_SIZE_IN_BYTES = 256 * 1024
+
+SEGMENT_FILE_NAME_PATTERN = re.compile(r"^journal-(?P<writer>[\w.]+)-(?P<segment>\d{6})\.rounds$")
+
+server_logger = game_logging.get_server_logger()
+
+
+def current_time_in_microseconds():
+    return time.time_ns() // 1000
+
+
+class SessionJournal:
+    __slots__ = ("journal_writer", "session_id", "round_sequence")
+
+    def __init__(self, journal_writer, session_id):
+        self.journal_writer = journal_writer
+        self.session_id = session_id
+        self.round_sequence = 0
+
+    def record_round(self, player_card_ids, dealer_card_ids, final_round_result, did_player_bust, table_id=0):
+        """
+        Journals one finished round from both hands. The decisions follow from the
+        house rules: every player card after the second was a Hit, and a player who
+        did not bust stood (the server treats anything but Hit as a Stand).
+        """
+        self.round_sequence += 1
+        pack_record = ROUND_RECORD_STRUCT.pack
+        record_header = (current_time_in_microseconds(), self.session_id, self.round_sequence, table_id)
+
+        round_records = [
+            pack_record(*record_header, RECORD_KIND_PLAYER_CARD, player_card_ids[0], 0),
+            pack_record(*record_header, RECORD_KIND_PLAYER_CARD, player_card_ids[1], 0),
+            pack_record(*record_header, RECORD_KIND_DEALER_UP_CARD, dealer_card_ids[0], 0),
+            pack_record(*record_header, RECORD_KIND_DEALER_HOLE_CARD, dealer_card_ids[1], 0),
+        ]
+        for hit_card_id in itertools.islice(player_card_ids, 2, None):
+            round_records.append(pack_record(*record_header, RECORD_KIND_PLAYER_DECISION, DECISION_CODE_HIT, 0))
+            round_records.append(pack_record(*record_header, RECORD_KIND_PLAYER_CARD, hit_card_id, 0))
+        if not did_player_bust:
+            round_records.append(pack_record(*record_header, RECORD_KIND_PLAYER_DECISION, DECISION_CODE_STAND, 0))
+        for drawn_card_id in itertools.islice(dealer_card_ids, 2, None):
+            round_records.append(pack_record(*record_header, RECORD_KIND_DEALER_DRAW, drawn_card_id, 0))
+        round_records.append(pack_record(*record_header, RECORD_KIND_ROUND_RESULT, final_round_result, 0))
+
+        self.journal_writer.pending_writes.put((False, b"".join(round_records)))
+
+
+class RoundJournalWriter:
+    def __init__(self, journal_directory, segment_size_in_bytes=DEFAULT_SEGMENT_SIZE_IN_BYTES,
+                 flush_interval_seconds=DEFAULT_FLUSH_INTERVAL_IN_SECONDS, flush_group_size_in_bytes=DEFAULT_FLUSH_GROUP_SIZE_IN_BYTES):
+        """
+        One writer per process (a forked worker opens its own). Buffered bytes reach
+        the files once flush_group_size_in_bytes have piled up or flush_interval_seconds
+        have passed, whichever comes first.
+        """
+        self.journal_directory = journal_directory
+        self.segment_size_in_bytes = segment_size_in_bytes
+        self.flush_interval_seconds = flush_interval_seconds
+        self.flush_group_size_in_bytes = flush_group_size_in_bytes
+        # Unique per process and start, so restarted or parallel workers never share a file
+        self.writer_name = f"{int(time.time())}.{os.getpid()}"
+        self.next_session_id = itertools.count(1).__next__
+        # (is_session_record, packed bytes); None stops the writer thread
+        self.pending_writes = queue.SimpleQueue()
+        self.segment_number = 0
+        self.rounds_file = None
+        self.sessions_file = None
+        self.writer_thread = threading.Thread(target=self.write_groups_forever, name="round-journal-writer", daemon=True)
+
+    def start(self):
+        os.makedirs(self.journal_directory, exist_ok=True)
+        self.open_next_segment()
+        self.writer_thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """
+        Writes everything queued so far and closes the segment.
+        """
+        if self.writer_thread.is_alive():
+            self.pending_writes.put(None)
+            self.writer_thread.join(timeout=5)
+
+    def open_session(self, team_name):
+        # itertools.count.__next__ is atomic under the GIL, no lock needed for the id
+        session_journal = SessionJournal(self, self.next_session_id())
+        self.pending_writes.put((True, SESSION_RECORD_STRUCT.pack(
+            session_journal.session_id, current_time_in_microseconds(), protocol_codec.pad_name_field(team_name)
+        )))
+        return session_journal
+
+    def open_next_segment(self):
+        self.close_segment()
+        self.segment_number += 1
+        segment_path_prefix = os.path.join(self.journal_directory, f"journal-{self.writer_name}-{self.segment_number:06d}")
+        # Unbuffered: we hand over whole groups ourselves, one write each
+        self.rounds_file = open(segment_path_prefix + ".rounds", "ab", buffering=0)
+        self.sessions_file = open(segment_path_prefix + ".sessions", "ab", buffering=0)
+
+    def close_segment(self):
+        for segment_file in (self.rounds_file, self.sessions_file):
+            if segment_file is not None:
+                segment_file.close()
+        self.rounds_file = self.sessions_file = None
+
+    def write_groups_forever(self):
+        pending_round_bytes = []
+        pending_session_bytes = []
+        pending_byte_count = 0
+        flush_deadline = time.monotonic() + self.flush_interval_seconds
+        is_stopping = False
+
+        while not is_stopping:
+            try:
+                queued_write = self.pending_writes.get(timeout=max(0.0, flush_deadline - time.monotonic()))
+            except queue.Empty:
+                queued_write = False
+
+            if queued_write is None:
+                is_stopping = True
+            elif queued_write:
+                is_session_record, packed_bytes = queued_write
+                (pending_session_bytes if is_session_record else pending_round_bytes).append(packed_bytes)
+                pending_byte_count += len(packed_bytes)
+                if pending_byte_count < self.flush_group_size_in_bytes and time.monotonic() < flush_deadline:
+                    continue
+
+            try:
+                self.write_group(pending_round_bytes, pending_session_bytes)
+            except OSError as write_error:
+                # A full disk must not take the game down; the group is lost, the next one may succeed
+                server_logger.warning("Round journal write failed: %s", write_error)
+            pending_round_bytes.clear()
+            pending_session_bytes.clear()
+            pending_byte_count = 0
+            flush_deadline = time.monotonic() + self.flush_interval_seconds
+
+        self.close_segment()
+
+    def write_group(self, pending_round_bytes, pending_session_bytes):
+        # Sessions first, so a reader never sees rounds of a session it does not know yet
+        if pending_session_bytes:
+            self.sessions_file.write(b"".join(pending_session_bytes))
+        if pending_round_bytes:
+            self.rounds_file.write(b"".join(pending_round_bytes))
+            if self.rounds_file.tell() >= self.segment_size_in_bytes:
+                self.open_next_segment()
+
+
+class JournalSegment:
+    def __init__(self, rounds_file_path, writer_name, segment_number):
+        """
+        Memory-maps one .rounds file. A record cut short by a crash is ignored.
+        """
+        self.rounds_file_path = rounds_file_path
+        self.writer_name = writer_name
+        self.segment_number = segment_number
+        self.record_count = os.path.getsize(rounds_file_path) // ROUND_RECORD_SIZE
+        self.mapped_rounds = None
+        if self.record_count:
+            with open(rounds_file_path, "rb") as rounds_file:
+                self.mapped_rounds = mmap.mmap(rounds_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def record_kind_column(self):
+        # Every record's kind byte, in one C-level strided copy
+        return self.mapped_rounds[ROUND_RECORD_KIND_OFFSET:self.record_count * ROUND_RECORD_SIZE:ROUND_RECORD_SIZE]
+
+    def read_records(self, first_record_index, record_count):
+        start_offset = first_record_index * ROUND_RECORD_SIZE
+        return ROUND_RECORD_STRUCT.iter_unpack(self.mapped_rounds[start_offset:start_offset + record_count * ROUND_RECORD_SIZE])
+
+    def close(self):
+        if self.mapped_rounds is not None:
+            self.mapped_rounds.close()
+
+
+class RoundJournalReader:
+    def __init__(self, journal_directory):
+        """
+        Opens every segment in the directory and builds the index: one entry per
+        complete round (segment, first record, record count, time, team).
+        """
+        self.journal_directory = journal_directory
+        self.journal_segments = []
+        self.team_names_by_session = {}
+
+        self.round_segment_indexes = array.array("I")
+        self.round_first_records = array.array("I")
+        self.round_record_counts = array.array("H")
+        self.round_timestamps = array.array("q")
+        self.round_ids_by_team_name = {}
+
+        self.open_segments()
+        self.build_round_index()
+        # Round ids in time order, for bisecting time ranges
+        self.round_ids_by_time = array.array("I", sorted(range(len(self.round_timestamps)), key=self.round_timestamps.__getitem__))
+        self.sorted_round_timestamps = array.array("q", (self.round_timestamps[round_id] for round_id in self.round_ids_by_time))
+
+    def open_segments(self):
+        for file_name in sorted(os.listdir(self.journal_directory)):
+            file_name_match = SEGMENT_FILE_NAME_PATTERN.match(file_name)
+            if file_name_match is None:
+                continue
+            writer_name = file_name_match.group("writer")
+            rounds_file_path = os.path.join(self.journal_directory, file_name)
+            self.journal_segments.append(JournalSegment(rounds_file_path, writer_name, int(file_name_match.group("segment"))))
+
+            sessions_file_path = rounds_file_path[:-len(".rounds")] + ".sessions"
+            if os.path.exists(sessions_file_path):
+                with open(sessions_file_path, "rb") as sessions_file:
+                    session_bytes = sessions_file.read()
+                usable_length = len(session_bytes) - len(session_bytes) % SESSION_RECORD_SIZE
+                for session_id, _, raw_team_name in SESSION_RECORD_STRUCT.iter_unpack(session_bytes[:usable_length]):
+                    self.team_names_by_session[(writer_name, session_id)] = protocol_codec.unpad_name_field(raw_team_name)
+
+    def build_round_index(self):
+        result_kind_byte = bytes((RECORD_KIND_ROUND_RESULT,))
+        for segment_index, journal_segment in enumerate(self.journal_segments):
+            if not journal_segment.record_count:
+                continue
+            kind_column = journal_segment.record_kind_column()
+            round_first_record = 0
+            while True:
+                result_record_index = kind_column.find(result_kind_byte, round_first_record)
+                if result_record_index < 0:
+                    # Whatever follows the last result is a round the writer never finished
+                    break
+                round_started_at, session_id, _, _, _, _, _ = ROUND_RECORD_STRUCT.unpack_from(
+                    journal_segment.mapped_rounds, round_first_record * ROUND_RECORD_SIZE
+                )
+                team_name = self.team_names_by_session.get((journal_segment.writer_name, session_id), "Unknown")
+                round_id = len(self.round_timestamps)
+                self.round_segment_indexes.append(segment_index)
+                self.round_first_records.append(round_first_record)
+                self.round_record_counts.append(result_record_index - round_first_record + 1)
+                self.round_timestamps.append(round_started_at)
+                team_round_ids = self.round_ids_by_team_name.get(team_name)
+                if team_round_ids is None:
+                    team_round_ids = self.round_ids_by_team_name[team_name] = array.array("I")
+                team_round_ids.append(round_id)
+                round_first_record = result_record_index + 1
+
+    def round_count(self):
+        return len(self.round_timestamps)
+
+    def find_round_ids(self, team_name=None, since_microseconds=None, until_microseconds=None):
+        """
+        Round ids of one team and/or inside [since, until), in time order.
+        """
+        first_position = 0 if since_microseconds is None else bisect.bisect_left(self.sorted_round_timestamps, since_microseconds)
+        last_position = len(self.sorted_round_timestamps) if until_microseconds is None else bisect.bisect_left(self.sorted_round_timestamps, until_microseconds)
+        round_ids_in_range = self.round_ids_by_time[first_position:last_position]
+        if team_name is None:
+            return round_ids_in_range
+        team_round_ids = set(self.round_ids_by_team_name.get(team_name, ()))
+        return [round_id for round_id in round_ids_in_range if round_id in team_round_ids]
+
+    def read_round(self, round_id):
+        """
+        Returns the round's records as (timestamp_us, session_id, round_sequence, table_id, kind, value, reserved).
+        """
+        journal_segment = self.journal_segments[self.round_segment_indexes[round_id]]
+        return list(journal_segment.read_records(self.round_first_records[round_id], self.round_record_counts[round_id]))
+
+    def round_result(self, round_id):
+        journal_segment = self.journal_segments[self.round_segment_indexes[round_id]]
+        result_record_index = self.round_first_records[round_id] + self.round_record_counts[round_id] - 1
+        return journal_segment.mapped_rounds[result_record_index * ROUND_RECORD_SIZE + ROUND_RECORD_KIND_OFFSET + 1]
+
+    def close(self):
+        for journal_segment in self.journal_segments:
+            journal_segment.close()
+
+
+def describe_round_record(record_kind, record_value):
+    if record_kind == RECORD_KIND_PLAYER_DECISION:
+        return f"{RECORD_KIND_NAMES[record_kind]} {DECISION_NAMES_BY_CODE.get(record_value, record_value)}"
+    if record_kind == RECORD_KIND_ROUND_RESULT:
+        return f"{RECORD_KIND_NAMES[record_kind]}: {RESULT_NAMES_BY_CODE.get(record_value, record_value)}"
+    return f"{RECORD_KIND_NAMES.get(record_kind, record_kind)} {CARD_DISPLAY_NAMES_BY_ID[record_value]}"
+
+
+def parse_command_line_arguments():
+    argument_parser = argparse.ArgumentParser(description="Scan or replay a binary round journal")
+    argument_parser.add_argument("journal_directory", help="directory passed to server.py --journal-dir")
+    argument_parser.add_argument("--team", default=None, help="only rounds of this team name")
+    argument_parser.add_argument("--since", type=float, default=None, help="only rounds at or after this Unix time (seconds)")
+    argument_parser.add_argument("--until", type=float, default=None, help="only rounds before this Unix time (seconds)")
+    argument_parser.add_argument("--replay", action="store_true", help="print every card, decision and result")
+    argument_parser.add_argument("--limit", type=int, default=20, help="rounds to replay at most (default: 20)")
+    return argument_parser.parse_args()
+
+
+if __name__ == "__main__":
+    command_line_arguments = parse_command_line_arguments()
+    index_started_at = time.perf_counter()
+    journal_reader = RoundJournalReader(command_line_arguments.journal_directory)
+    print(f"Indexed {journal_reader.round_count()} rounds in {len(journal_reader.journal_segments)} segments "
+          f"({time.perf_counter() - index_started_at:.2f}s)")
+
+    selected_round_ids = journal_reader.find_round_ids(
+        command_line_arguments.team,
+        None if command_line_arguments.since is None else int(command_line_arguments.since * 1_000_000),
+        None if command_line_arguments.until is None else int(command_line_arguments.until * 1_000_000)
+    )
+    result_counts = {}
+    for round_id in selected_round_ids:
+        result_code = journal_reader.round_result(round_id)
+        result_counts[result_code] = result_counts.get(result_code, 0) + 1
+    print(f"Selected {len(selected_round_ids)} rounds: " + ", ".join(
+        f"{RESULT_NAMES_BY_CODE.get(result_code, result_code)} {result_count}" for result_code, result_count in sorted(result_counts.items())
+    ))
+
+    if command_line_arguments.replay:
+        for round_id in itertools.islice(selected_round_ids, command_line_arguments.limit):
+            round_records = journal_reader.read_round(round_id)
+            round_started_at, session_id, round_sequence, table_id, _, _, _ = round_records[0]
+            team_name = journal_reader.team_names_by_session.get(
+                (journal_reader.journal_segments[journal_reader.round_segment_indexes[round_id]].writer_name, session_id), "Unknown"
+            )
+            print(f"\n{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(round_started_at / 1_000_000))} "
+                  f"[{team_name}] session {session_id} round {round_sequence} table {table_id}")
+            for _, _, _, _, record_kind, record_value, _ in round_records:
+                print(f"  {describe_round_record(record_kind, record_value)}")
+    journal_reader.close()
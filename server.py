@@ -1,291 +1,1419 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
 import socket
 import threading
 import time
-import struct
 import consts
-import random
+import protocol_codec
+from frame_reader import BufferedFrameReader
+from packet_writer import CoalescingPacketWriter, enable_tcp_no_delay
+from card_shoe import ShuffledShoeSource, SeededShoeSource, derive_random_seed, CARD_DISPLAY_NAMES_BY_ID
+from round_engine import BlackjackRoundEngine, BlackjackTableSession
+import game_logging
+import logging
+import server_metrics
+from session_worker_pool import SessionWorkerPool, AsyncAdmissionGate, REJECTION_REASON_PENDING_HANDSHAKES
+from deadline_timer_wheel import HashedTimerWheel, SessionDeadlineManager
+from round_journal import RoundJournalWriter
+from team_leaderboard import TeamLeaderboard
+from session_profiler import SessionProfiler
+from network_interfaces import select_broadcast_interfaces
+from shared_tables import SharedDealerTable, SharedTableRegistry, SharedTableSeat, SEAT_STATE_DECIDING, SEAT_STATE_FINISHED
+import functools
+
+try:
+    # Only available on Unix, used to raise the open file limit for the async engine
+    import resource
+except ImportError:
+    resource = None
+
+server_logger = game_logging.get_server_logger()
+
 
 class Server:
-    def __init__(self):
+    def __init__(self, coalesce_outgoing_packets=True, enable_tcp_no_delay_on_clients=True, shoe_deck_count=1, shoe_cut_card_penetration=None,
+                 metrics_http_port=None, metrics_http_host="127.0.0.1", advertise_load_in_offers=False, advertised_session_capacity=None,
+                 max_concurrent_sessions=None, admission_queue_capacity=consts.DEFAULT_ADMISSION_QUEUE_CAPACITY,
+                 admission_queue_deadline_seconds=consts.DEFAULT_ADMISSION_QUEUE_DEADLINE_IN_SECONDS,
+                 handshake_deadline_seconds=consts.HANDSHAKE_DEADLINE_IN_SECONDS,
+                 player_decision_deadline_seconds=consts.PLAYER_DECISION_DEADLINE_IN_SECONDS,
+                 session_deadline_seconds=consts.SESSION_DEADLINE_IN_SECONDS,
+                 max_pending_handshakes_per_ip=consts.MAX_PENDING_HANDSHAKES_PER_SOURCE_IP, round_journal_directory=None,
+                 leaderboard_snapshot_path=None, leaderboard_snapshot_interval_seconds=consts.DEFAULT_LEADERBOARD_SNAPSHOT_INTERVAL_IN_SECONDS,
+                 deal_seed=None, shared_table_size=consts.DEFAULT_SHARED_TABLE_SIZE, broadcast_interface_names=None):
         """
         Setting up the server instance with necessary placeholders for network sockets
-        and identification data.
+        and identification data. Every other argument mirrors a command line option (see
+        parse_command_line_arguments); the two write flags only exist for benchmarks.
         """
         self.tcp_listening_port_number = 0
+        self.broadcast_interfaces = select_broadcast_interfaces(broadcast_interface_names)
         self.local_machine_ip_address = self.retrieve_network_interface_ip()
-        self.udp_broadcast_sender_socket = None
+        # One interface keeps the listener on its address; several need the wildcard
+        self.listening_ip_address = self.local_machine_ip_address if len(self.broadcast_interfaces) == 1 else ""
+        # (socket, broadcast address) per interface, opened where the offers are sent from
+        self.offer_broadcast_targets = []
         self.tcp_connection_listener_socket = None
         # Keeping the team name as requested
         self.participating_team_name = "Festigal Fantasia" 
+        self.is_write_coalescing_enabled = coalesce_outgoing_packets
+        self.is_tcp_no_delay_enabled = enable_tcp_no_delay_on_clients
+        self.shoe_source = ShuffledShoeSource(shoe_deck_count, shoe_cut_card_penetration)
+        self.deal_seed = deal_seed
+        self.seeded_session_counts_by_team = {}
+        self.seeded_session_counts_lock = threading.Lock()
+        self.shared_table_registry = None
+        if shared_table_size > 1:
+            self.shared_table_registry = SharedTableRegistry(shared_table_size, self.create_shared_table)
+        self.server_metrics = server_metrics.GameServerMetrics(
+            queued_session_count_callback=self.count_queued_sessions
+        )
+        self.metrics_http_port = metrics_http_port
+        self.metrics_http_host = metrics_http_host
+        self.metrics_http_server = None
+        self.is_load_advertising_enabled = advertise_load_in_offers
+        self.requested_max_concurrent_sessions = max_concurrent_sessions
+        # Settled by select_session_cap_for_engine once we know which engine runs the sessions
+        self.max_concurrent_sessions = consts.DEFAULT_MAX_CONCURRENT_SESSIONS if max_concurrent_sessions is None else max_concurrent_sessions
+        self.admission_queue_capacity = admission_queue_capacity
+        self.admission_queue_deadline_seconds = admission_queue_deadline_seconds
+        # Created where the sessions run (after fork, inside the event loop)
+        self.session_worker_pool = None
+        self.async_admission_gate = None
+        # The wheel's driver is started where the sessions run, like the worker pool
+        self.session_deadline_manager = SessionDeadlineManager(
+            HashedTimerWheel(),
+            handshake_deadline_seconds,
+            player_decision_deadline_seconds,
+            session_deadline_seconds,
+            max_pending_handshakes_per_ip,
+            self.server_metrics.record_deadline_expiration
+        )
+        self.round_journal_directory = round_journal_directory
+        self.round_journal_writer = None
+        self.team_leaderboard = TeamLeaderboard()
+        self.leaderboard_snapshot_path = leaderboard_snapshot_path
+        self.leaderboard_snapshot_interval_seconds = leaderboard_snapshot_interval_seconds
+        self.is_capacity_taken_from_session_cap = advertised_session_capacity is None
+        self.advertised_session_capacity = self.max_concurrent_sessions if advertised_session_capacity is None else advertised_session_capacity
+        # Pre-fork only: one slot per worker, written by the worker, summed by the supervisor
+        self.worker_active_session_counts = None
+        self.session_profiler = SessionProfiler.from_environment()
+
+    def select_session_cap_for_engine(self, use_async_engine):
+        """
+        Without an explicit max_concurrent_sessions every engine gets its own default: the
+        threaded pool keeps one thread per session and is capped low, while the async
+        engine is meant to hold tens of thousands of idle players in one process.
+        """
+        if self.requested_max_concurrent_sessions is None:
+            self.max_concurrent_sessions = (
+                consts.DEFAULT_MAX_CONCURRENT_ASYNC_SESSIONS if use_async_engine else consts.DEFAULT_MAX_CONCURRENT_SESSIONS
+            )
+        if self.is_capacity_taken_from_session_cap:
+            self.advertised_session_capacity = self.max_concurrent_sessions
 
     def retrieve_network_interface_ip(self):
         """
-        We need to figure out what IP address this machine is actually using to talk
-        to the outside world (like the internet), to avoid getting stuck with a
-        useless localhost or WSL address.
+        The address we report in the logs and bind to with a single interface: the first
+        selected one. The interfaces are read locally (and cached), so an offline or
+        air-gapped host no longer ends up on localhost, and startup never waits on the network.
         """
-        try:
-            # We create a dummy socket and try to reach a public DNS (Google)
-            # just to see which network interface the OS decides to use.
-            temp_socket_for_ip_check = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            temp_socket_for_ip_check.connect(("8.8.8.8", 80))
-            
-            detected_ip_address = temp_socket_for_ip_check.getsockname()[0]
-            temp_socket_for_ip_check.close()
-            
-            return detected_ip_address
-        except Exception:
-            # Fallback to localhost if we are completely offline
-            return "127.0.0.1"
+        return self.broadcast_interfaces[0].ip_address
+
+    def describe_broadcast_interfaces(self):
+        return ", ".join(
+            f"{network_interface.interface_name} {network_interface.ip_address} -> {network_interface.broadcast_address}"
+            for network_interface in self.broadcast_interfaces
+        )
+
+    def open_offer_broadcast_sockets(self):
+        """
+        One broadcast socket per selected interface, bound to its address so the offer
+        leaves through that interface and clients see an address they can connect to.
+        The sockets are kept and reused for every offer.
+        """
+        self.offer_broadcast_targets = []
+        for network_interface in self.broadcast_interfaces:
+            offer_broadcast_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            offer_broadcast_socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            offer_broadcast_socket.bind((network_interface.ip_address, 0))
+            self.offer_broadcast_targets.append(
+                (offer_broadcast_socket, (network_interface.broadcast_address, consts.LISTENING_UDP_PORT_FOR_CLIENT_DISCOVERY))
+            )
+        server_logger.info("Broadcasting offers on %s", self.describe_broadcast_interfaces())
+
+    def broadcast_offer_packets(self, offer_packets):
+        for offer_broadcast_socket, broadcast_destination in self.offer_broadcast_targets:
+            # One interface going down must not silence the others
+            try:
+                for offer_packet in offer_packets:
+                    offer_broadcast_socket.sendto(offer_packet, broadcast_destination)
+            except OSError as error_message:
+                server_logger.warning("Error broadcasting to %s: %s", broadcast_destination[0], error_message)
 
     def start_server(self):
         """
         Fires up the main TCP listener and kicks off the background thread that
         shouts our existence via UDP.
         """
-        self.tcp_connection_listener_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        
+        self.select_session_cap_for_engine(use_async_engine=False)
+        self.session_profiler.start_for_process()
         # Binding to port 0 lets the OS pick a free port for us
-        self.tcp_connection_listener_socket.bind((self.local_machine_ip_address, 0))
-        
+        self.tcp_connection_listener_socket = self.create_tcp_listener_socket(0)
         self.tcp_listening_port_number = self.tcp_connection_listener_socket.getsockname()[1]
-        self.tcp_connection_listener_socket.listen()
+        self.tcp_connection_listener_socket.listen(consts.TCP_LISTENER_BACKLOG_SIZE)
         
-        print(f"Server started, listening on IP address {self.local_machine_ip_address}")
+        server_logger.info("Server started, listening on IP address %s", self.local_machine_ip_address)
+        self.start_metrics_endpoint()
+        self.start_leaderboard_snapshots()
 
         # Spinning up the UDP announcer in the background so it doesn't block the main loop
         background_broadcast_thread = threading.Thread(target=self.continuously_broadcast_availability)
         background_broadcast_thread.daemon = True 
         background_broadcast_thread.start()
 
+        self.accept_client_connections_forever()
+
+    def start_metrics_endpoint(self, port_offset=0):
+        """
+        Pre-fork workers each serve their own numbers, on metrics_http_port + worker index.
+        """
+        if self.metrics_http_port is None:
+            return
+        metrics_port_number = self.metrics_http_port + port_offset
+        try:
+            self.metrics_http_server = server_metrics.start_metrics_http_server(
+                self.server_metrics, self.metrics_http_host, metrics_port_number, self.team_leaderboard
+            )
+            server_logger.info("Metrics available at http://%s:%d/metrics", self.metrics_http_host, metrics_port_number)
+        except OSError as error_message:
+            server_logger.warning("Could not start the metrics endpoint on port %d: %s", metrics_port_number, error_message)
+
+    def start_leaderboard_snapshots(self, worker_index=None):
+        """
+        Pre-fork workers keep their own standings, so each one snapshots to its own file.
+        """
+        if self.leaderboard_snapshot_path is None:
+            return
+        snapshot_path = self.leaderboard_snapshot_path
+        if worker_index is not None:
+            snapshot_path = f"{snapshot_path}.worker-{worker_index}"
+        self.team_leaderboard.start_periodic_snapshots(snapshot_path, self.leaderboard_snapshot_interval_seconds)
+
+    def create_tcp_listener_socket(self, port_number, share_port_between_processes=False):
+        """
+        Creates and binds (but does not listen on) the TCP socket. With sharing turned on
+        the port is opened with SO_REUSEPORT, so several worker processes can each
+        listen on it and the kernel spreads incoming connections between them.
+        """
+        new_listener_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if share_port_between_processes:
+            new_listener_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        new_listener_socket.bind((self.listening_ip_address, port_number))
+        return new_listener_socket
+
+    def accept_client_connections_forever(self):
+        # A fixed set of session threads plays the games, everybody else queues or is turned away
+        self.session_worker_pool = SessionWorkerPool(
+            self.max_concurrent_sessions,
+            self.admission_queue_capacity,
+            self.admission_queue_deadline_seconds,
+            self.manage_individual_client_session,
+            self.reject_queued_connection,
+            self.server_metrics.admission_queue_wait_seconds.observe
+        )
+        self.session_deadline_manager.timer_wheel.start_driver_thread()
+        self.start_round_journal()
+
         # The main infinite loop waiting for players to join via TCP
         while True:
             try:
                 incoming_client_socket, incoming_client_address = self.tcp_connection_listener_socket.accept()
-                print(f"New client connected from {incoming_client_address}")
+                server_logger.debug("New client connected from %s", incoming_client_address)
                 
-                # Setting a generous timeout (10 mins)
-                incoming_client_socket.settimeout(600)
+                self.prepare_accepted_client_socket(incoming_client_socket)
+
+                # One host with a pile of silent connections is not allowed to fill the queue
+                if not self.session_deadline_manager.try_reserve_pending_handshake(incoming_client_address[0]):
+                    self.reject_busy_connection(incoming_client_socket, REJECTION_REASON_PENDING_HANDSHAKES)
+                    continue
                 
-                # Handling each player in their own thread so we can multitask
-                dedicated_client_thread = threading.Thread(
-                    target=self.manage_individual_client_session, 
-                    args=(incoming_client_socket,)
-                )
-                dedicated_client_thread.start()
+                # Never blocks: a full queue means an immediate busy notice
+                self.session_worker_pool.submit(incoming_client_socket, incoming_client_address)
                 
             except Exception as error_message:
-                print(f"Error accepting client: {error_message}")
+                server_logger.warning("Error accepting client: %s", error_message)
 
-    def continuously_broadcast_availability(self):
+    def reject_busy_connection(self, rejected_client_socket, rejection_reason):
         """
-        This function runs forever in the background, sending out UDP packets
-        telling everyone 'Hey, I'm here and this is my port'.
+        Sends the busy notice and hangs up without ever blocking, since the accept loop
+        calls this too. Whatever the client already sent is read first, so close() ends
+        with a clean FIN rather than an RST that could wipe out the notice on its way.
+        """
+        self.server_metrics.sessions_rejected.labels(rejection_reason).increment()
+        server_logger.debug("Server busy, turning a connection away (%s).", rejection_reason)
+        try:
+            rejected_client_socket.setblocking(False)
+            rejected_client_socket.send(protocol_codec.PREBUILT_SERVER_BUSY_PAYLOAD)
+            rejected_client_socket.shutdown(socket.SHUT_WR)
+            rejected_client_socket.recv(consts.NETWORK_BUFFER_SIZE_IN_BYTES)
+        except OSError:
+            pass
+        finally:
+            rejected_client_socket.close()
+
+    def start_round_journal(self):
         """
-        self.udp_broadcast_sender_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.udp_broadcast_sender_socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        Like the worker pool, the journal writer is started where sessions run, so each
+        pre-fork worker writes its own segments.
+        """
+        if self.round_journal_directory is None or self.round_journal_writer is not None:
+            return
+        self.round_journal_writer = RoundJournalWriter(self.round_journal_directory)
+        self.round_journal_writer.start()
+        server_logger.info("Journaling rounds to %s", self.round_journal_directory)
 
-        # Explicitly binding to the WiFi interface to prevent WSL issues
-        self.udp_broadcast_sender_socket.bind((self.local_machine_ip_address, 0))
+    def reject_queued_connection(self, rejected_client_socket, client_address, rejection_reason):
+        self.session_deadline_manager.release_pending_handshake(client_address[0])
+        self.reject_busy_connection(rejected_client_socket, rejection_reason)
 
-        # Packing the offer message strictly according to protocol
-        packed_offer_message = struct.pack(
-            consts.STRUCT_PACKING_FORMAT_FOR_OFFER, 
-            consts.PROTOCOL_MAGIC_COOKIE_IDENTIFIER, 
-            consts.MESSAGE_TYPE_OFFER_ANNOUNCEMENT, 
-            self.tcp_listening_port_number, 
-            self.participating_team_name.encode('utf-8').ljust(32, b'\0')
-        )
+    def abort_stalled_connection(self, stalled_client_socket):
+        """
+        Runs on the timer wheel's thread when a deadline is missed. shutdown() wakes up
+        the session thread blocked in recv or send on this socket; the session then
+        ends and closes it as usual.
+        """
+        try:
+            stalled_client_socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def count_queued_sessions(self):
+        if self.session_worker_pool is not None:
+            return self.session_worker_pool.queued_connection_count()
+        if self.async_admission_gate is not None:
+            return self.async_admission_gate.queued_connection_count()
+        return 0
+
+    def prepare_accepted_client_socket(self, incoming_client_socket):
+        # No socket timeout on purpose, the deadline manager aborts connections that stall
+        incoming_client_socket.settimeout(None)
+        
+        # We coalesce our own writes, so Nagle's algorithm would only delay them
+        if self.is_tcp_no_delay_enabled:
+            enable_tcp_no_delay(incoming_client_socket)
+
+    def continuously_broadcast_availability(self):
+        """
+        This function runs forever in the background, sending out UDP packets
+        telling everyone 'Hey, I'm here and this is my port', on every selected interface.
+        """
+        # Explicitly binding to each interface to prevent WSL issues
+        self.open_offer_broadcast_sockets()
+        packed_offer_message = self.build_offer_announcement_packet()
 
         while True:
             try:
-                self.udp_broadcast_sender_socket.sendto(
-                    packed_offer_message, 
-                    ('<broadcast>', consts.LISTENING_UDP_PORT_FOR_CLIENT_DISCOVERY)
-                )
+                self.broadcast_offer_packets(self.collect_offer_packets_to_broadcast(packed_offer_message))
                 # Sleep for a second to avoid spamming the network too hard
-                time.sleep(1) 
+                time.sleep(consts.OFFER_BROADCAST_INTERVAL_IN_SECONDS) 
             except Exception as error_message:
-                print(f"Error broadcasting: {error_message}")
-                time.sleep(1)
-
-    def generate_fresh_deck(self):
-        new_deck_of_cards = []
-        # Loop through suits (0-3) and ranks (1-13) to build a full 52 card set
-        for card_suit_id in range(4):
-            for card_rank_value in range(1, 14):
-                new_deck_of_cards.append((card_rank_value, card_suit_id))
-        
-        random.shuffle(new_deck_of_cards)
-        return new_deck_of_cards
-
-    def compute_total_hand_points(self, current_hand_of_cards):
-        """
-        Adds up the points. Remember: Per instructions, Ace is ALWAYS 11.
-        """
-        accumulated_score = 0
-        for rank_val, _ in current_hand_of_cards:
-            if rank_val == 1: 
-                accumulated_score += 11
-            elif rank_val >= 10: 
-                accumulated_score += 10
-            else: 
-                accumulated_score += rank_val
-        return accumulated_score
-
-    def transmit_game_state_packet(self, target_client_socket, card_rank, card_suit, game_result_code=consts.GAME_RESULT_INDICATOR_ROUND_STILL_ACTIVE):
-        binary_payload_packet = struct.pack(
-            consts.STRUCT_PACKING_FORMAT_FOR_SERVER_PAYLOAD,
-            consts.PROTOCOL_MAGIC_COOKIE_IDENTIFIER,
-            consts.MESSAGE_TYPE_GAME_PAYLOAD,
-            game_result_code,
-            card_rank,
-            card_suit
+                server_logger.warning("Error broadcasting: %s", error_message)
+                time.sleep(consts.OFFER_BROADCAST_INTERVAL_IN_SECONDS)
+
+    def build_offer_announcement_packet(self):
+        """
+        Packing the offer message strictly according to protocol. Both the threaded
+        and the async announcer send these exact bytes.
+        """
+        return protocol_codec.encode_offer_packet(self.tcp_listening_port_number, self.participating_team_name)
+
+    def count_active_sessions(self):
+        if self.worker_active_session_counts is not None:
+            return sum(self.worker_active_session_counts)
+        return self.server_metrics.sessions_active.current_value()
+
+    def collect_offer_packets_to_broadcast(self, packed_offer_message):
+        """
+        The standard offer always goes out, so every client keeps working. The extended
+        one is rebuilt each interval because it carries the live session count.
+        """
+        if not self.is_load_advertising_enabled:
+            return (packed_offer_message,)
+        return (
+            packed_offer_message,
+            protocol_codec.encode_extended_offer_packet(
+                self.tcp_listening_port_number,
+                self.participating_team_name,
+                self.count_active_sessions(),
+                self.advertised_session_capacity
+            )
+        )
+
+    def acquire_shoe_for_round(self, current_shoe, shoe_source):
+        """
+        Keeps playing from the current shoe until its cut card shows up, then grabs the
+        next one from shoe_source (shuffled on the spot, unless seeded).
+        """
+        if current_shoe is None or current_shoe.needs_replacement():
+            return shoe_source.acquire_shoe()
+        return current_shoe
+
+    def create_session_shoe_sources(self, connected_team_name, table_count=1):
+        """
+        One shoe source per table of the session. Normally that is the shared ShuffledShoeSource.
+        With a deal seed each table gets its own generator instead, seeded from the deal
+        seed, the team name, how many sessions the team played here before and the table
+        number, so the same seed deals exactly the same cards to the same sessions on
+        every run, however the threads or the event loop interleave them.
+        """
+        if self.deal_seed is None:
+            return [self.shoe_source] * table_count
+
+        with self.seeded_session_counts_lock:
+            team_session_number = self.seeded_session_counts_by_team.get(connected_team_name, 0)
+            self.seeded_session_counts_by_team[connected_team_name] = team_session_number + 1
+        session_seed = derive_random_seed(self.deal_seed, connected_team_name, team_session_number)
+        server_logger.info("[%s] Dealing session #%d from seed %d.", connected_team_name, team_session_number, session_seed)
+        return [
+            SeededShoeSource(self.shoe_source.deck_count, self.shoe_source.cut_card_penetration, derive_random_seed(session_seed, table_id))
+            for table_id in range(table_count)
+        ]
+
+    def create_table_sessions(self, connected_team_name, table_count, queue_outgoing_payload, session_journal, is_multiplexed=False):
+        """
+        One BlackjackTableSession per table, each on its own engine and shoe source.
+        Multiplexed tables use the payloads tagged with their table id.
+        """
+        table_sessions = []
+        for table_id, table_shoe_source in enumerate(self.create_session_shoe_sources(connected_team_name, table_count)):
+            if is_multiplexed:
+                card_payloads = protocol_codec.PREBUILT_MULTIPLEXED_CARD_PAYLOADS[table_id]
+                result_payloads = protocol_codec.PREBUILT_MULTIPLEXED_RESULT_PAYLOADS[table_id]
+            else:
+                card_payloads = protocol_codec.PREBUILT_CARD_PAYLOADS_BY_CARD_ID
+                result_payloads = protocol_codec.PREBUILT_RESULT_PAYLOADS
+            table_sessions.append(BlackjackTableSession(
+                BlackjackRoundEngine(functools.partial(self.acquire_shoe_for_round, shoe_source=table_shoe_source)),
+                card_payloads,
+                result_payloads,
+                queue_outgoing_payload,
+                functools.partial(self.finish_table_round, connected_team_name, table_id, session_journal)
+            ))
+        return table_sessions
+
+    def finish_table_round(self, connected_team_name, table_id, session_journal, table_session):
+        """
+        Runs after every round of every table, once its verdict is queued: phase timings,
+        outcome counters, standings and the journal.
+        """
+        result_started_at = time.perf_counter()
+        session_metrics = self.server_metrics
+        table_engine = table_session.table_engine
+        session_metrics.payloads_sent.increment(table_session.round_payload_count)
+
+        # The player's turn ends with their last answer; a hand bust on the deal never had one
+        dealer_turn_started_at = table_session.last_decision_received_at or table_session.player_turn_started_at
+        session_metrics.deal_phase.observe(table_session.player_turn_started_at - table_session.round_started_at)
+        session_metrics.player_turn_phase.observe(dealer_turn_started_at - table_session.player_turn_started_at)
+        # A busted player skips the dealer's turn, timing that would only flatten the histogram
+        if not table_engine.did_player_bust:
+            session_metrics.dealer_turn_phase.observe(result_started_at - dealer_turn_started_at)
+
+        self.record_finished_hand(connected_team_name, table_id, session_journal, table_session.rounds_finished, table_engine)
+
+        round_finished_at = time.perf_counter()
+        session_metrics.result_phase.observe(round_finished_at - result_started_at)
+        session_metrics.round_duration_seconds.observe(round_finished_at - table_session.round_started_at)
+
+    def record_finished_hand(self, connected_team_name, table_id, session_journal, round_number, finished_hand):
+        """
+        Outcome counters, standings, journal and the debug line for one decided hand.
+        finished_hand is a BlackjackRoundEngine or a SharedTableSeat, both carry the hands
+        and the verdict under the same names.
+        """
+        self.record_round_outcome(
+            connected_team_name, finished_hand.final_round_result, finished_hand.did_player_bust, finished_hand.cards_held_by_dealer.total_points
+        )
+        if session_journal is not None:
+            session_journal.record_round(
+                finished_hand.cards_held_by_player.card_ids, finished_hand.cards_held_by_dealer.card_ids,
+                finished_hand.final_round_result, finished_hand.did_player_bust, table_id
+            )
+
+        # Just for logging purposes (only built when someone will read it)
+        if server_logger.isEnabledFor(logging.DEBUG):
+            player_hand_display = [CARD_DISPLAY_NAMES_BY_ID[card_id] for card_id in finished_hand.cards_held_by_player.card_ids]
+            dealer_hand_display = [CARD_DISPLAY_NAMES_BY_ID[card_id] for card_id in finished_hand.cards_held_by_dealer.card_ids]
+            server_logger.debug(
+                "[%s] Table %d round %d: player %s, dealer %s. %s", connected_team_name, table_id, round_number,
+                player_hand_display, dealer_hand_display, finished_hand.round_summary_text
+            )
+
+    def create_shared_table(self, table_id):
+        """
+        A new shared-dealer table with its own shoe source: the shared ShuffledShoeSource,
+        or with a deal seed a generator of its own, seeded from the deal seed and the
+        table number.
+        """
+        if self.deal_seed is None:
+            table_shoe_source = self.shoe_source
+        else:
+            table_seed = derive_random_seed(self.deal_seed, "shared table", table_id)
+            server_logger.info("Dealing shared table %d from seed %d.", table_id, table_seed)
+            table_shoe_source = SeededShoeSource(self.shoe_source.deck_count, self.shoe_source.cut_card_penetration, table_seed)
+        return SharedDealerTable(
+            table_id, self.shared_table_registry.table_size,
+            functools.partial(self.acquire_shoe_for_round, shoe_source=table_shoe_source), self.finish_shared_table_round
         )
-        target_client_socket.sendall(binary_payload_packet)
 
-    def manage_individual_client_session(self, active_client_connection):
+    def finish_shared_table_round(self, shared_table, finished_seats):
+        """
+        finish_table_round for a shared table, run once per round for all its seats. The
+        deal and the dealer's turn happened once, so they are timed once; every seat's
+        own turn and verdict count separately.
+        """
+        result_started_at = time.perf_counter()
+        session_metrics = self.server_metrics
+        session_metrics.deal_phase.observe(shared_table.player_turns_started_at - shared_table.round_started_at)
+        for table_seat in finished_seats:
+            session_metrics.payloads_sent.increment(table_seat.round_payload_count)
+            session_metrics.player_turn_phase.observe(
+                (table_seat.last_decision_received_at or table_seat.player_turn_started_at) - table_seat.player_turn_started_at
+            )
+        if any(not table_seat.did_player_bust for table_seat in finished_seats):
+            session_metrics.dealer_turn_phase.observe(result_started_at - shared_table.dealer_turn_started_at)
+
+        for table_seat in finished_seats:
+            # The journal and the log only know the seat's session, where it is the only table
+            self.record_finished_hand(table_seat.connected_team_name, 0, table_seat.session_journal, table_seat.rounds_finished, table_seat)
+
+        round_finished_at = time.perf_counter()
+        session_metrics.result_phase.observe(round_finished_at - result_started_at)
+        session_metrics.round_duration_seconds.observe(round_finished_at - shared_table.round_started_at)
+
+    def flush_outgoing_packets(self, outgoing_packet_writer):
+        """
+        Flushes the session's writer and records how long the send took.
+        """
+        if not outgoing_packet_writer.has_pending_packets():
+            return
+        flush_started_at = time.perf_counter()
+        outgoing_packet_writer.flush()
+        self.server_metrics.send_seconds.observe(time.perf_counter() - flush_started_at)
+
+    def record_round_outcome(self, connected_team_name, final_round_result, did_player_bust, dealer_total_score):
+        self.team_leaderboard.record_round(connected_team_name, final_round_result, did_player_bust)
+        session_metrics = self.server_metrics
+        session_metrics.rounds_completed.increment()
+        session_metrics.round_result_counters_by_code[final_round_result].increment()
+        if did_player_bust:
+            session_metrics.player_busts.increment()
+        elif dealer_total_score > 21:
+            session_metrics.dealer_busts.increment()
+
+    def is_valid_game_request(self, received_cookie, received_msg_type, accepted_message_types=consts.ACCEPTED_GAME_REQUEST_MESSAGE_TYPES):
+        return received_cookie == consts.PROTOCOL_MAGIC_COOKIE_IDENTIFIER and received_msg_type in accepted_message_types
+
+    def is_valid_multiplexed_table_count(self, multiplexed_table_count):
+        return multiplexed_table_count is not None and 1 <= multiplexed_table_count <= consts.MAX_MULTIPLEXED_TABLES_PER_CONNECTION
+
+    def read_continuation_request(self, client_frame_reader, connected_team_name):
+        """
+        Waits for the next batch request on an open connection. Returns the number of
+        rounds, or 0 when the player is done (hung up, asked for 0 rounds or sent junk).
+        """
+        unpacked_request_data = client_frame_reader.read_request_packet()
+        if unpacked_request_data is None:
+            return 0
+        received_cookie, received_msg_type, requested_rounds_count, _ = unpacked_request_data
+        if not self.is_valid_game_request(received_cookie, received_msg_type):
+            server_logger.warning("[%s] Invalid continuation request. Closing.", connected_team_name)
+            return 0
+        return requested_rounds_count
+
+    def apply_multiplexed_decision(self, unpacked_decision, table_sessions):
+        """
+        Validates a decision packet and hands it to its table. Returns True while that
+        table still expects decisions.
+        """
+        received_cookie, received_msg_type, table_id, player_decision_string = unpacked_decision
+        if received_cookie != consts.PROTOCOL_MAGIC_COOKIE_IDENTIFIER or received_msg_type != consts.MESSAGE_TYPE_MULTIPLEXED_GAME_PAYLOAD:
+            raise ValueError("Invalid multiplexed decision packet")
+        if table_id >= len(table_sessions) or not table_sessions[table_id].table_engine.is_waiting_for_player_decision:
+            raise ValueError(f"Decision for table {table_id}, which is not waiting for one")
+        return table_sessions[table_id].receive_decision(player_decision_string)
+
+    def play_multiplexed_tables(self, client_frame_reader, outgoing_packet_writer, table_count, rounds_per_table, session_deadlines, connected_team_name,
+                                session_journal):
+        """
+        Runs table_count independent tables (own shoe, own hands) on one connection.
+        Decisions are handled in whatever order they arrive; we only flush, one write for
+        every table at once, when no further decision is already sitting in the buffer.
+        Only then can the read block, so only then is the decision budget armed.
+        Returns False if the player hung up before all rounds were played.
+        """
+        table_sessions = self.create_table_sessions(
+            connected_team_name, table_count, outgoing_packet_writer.queue_packet, session_journal, is_multiplexed=True
+        )
+        tables_in_play = 0
+        for table_session in table_sessions:
+            if table_session.start_batch(rounds_per_table):
+                tables_in_play += 1
+
+        while tables_in_play:
+            if client_frame_reader.buffered_byte_count() < protocol_codec.MULTIPLEXED_CLIENT_PAYLOAD_SIZE:
+                session_deadlines.wait_for_player()
+                self.flush_outgoing_packets(outgoing_packet_writer)
+
+            unpacked_decision = client_frame_reader.read_multiplexed_client_decision()
+            session_deadlines.player_answered()
+            if unpacked_decision is None:
+                return False
+
+            if not self.apply_multiplexed_decision(unpacked_decision, table_sessions):
+                tables_in_play -= 1
+
+        self.flush_outgoing_packets(outgoing_packet_writer)
+        return True
+
+    def read_player_decision(self, client_frame_reader, outgoing_packet_writer, session_deadlines):
+        """
+        Flushes everything we owe the player in one write, then waits for their decision
+        under the decision deadline. Returns the decision string, None if they hung up.
+        """
+        session_deadlines.wait_for_player()
+        self.flush_outgoing_packets(outgoing_packet_writer)
+        decision_wait_started_at = time.perf_counter()
+        unpacked_action = client_frame_reader.read_client_decision()
+        session_deadlines.player_answered()
+        self.server_metrics.decision_wait_seconds.observe(time.perf_counter() - decision_wait_started_at)
+        if unpacked_action is None:
+            return None
+        # Decoding the player's decision (anything but Hit counts as Stand)
+        _, _, player_decision_string = unpacked_action
+        return player_decision_string
+
+    def play_private_table_batch(self, client_frame_reader, outgoing_packet_writer, requested_rounds_count, session_deadlines, table_session):
+        """
+        One batch at the session's own table, which deals until the player has to decide.
+        Returns False if the player hung up before all rounds were played.
+        """
+        is_waiting_for_player = table_session.start_batch(requested_rounds_count)
+        while is_waiting_for_player:
+            player_decision_string = self.read_player_decision(client_frame_reader, outgoing_packet_writer, session_deadlines)
+            if player_decision_string is None:
+                return False
+            is_waiting_for_player = table_session.receive_decision(player_decision_string)
+
+        # The last verdict (and anything queued with it) still has to leave
+        self.flush_outgoing_packets(outgoing_packet_writer)
+        return True
+
+    def play_shared_table_batch(self, client_frame_reader, outgoing_packet_writer, requested_rounds_count, session_deadlines, connected_team_name,
+                                session_journal):
+        """
+        One batch in a seat at a shared-dealer table. While the other seats play we sleep
+        on the seat's event; the decision deadline only runs on our own turns.
+        Returns False if the player hung up (or timed out) before all rounds were played.
+        """
+        table_seat = SharedTableSeat(connected_team_name, session_journal, requested_rounds_count, threading.Event())
+        shared_table = self.shared_table_registry.take_seat(table_seat)
+        server_logger.info("[%s] Seated at shared table %d.", connected_team_name, shared_table.table_id)
+        try:
+            while True:
+                # Neither a hang-up nor a missed deadline sets the event, so we look between naps
+                while not table_seat.seat_wakeup_event.wait(consts.SHARED_TABLE_SEAT_CHECK_INTERVAL_IN_SECONDS):
+                    if session_deadlines.expired_budget_name is not None or client_frame_reader.has_peer_closed():
+                        return False
+                table_seat.seat_wakeup_event.clear()
+                seat_payloads, seat_state = shared_table.collect_seat_update(table_seat)
+                for seat_payload in seat_payloads:
+                    outgoing_packet_writer.queue_packet(seat_payload)
+                if seat_state == SEAT_STATE_FINISHED:
+                    self.flush_outgoing_packets(outgoing_packet_writer)
+                    return True
+                if seat_state != SEAT_STATE_DECIDING:
+                    # Woken for a verdict while the other seats play on: send it now
+                    self.flush_outgoing_packets(outgoing_packet_writer)
+                    continue
+
+                player_decision_string = self.read_player_decision(client_frame_reader, outgoing_packet_writer, session_deadlines)
+                if player_decision_string is None:
+                    return False
+                shared_table.receive_decision(table_seat, player_decision_string)
+        finally:
+            # Does nothing once the batch is over; otherwise the table goes on without us
+            shared_table.leave_table(table_seat)
+
+    def manage_individual_client_session(self, active_client_connection, client_address=None):
+        """
+        client_address is passed by the accept loop, whose connection reserved a pending
+        handshake slot for that IP.
+        """
         connected_team_name = "Unknown"
+        session_metrics = self.server_metrics
+        # The handshake phase starts when the session thread does, right after accept
+        session_started_at = time.perf_counter()
+        session_profile = self.session_profiler.start_session_profile()
+        session_end_reason = server_metrics.SESSION_END_ERROR
+        is_counted_as_active = False
+        session_deadlines = self.session_deadline_manager.start_session(
+            functools.partial(self.abort_stalled_connection, active_client_connection),
+            client_address[0] if client_address is not None else None
+        )
         
         try:
             # Step 1: Handle the handshake (Request Packet)
-            expected_packet_size = struct.calcsize(consts.STRUCT_PACKING_FORMAT_FOR_REQUEST)
-            raw_received_bytes = active_client_connection.recv(expected_packet_size)
+            # The reader reassembles whole packets no matter how TCP splits or merges them
+            client_frame_reader = BufferedFrameReader(active_client_connection)
+            outgoing_packet_writer = CoalescingPacketWriter(active_client_connection, self.is_write_coalescing_enabled)
+            unpacked_request_data = client_frame_reader.read_request_packet()
             
-            if not raw_received_bytes or len(raw_received_bytes) != expected_packet_size:
+            if unpacked_request_data is None:
+                session_end_reason = server_metrics.SESSION_END_DISCONNECTED
                 return
 
             # Breaking down the unpacked data into variables
-            unpacked_request_data = struct.unpack(consts.STRUCT_PACKING_FORMAT_FOR_REQUEST, raw_received_bytes)
-            received_cookie = unpacked_request_data[0]
-            received_msg_type = unpacked_request_data[1]
-            requested_rounds_count = unpacked_request_data[2]
-            raw_team_name_bytes = unpacked_request_data[3]
+            received_cookie, received_msg_type, requested_rounds_count, decoded_team_name = unpacked_request_data
             
             # Security check: Kick them out if they didn't send a proper REQUEST msg
-            if received_cookie != consts.PROTOCOL_MAGIC_COOKIE_IDENTIFIER or received_msg_type != consts.MESSAGE_TYPE_GAME_REQUEST:
-                print(f"Invalid handshake from client. Closing.")
+            if not self.is_valid_game_request(received_cookie, received_msg_type, consts.ACCEPTED_SESSION_OPENING_MESSAGE_TYPES):
+                server_logger.warning("Invalid handshake from client. Closing.")
+                session_end_reason = server_metrics.SESSION_END_INVALID_HANDSHAKE
                 return
 
-            connected_team_name = raw_team_name_bytes.decode('utf-8').strip('\x00')
-            print(f"[{connected_team_name}] Connected. Playing {requested_rounds_count} rounds.")
+            connected_team_name = decoded_team_name
+            # A continuable request keeps the connection open for more batches after this one
+            is_continuation_negotiated = received_msg_type == consts.MESSAGE_TYPE_CONTINUABLE_GAME_REQUEST
+            is_multiplexed_session = received_msg_type == consts.MESSAGE_TYPE_MULTIPLEXED_GAME_REQUEST
+            if is_multiplexed_session:
+                multiplexed_table_count = client_frame_reader.read_multiplexed_table_count()
+                if not self.is_valid_multiplexed_table_count(multiplexed_table_count):
+                    server_logger.warning("[%s] Invalid multiplexed table count. Closing.", connected_team_name)
+                    session_end_reason = server_metrics.SESSION_END_INVALID_HANDSHAKE
+                    return
 
-            # Step 2: Loop through the requested number of rounds
-            for current_round_number in range(1, requested_rounds_count + 1):
-                print(f"[{connected_team_name}] --- Starting Round {current_round_number} ---")
-                
-                current_game_deck = self.generate_fresh_deck()
-                cards_held_by_player = []
-                cards_held_by_dealer = []
-
-                # Initial Deal: Give 2 cards to player, 2 to dealer
-                player_card_1 = current_game_deck.pop()
-                cards_held_by_player.append(player_card_1)
-                self.transmit_game_state_packet(active_client_connection, *player_card_1)
-                
-                player_card_2 = current_game_deck.pop()
-                cards_held_by_player.append(player_card_2)
-                self.transmit_game_state_packet(active_client_connection, *player_card_2)
-                
-                dealer_visible_card = current_game_deck.pop()
-                cards_held_by_dealer.append(dealer_visible_card)
-                
-                dealer_hidden_card = current_game_deck.pop()
-                cards_held_by_dealer.append(dealer_hidden_card)
+            session_deadlines.finish_handshake()
+            session_journal = None if self.round_journal_writer is None else self.round_journal_writer.open_session(connected_team_name)
+            server_logger.info("[%s] Connected. Playing %d rounds.", connected_team_name, requested_rounds_count)
+            session_metrics.handshake_phase.observe(time.perf_counter() - session_started_at)
+            session_metrics.sessions_started.increment()
+            session_metrics.sessions_active.increment()
+            is_counted_as_active = True
 
-                print(f"[{connected_team_name}] Dealer Face-Up: {consts.CARD_RANKS_MAPPING_DICTIONARY[dealer_visible_card[0]]} of {consts.CARD_SUITS_MAPPING_DICTIONARY[dealer_visible_card[1]]}")
-                
-                # Send the dealer's visible card to the client immediately
-                self.transmit_game_state_packet(active_client_connection, *dealer_visible_card)
-
-                # Player's Turn Loop
-                did_player_bust = False
-                while True:
-                    # Check for "Double Ace" or just bad luck immediately
-                    current_player_score = self.compute_total_hand_points(cards_held_by_player)
-                    if current_player_score > 21:
-                        did_player_bust = True
-                        break 
+            if is_multiplexed_session:
+                server_logger.info("[%s] Multiplexing %d tables on this connection.", connected_team_name, multiplexed_table_count)
+                if not self.play_multiplexed_tables(
+                    client_frame_reader, outgoing_packet_writer, multiplexed_table_count, requested_rounds_count, session_deadlines, connected_team_name,
+                    session_journal
+                ):
+                    session_end_reason = server_metrics.SESSION_END_DISCONNECTED
+                    return
+                server_logger.info("[%s] Finished playing. Closing connection.", connected_team_name)
+                session_end_reason = server_metrics.SESSION_END_COMPLETED
+                return
 
-                    try:
-                        raw_action_data = active_client_connection.recv(struct.calcsize(consts.STRUCT_PACKING_FORMAT_FOR_CLIENT_PAYLOAD))
-                    except socket.timeout:
-                        print(f"[{connected_team_name}] Timed out waiting for action.")
-                        return
-
-                    if not raw_action_data: 
-                        break
-                    
-                    # Decoding the player's decision
-                    unpacked_action = struct.unpack(consts.STRUCT_PACKING_FORMAT_FOR_CLIENT_PAYLOAD, raw_action_data)
-                    player_decision_string = unpacked_action[2].decode('utf-8').strip('\x00')
-
-                    if player_decision_string == "Stand":
-                        break
-                    elif player_decision_string == "Hittt":
-                        drawn_card = current_game_deck.pop()
-                        cards_held_by_player.append(drawn_card)
-                        self.transmit_game_state_packet(active_client_connection, *drawn_card)
-                    else:
-                        break
-
-                # Dealer's Turn (only happens if player is still in the game)
-                dealer_total_score = self.compute_total_hand_points(cards_held_by_dealer)
-                
-                if not did_player_bust:
-                    # Show the card we were hiding
-                    print(f"[{connected_team_name}] Dealer reveals hidden: {consts.CARD_RANKS_MAPPING_DICTIONARY[dealer_hidden_card[0]]} of {consts.CARD_SUITS_MAPPING_DICTIONARY[dealer_hidden_card[1]]}")
-                    self.transmit_game_state_packet(active_client_connection, *dealer_hidden_card)
-                    
-                    # Just for logging purposes
-                    dealer_hand_display = [f"{consts.CARD_RANKS_MAPPING_DICTIONARY[r]} of {consts.CARD_SUITS_MAPPING_DICTIONARY[s]}" for r, s in cards_held_by_dealer]
-                    print(f"[{connected_team_name}] Dealer hand: {dealer_hand_display} (Value: {dealer_total_score})")
-                    
-                    # Dealer hits until 17
-                    while dealer_total_score < 17:
-                        dealer_new_card = current_game_deck.pop()
-                        cards_held_by_dealer.append(dealer_new_card)
-                        dealer_total_score = self.compute_total_hand_points(cards_held_by_dealer)
-                        
-                        print(f"[{connected_team_name}] Dealer draws: {consts.CARD_RANKS_MAPPING_DICTIONARY[dealer_new_card[0]]} of {consts.CARD_SUITS_MAPPING_DICTIONARY[dealer_new_card[1]]}")
-                        self.transmit_game_state_packet(active_client_connection, *dealer_new_card)
-
-                # Determine Winner Logic
-                final_player_score = self.compute_total_hand_points(cards_held_by_player)
-                final_round_result = consts.GAME_RESULT_INDICATOR_PLAYER_LOSS 
-                
-                if did_player_bust:
-                    final_round_result = consts.GAME_RESULT_INDICATOR_PLAYER_LOSS
-                    print(f"[{connected_team_name}] Round {current_round_number}: Player Bust! Dealer Wins.")
-                
-                elif dealer_total_score > 21:
-                    final_round_result = consts.GAME_RESULT_INDICATOR_PLAYER_WIN
-                    print(f"[{connected_team_name}] Round {current_round_number}: Dealer Bust! Player Wins.")
-                
-                elif final_player_score > dealer_total_score:
-                    final_round_result = consts.GAME_RESULT_INDICATOR_PLAYER_WIN
-                    print(f"[{connected_team_name}] Round {current_round_number}: Player ({final_player_score}) > Dealer ({dealer_total_score}). Player Wins.")
-                
-                elif dealer_total_score > final_player_score:
-                    final_round_result = consts.GAME_RESULT_INDICATOR_PLAYER_LOSS
-                    print(f"[{connected_team_name}] Round {current_round_number}: Dealer ({dealer_total_score}) > Player ({final_player_score}). Dealer Wins.")
-                
+            # Without shared tables the session has a private dealer for all its batches
+            table_session = None
+            if self.shared_table_registry is None:
+                table_session = self.create_table_sessions(connected_team_name, 1, outgoing_packet_writer.queue_packet, session_journal)[0]
+            while True:
+                # Step 2: Play the requested number of rounds
+                if table_session is None:
+                    is_batch_played = self.play_shared_table_batch(
+                        client_frame_reader, outgoing_packet_writer, requested_rounds_count, session_deadlines, connected_team_name, session_journal
+                    )
                 else:
-                    final_round_result = consts.GAME_RESULT_INDICATOR_TIE
-                    print(f"[{connected_team_name}] Round {current_round_number}: Tie ({final_player_score}).")
+                    is_batch_played = self.play_private_table_batch(
+                        client_frame_reader, outgoing_packet_writer, requested_rounds_count, session_deadlines, table_session
+                    )
+                if not is_batch_played:
+                    server_logger.info("[%s] Client disconnected.", connected_team_name)
+                    session_end_reason = server_metrics.SESSION_END_DISCONNECTED
+                    return
+
+                if not is_continuation_negotiated:
+                    break
 
-                # Send the final verdict to the client
-                self.transmit_game_state_packet(active_client_connection, 0, 0, final_round_result)
+                # Step 3: The player may ask for another batch on this same connection
+                session_deadlines.wait_for_player()
+                requested_rounds_count = self.read_continuation_request(client_frame_reader, connected_team_name)
+                session_deadlines.player_answered()
+                if not requested_rounds_count:
+                    break
+                server_logger.info("[%s] Continuing with %d more rounds.", connected_team_name, requested_rounds_count)
+                session_metrics.session_continuations.increment()
 
-            print(f"[{connected_team_name}] Finished playing. Closing connection.")
+            server_logger.info("[%s] Finished playing. Closing connection.", connected_team_name)
+            session_end_reason = server_metrics.SESSION_END_COMPLETED
 
-        except socket.timeout:
-            print(f"[{connected_team_name}] Timed out.")
         except Exception as error_msg:
-            print(f"[{connected_team_name}] Error handling client: {error_msg}")
+            # After a missed deadline the aborted socket fails somewhere; the finally block reports that
+            if session_deadlines.expired_budget_name is None:
+                server_logger.warning("[%s] Error handling client: %s", connected_team_name, error_msg)
         finally:
+            session_deadlines.finish()
+            if session_deadlines.expired_budget_name is not None:
+                server_logger.warning("[%s] Timed out (%s deadline).", connected_team_name, session_deadlines.expired_budget_name)
+                session_end_reason = server_metrics.SESSION_END_TIMEOUT
             active_client_connection.close()
+            if is_counted_as_active:
+                session_metrics.sessions_active.decrement()
+            session_metrics.record_session_end(session_end_reason)
+            if session_profile is not None:
+                self.session_profiler.finish_session_profile(session_profile)
+
+    # ------------------------------------------------------------------
+    # Async engine: one event loop runs every session instead of a thread each
+    # ------------------------------------------------------------------
+
+    def start_server_async(self):
+        """
+        Same job as start_server, but every player session is a coroutine on a single
+        event loop. An idle player costs a small stream object instead of a whole OS thread.
+        """
+        self.select_session_cap_for_engine(use_async_engine=True)
+        raise_open_file_limit_to_maximum()
+        self.session_profiler.start_for_process()
+        asyncio.run(self.run_async_event_loop())
+
+    async def run_async_event_loop(self, prebound_listener_socket=None):
+        """
+        Pre-fork workers hand us their already bound SO_REUSEPORT socket. In that case the
+        supervisor owns the UDP offer, so we only serve TCP.
+        """
+        self.async_admission_gate = AsyncAdmissionGate(
+            self.max_concurrent_sessions, self.admission_queue_capacity, self.admission_queue_deadline_seconds
+        )
+        # The wheel is driven by the loop itself, so deadline callbacks run on the loop's thread
+        deadline_wheel_task = asyncio.create_task(self.session_deadline_manager.timer_wheel.run_forever_async(asyncio.sleep))
+        self.start_round_journal()
+
+        if prebound_listener_socket is None:
+            # Binding to port 0 lets the OS pick a free port for us, exactly like the threaded mode
+            async_tcp_server = await asyncio.start_server(
+                self.admit_client_session_async,
+                self.listening_ip_address,
+                0,
+                backlog=consts.TCP_LISTENER_BACKLOG_SIZE
+            )
+        else:
+            async_tcp_server = await asyncio.start_server(
+                self.admit_client_session_async,
+                sock=prebound_listener_socket,
+                backlog=consts.TCP_LISTENER_BACKLOG_SIZE
+            )
+        self.tcp_listening_port_number = async_tcp_server.sockets[0].getsockname()[1]
+
+        if prebound_listener_socket is not None:
+            try:
+                async with async_tcp_server:
+                    await async_tcp_server.serve_forever()
+            finally:
+                deadline_wheel_task.cancel()
+            return
+
+        server_logger.info("Server started (async mode), listening on IP address %s", self.local_machine_ip_address)
+        self.start_metrics_endpoint()
+        self.start_leaderboard_snapshots()
+
+        # The UDP announcer lives on the same loop, one datagram endpoint per interface
+        udp_broadcast_targets = []
+        for network_interface in self.broadcast_interfaces:
+            udp_broadcast_transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+                asyncio.DatagramProtocol,
+                local_addr=(network_interface.ip_address, 0),
+                allow_broadcast=True
+            )
+            udp_broadcast_targets.append(
+                (udp_broadcast_transport, (network_interface.broadcast_address, consts.LISTENING_UDP_PORT_FOR_CLIENT_DISCOVERY))
+            )
+        server_logger.info("Broadcasting offers on %s", self.describe_broadcast_interfaces())
+        broadcast_task = asyncio.create_task(self.continuously_broadcast_availability_async(udp_broadcast_targets))
+
+        try:
+            async with async_tcp_server:
+                await async_tcp_server.serve_forever()
+        finally:
+            broadcast_task.cancel()
+            deadline_wheel_task.cancel()
+            for udp_broadcast_transport, _ in udp_broadcast_targets:
+                udp_broadcast_transport.close()
+
+    async def continuously_broadcast_availability_async(self, udp_broadcast_targets):
+        """
+        Async twin of continuously_broadcast_availability. Sends the same offer packet
+        on every interface once per interval without ever blocking the game sessions.
+        """
+        packed_offer_message = self.build_offer_announcement_packet()
+
+        while True:
+            try:
+                offer_packets = self.collect_offer_packets_to_broadcast(packed_offer_message)
+                for udp_broadcast_transport, broadcast_destination in udp_broadcast_targets:
+                    for offer_packet in offer_packets:
+                        udp_broadcast_transport.sendto(offer_packet, broadcast_destination)
+            except Exception as error_message:
+                server_logger.warning("Error broadcasting: %s", error_message)
+            await asyncio.sleep(consts.OFFER_BROADCAST_INTERVAL_IN_SECONDS)
+
+    async def receive_exact_bytes_async(self, stream_reader, expected_packet_size):
+        """
+        Waits for one whole packet. readexactly already glues split TCP segments
+        back together for us. No wait_for() around it: a missed deadline aborts the
+        transport, which ends the read with IncompleteReadError.
+        """
+        return await stream_reader.readexactly(expected_packet_size)
+
+    async def flush_outgoing_payloads_async(self, stream_writer, pending_outgoing_payloads):
+        """
+        Hands the whole batch to the transport as one write, then waits for the kernel.
+        """
+        if not pending_outgoing_payloads:
+            await stream_writer.drain()
+            return
+        flush_started_at = time.perf_counter()
+        stream_writer.write(b"".join(pending_outgoing_payloads))
+        pending_outgoing_payloads.clear()
+        await stream_writer.drain()
+        self.server_metrics.send_seconds.observe(time.perf_counter() - flush_started_at)
+
+    async def read_continuation_request_async(self, stream_reader, connected_team_name):
+        """
+        Async twin of read_continuation_request. A clean hang-up between batches is the
+        normal way for a player to leave, so it is not treated as a disconnect error.
+        """
+        try:
+            raw_received_bytes = await self.receive_exact_bytes_async(stream_reader, protocol_codec.REQUEST_PACKET_SIZE)
+        except asyncio.IncompleteReadError as read_error:
+            if read_error.partial:
+                raise
+            return 0
+        received_cookie, received_msg_type, requested_rounds_count, _ = protocol_codec.decode_request_packet(raw_received_bytes)
+        if not self.is_valid_game_request(received_cookie, received_msg_type):
+            server_logger.warning("[%s] Invalid continuation request. Closing.", connected_team_name)
+            return 0
+        return requested_rounds_count
+
+    async def play_multiplexed_tables_async(self, stream_reader, stream_writer, pending_outgoing_payloads, table_count, rounds_per_table, session_deadlines,
+                                            connected_team_name, session_journal):
+        """
+        Async twin of play_multiplexed_tables. The stream reader can't tell us whether the
+        next decision is already buffered, so we flush after every decision; write()
+        only hands the bytes to the transport, the kernel sees them once per loop turn.
+        """
+        table_sessions = self.create_table_sessions(
+            connected_team_name, table_count, pending_outgoing_payloads.append, session_journal, is_multiplexed=True
+        )
+        tables_in_play = 0
+        for table_session in table_sessions:
+            if table_session.start_batch(rounds_per_table):
+                tables_in_play += 1
+
+        while tables_in_play:
+            session_deadlines.wait_for_player()
+            await self.flush_outgoing_payloads_async(stream_writer, pending_outgoing_payloads)
+            raw_action_data = await self.receive_exact_bytes_async(stream_reader, protocol_codec.MULTIPLEXED_CLIENT_PAYLOAD_SIZE)
+            session_deadlines.player_answered()
+            unpacked_decision = protocol_codec.decode_multiplexed_client_decision(raw_action_data)
+
+            if not self.apply_multiplexed_decision(unpacked_decision, table_sessions):
+                tables_in_play -= 1
+
+        await self.flush_outgoing_payloads_async(stream_writer, pending_outgoing_payloads)
+
+    async def read_player_decision_async(self, stream_reader, stream_writer, pending_outgoing_payloads, session_deadlines):
+        """
+        Async twin of read_player_decision. A hang-up ends the read with IncompleteReadError.
+        """
+        # Everything we owe the player must be on the wire before we wait for them
+        session_deadlines.wait_for_player()
+        await self.flush_outgoing_payloads_async(stream_writer, pending_outgoing_payloads)
+        decision_wait_started_at = time.perf_counter()
+        raw_action_data = await self.receive_exact_bytes_async(stream_reader, protocol_codec.CLIENT_PAYLOAD_SIZE)
+        session_deadlines.player_answered()
+        self.server_metrics.decision_wait_seconds.observe(time.perf_counter() - decision_wait_started_at)
+
+        # Decoding the player's decision (anything but Hit counts as Stand)
+        _, _, player_decision_string = protocol_codec.decode_client_decision(raw_action_data)
+        return player_decision_string
+
+    async def play_private_table_batch_async(self, stream_reader, stream_writer, pending_outgoing_payloads, requested_rounds_count, session_deadlines,
+                                             table_session):
+        is_waiting_for_player = table_session.start_batch(requested_rounds_count)
+        while is_waiting_for_player:
+            player_decision_string = await self.read_player_decision_async(stream_reader, stream_writer, pending_outgoing_payloads, session_deadlines)
+            is_waiting_for_player = table_session.receive_decision(player_decision_string)
+
+        await self.flush_outgoing_payloads_async(stream_writer, pending_outgoing_payloads)
+
+    async def play_shared_table_batch_async(self, stream_reader, stream_writer, pending_outgoing_payloads, requested_rounds_count, session_deadlines,
+                                            connected_team_name, session_journal):
+        """
+        Async twin of play_shared_table_batch. Every seat of a table lives on this loop,
+        so an asyncio.Event is all the wake-up a seat needs.
+        """
+        table_seat = SharedTableSeat(connected_team_name, session_journal, requested_rounds_count, asyncio.Event())
+        shared_table = self.shared_table_registry.take_seat(table_seat)
+        server_logger.info("[%s] Seated at shared table %d.", connected_team_name, shared_table.table_id)
+        try:
+            while True:
+                # Neither a hang-up nor a missed deadline sets the event, so we look between naps
+                while not table_seat.seat_wakeup_event.is_set():
+                    try:
+                        await asyncio.wait_for(table_seat.seat_wakeup_event.wait(), consts.SHARED_TABLE_SEAT_CHECK_INTERVAL_IN_SECONDS)
+                    except asyncio.TimeoutError:
+                        if stream_writer.is_closing() or stream_reader.at_eof():
+                            raise asyncio.IncompleteReadError(b"", None)
+                table_seat.seat_wakeup_event.clear()
+                seat_payloads, seat_state = shared_table.collect_seat_update(table_seat)
+                pending_outgoing_payloads.extend(seat_payloads)
+                if seat_state == SEAT_STATE_FINISHED:
+                    await self.flush_outgoing_payloads_async(stream_writer, pending_outgoing_payloads)
+                    return
+                if seat_state != SEAT_STATE_DECIDING:
+                    # Woken for a verdict while the other seats play on: send it now
+                    await self.flush_outgoing_payloads_async(stream_writer, pending_outgoing_payloads)
+                    continue
+
+                player_decision_string = await self.read_player_decision_async(
+                    stream_reader, stream_writer, pending_outgoing_payloads, session_deadlines
+                )
+                shared_table.receive_decision(table_seat, player_decision_string)
+        finally:
+            shared_table.leave_table(table_seat)
+
+    async def admit_client_session_async(self, stream_reader, stream_writer):
+        """
+        Admission control in front of every async session: the per-IP handshake limit,
+        then a free slot (within the queue deadline), or else the busy notice.
+        """
+        peer_address = stream_writer.get_extra_info("peername")
+        client_ip_address = peer_address[0] if peer_address else None
+        if not self.session_deadline_manager.try_reserve_pending_handshake(client_ip_address):
+            self.reject_busy_connection_async(stream_writer, REJECTION_REASON_PENDING_HANDSHAKES)
+            return
+
+        rejection_reason, queue_wait_seconds = await self.async_admission_gate.acquire_session_slot()
+        self.server_metrics.admission_queue_wait_seconds.observe(queue_wait_seconds)
+        if rejection_reason is not None:
+            self.session_deadline_manager.release_pending_handshake(client_ip_address)
+            self.reject_busy_connection_async(stream_writer, rejection_reason)
+            return
+
+        try:
+            await self.manage_individual_client_session_async(stream_reader, stream_writer, client_ip_address)
+        finally:
+            self.async_admission_gate.release_session_slot()
+
+    def reject_busy_connection_async(self, stream_writer, rejection_reason):
+        self.server_metrics.sessions_rejected.labels(rejection_reason).increment()
+        server_logger.debug("Server busy, turning a connection away (%s).", rejection_reason)
+        # close() still flushes the notice; the request was already pulled off the socket by the stream
+        stream_writer.write(protocol_codec.PREBUILT_SERVER_BUSY_PAYLOAD)
+        stream_writer.close()
+
+    async def manage_individual_client_session_async(self, stream_reader, stream_writer, reserved_client_ip_address=None):
+        """
+        The round state machine of manage_individual_client_session, running as a
+        coroutine. Packets are batched per session and only written (and drained)
+        right before we wait for the player.
+        """
+        connected_team_name = "Unknown"
+        session_metrics = self.server_metrics
+        session_started_at = time.perf_counter()
+        session_end_reason = server_metrics.SESSION_END_ERROR
+        is_counted_as_active = False
+        session_deadlines = self.session_deadline_manager.start_session(stream_writer.transport.abort, reserved_client_ip_address)
+        
+        try:
+            # Step 1: Handle the handshake (Request Packet)
+            raw_received_bytes = await self.receive_exact_bytes_async(
+                stream_reader, protocol_codec.REQUEST_PACKET_SIZE
+            )
+
+            received_cookie, received_msg_type, requested_rounds_count, decoded_team_name = protocol_codec.decode_request_packet(raw_received_bytes)
+            
+            # Security check: Kick them out if they didn't send a proper REQUEST msg
+            if not self.is_valid_game_request(received_cookie, received_msg_type, consts.ACCEPTED_SESSION_OPENING_MESSAGE_TYPES):
+                server_logger.warning("Invalid handshake from client. Closing.")
+                session_end_reason = server_metrics.SESSION_END_INVALID_HANDSHAKE
+                return
+
+            connected_team_name = decoded_team_name
+            # A continuable request keeps the connection open for more batches after this one
+            is_continuation_negotiated = received_msg_type == consts.MESSAGE_TYPE_CONTINUABLE_GAME_REQUEST
+            is_multiplexed_session = received_msg_type == consts.MESSAGE_TYPE_MULTIPLEXED_GAME_REQUEST
+            if is_multiplexed_session:
+                raw_trailer_bytes = await self.receive_exact_bytes_async(stream_reader, protocol_codec.MULTIPLEXED_REQUEST_TRAILER_SIZE)
+                multiplexed_table_count = protocol_codec.decode_multiplexed_request_trailer(raw_trailer_bytes)
+                if not self.is_valid_multiplexed_table_count(multiplexed_table_count):
+                    server_logger.warning("[%s] Invalid multiplexed table count. Closing.", connected_team_name)
+                    session_end_reason = server_metrics.SESSION_END_INVALID_HANDSHAKE
+                    return
+
+            session_deadlines.finish_handshake()
+            session_journal = None if self.round_journal_writer is None else self.round_journal_writer.open_session(connected_team_name)
+            server_logger.info("[%s] Connected. Playing %d rounds.", connected_team_name, requested_rounds_count)
+            session_metrics.handshake_phase.observe(time.perf_counter() - session_started_at)
+            session_metrics.sessions_started.increment()
+            session_metrics.sessions_active.increment()
+            is_counted_as_active = True
+            pending_outgoing_payloads = []
+
+            if is_multiplexed_session:
+                server_logger.info("[%s] Multiplexing %d tables on this connection.", connected_team_name, multiplexed_table_count)
+                await self.play_multiplexed_tables_async(
+                    stream_reader, stream_writer, pending_outgoing_payloads, multiplexed_table_count, requested_rounds_count, session_deadlines,
+                    connected_team_name, session_journal
+                )
+                server_logger.info("[%s] Finished playing. Closing connection.", connected_team_name)
+                session_end_reason = server_metrics.SESSION_END_COMPLETED
+                return
+
+            # Without shared tables the session has a private dealer for all its batches
+            table_session = None
+            if self.shared_table_registry is None:
+                table_session = self.create_table_sessions(connected_team_name, 1, pending_outgoing_payloads.append, session_journal)[0]
+            while True:
+                # Step 2: Play the requested number of rounds
+                if table_session is None:
+                    await self.play_shared_table_batch_async(
+                        stream_reader, stream_writer, pending_outgoing_payloads, requested_rounds_count, session_deadlines, connected_team_name,
+                        session_journal
+                    )
+                else:
+                    await self.play_private_table_batch_async(
+                        stream_reader, stream_writer, pending_outgoing_payloads, requested_rounds_count, session_deadlines, table_session
+                    )
+
+                if not is_continuation_negotiated:
+                    break
+
+                # Step 3: The player may ask for another batch on this same connection
+                session_deadlines.wait_for_player()
+                requested_rounds_count = await self.read_continuation_request_async(stream_reader, connected_team_name)
+                session_deadlines.player_answered()
+                if not requested_rounds_count:
+                    break
+                server_logger.info("[%s] Continuing with %d more rounds.", connected_team_name, requested_rounds_count)
+                session_metrics.session_continuations.increment()
+
+            server_logger.info("[%s] Finished playing. Closing connection.", connected_team_name)
+            session_end_reason = server_metrics.SESSION_END_COMPLETED
+
+        except asyncio.IncompleteReadError:
+            # The player hung up (possibly halfway through a packet), or we aborted a stalled connection
+            if session_deadlines.expired_budget_name is None:
+                server_logger.info("[%s] Client disconnected.", connected_team_name)
+            session_end_reason = server_metrics.SESSION_END_DISCONNECTED
+        except Exception as error_msg:
+            if session_deadlines.expired_budget_name is None:
+                server_logger.warning("[%s] Error handling client: %s", connected_team_name, error_msg)
+        finally:
+            session_deadlines.finish()
+            if session_deadlines.expired_budget_name is not None:
+                server_logger.warning("[%s] Timed out (%s deadline).", connected_team_name, session_deadlines.expired_budget_name)
+                session_end_reason = server_metrics.SESSION_END_TIMEOUT
+            stream_writer.close()
+            if is_counted_as_active:
+                session_metrics.sessions_active.decrement()
+            session_metrics.record_session_end(session_end_reason)
+
+    # ------------------------------------------------------------------
+    # Pre-fork mode: N worker processes share one port through SO_REUSEPORT
+    # ------------------------------------------------------------------
+
+    def start_prefork_server(self, worker_process_count, use_async_engine=False):
+        """
+        The GIL keeps a single process on one core. Here the supervisor (this process)
+        reserves a port, forks worker_process_count workers that each listen on it with
+        SO_REUSEPORT, and then only does two things: broadcast the single UDP offer for
+        that port, and restart any worker that dies.
+        """
+        if not hasattr(socket, "SO_REUSEPORT") or "fork" not in multiprocessing.get_all_start_methods():
+            server_logger.warning("Pre-fork mode needs SO_REUSEPORT and fork(), falling back to a single process.")
+            if use_async_engine:
+                self.start_server_async()
+            else:
+                self.start_server()
+            return
+
+        # Bound but never listening: it only keeps the port number reserved for the workers
+        port_reservation_socket = self.create_tcp_listener_socket(0, share_port_between_processes=True)
+        self.tcp_listening_port_number = port_reservation_socket.getsockname()[1]
+
+        # Workers are forked before the supervisor starts anything else, so they inherit a clean process
+        fork_context = multiprocessing.get_context("fork")
+        self.select_session_cap_for_engine(use_async_engine)
+        if self.is_capacity_taken_from_session_cap:
+            # Every worker process admits its own max_concurrent_sessions
+            self.advertised_session_capacity = self.max_concurrent_sessions * worker_process_count
+        if self.is_load_advertising_enabled:
+            # Plain shared ints without a lock: each slot has exactly one writer
+            self.worker_active_session_counts = fork_context.Array("l", worker_process_count, lock=False)
+        running_worker_processes = []
+        for worker_index in range(worker_process_count):
+            running_worker_processes.append(self.spawn_prefork_worker(fork_context, worker_index, use_async_engine))
+
+        server_logger.info("Server started with %d worker processes, listening on IP address %s", worker_process_count, self.local_machine_ip_address)
+        if hasattr(signal, "SIGUSR1"):
+            # The workers do the profiling; a SIGUSR1 to the supervisor toggles all of them
+            signal.signal(signal.SIGUSR1, functools.partial(self.forward_signal_to_workers, running_worker_processes))
+
+        self.open_offer_broadcast_sockets()
+        packed_offer_message = self.build_offer_announcement_packet()
+
+        # Single-threaded supervisor loop, so re-forking a worker never copies a busy thread
+        try:
+            while True:
+                try:
+                    self.broadcast_offer_packets(self.collect_offer_packets_to_broadcast(packed_offer_message))
+                except Exception as error_message:
+                    server_logger.warning("Error broadcasting: %s", error_message)
+
+                for worker_index, worker_process in enumerate(running_worker_processes):
+                    if not worker_process.is_alive():
+                        server_logger.warning("Worker %d exited with code %s, restarting it.", worker_index, worker_process.exitcode)
+                        running_worker_processes[worker_index] = self.spawn_prefork_worker(fork_context, worker_index, use_async_engine)
+
+                time.sleep(consts.OFFER_BROADCAST_INTERVAL_IN_SECONDS)
+        finally:
+            for worker_process in running_worker_processes:
+                worker_process.terminate()
+            port_reservation_socket.close()
+
+    def forward_signal_to_workers(self, running_worker_processes, signal_number, interrupted_frame):
+        for worker_process in running_worker_processes:
+            if worker_process.is_alive():
+                os.kill(worker_process.pid, signal_number)
+
+    def spawn_prefork_worker(self, fork_context, worker_index, use_async_engine):
+        if self.worker_active_session_counts is not None:
+            # A replacement worker starts with no sessions
+            self.worker_active_session_counts[worker_index] = 0
+        worker_process = fork_context.Process(
+            target=self.run_prefork_worker,
+            args=(worker_index, use_async_engine),
+            name=f"blackjack-worker-{worker_index}",
+            daemon=True
+        )
+        worker_process.start()
+        return worker_process
+
+    def run_prefork_worker(self, worker_index, use_async_engine):
+        """
+        Body of one worker process: its own SO_REUSEPORT listener on the shared port and
+        the regular session handling, without any UDP broadcasting.
+        """
+        game_logging.restart_server_logging_after_fork()
+        self.session_profiler.start_for_process()
+        self.start_metrics_endpoint(port_offset=worker_index)
+        self.start_leaderboard_snapshots(worker_index)
+        if self.worker_active_session_counts is not None:
+            threading.Thread(
+                target=self.publish_worker_session_count_forever, args=(worker_index,),
+                name="session-count-publisher", daemon=True
+            ).start()
+        worker_listener_socket = self.create_tcp_listener_socket(self.tcp_listening_port_number, share_port_between_processes=True)
+
+        if use_async_engine:
+            raise_open_file_limit_to_maximum()
+            asyncio.run(self.run_async_event_loop(prebound_listener_socket=worker_listener_socket))
+            return
+
+        self.tcp_connection_listener_socket = worker_listener_socket
+        self.tcp_connection_listener_socket.listen(consts.TCP_LISTENER_BACKLOG_SIZE)
+        self.accept_client_connections_forever()
+
+
+    def publish_worker_session_count_forever(self, worker_index):
+        """
+        Copies this worker's active session count into shared memory once per offer
+        interval, which is as fresh as the supervisor's broadcast ever needs it.
+        """
+        while True:
+            self.worker_active_session_counts[worker_index] = self.server_metrics.sessions_active.current_value()
+            time.sleep(consts.OFFER_BROADCAST_INTERVAL_IN_SECONDS)
+
+
+def raise_open_file_limit_to_maximum():
+    """
+    Every player is an open socket, so 10k players need 10k file descriptors.
+    We bump the soft limit up to whatever the hard limit allows.
+    """
+    if resource is None:
+        return
+    try:
+        soft_limit, hard_limit = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if hard_limit == resource.RLIM_INFINITY or soft_limit < hard_limit:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard_limit, hard_limit))
+    except (ValueError, OSError) as error_message:
+        server_logger.warning("Could not raise open file limit: %s", error_message)
+
+
+def parse_command_line_arguments():
+    argument_parser = argparse.ArgumentParser(
+        description="Blackjack game server",
+        epilog="Profiling is opt-in through the environment or SIGUSR1, see session_profiler.py."
+    )
+    argument_parser.add_argument(
+        "--async", dest="use_async_engine", action="store_true",
+        help="run every session on a single asyncio event loop instead of a thread per client"
+    )
+    argument_parser.add_argument(
+        "--workers", type=int, default=1,
+        help="number of worker processes sharing the TCP port via SO_REUSEPORT (1 = single process)"
+    )
+    argument_parser.add_argument(
+        "--decks", type=int, default=1,
+        help="decks per shoe; 1 reshuffles every round, more decks play down to a cut card"
+    )
+    argument_parser.add_argument(
+        "--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="DEBUG also logs every card and round result (slow under load)"
+    )
+    argument_parser.add_argument(
+        "--log-format", default=game_logging.LOG_FORMAT_TEXT,
+        choices=[game_logging.LOG_FORMAT_TEXT, game_logging.LOG_FORMAT_JSON_LINES],
+        help="plain text lines or one JSON object per line"
+    )
+    argument_parser.add_argument(
+        "--metrics-port", type=int, default=None,
+        help="serve Prometheus metrics on this local port (pre-fork workers use port + worker index)"
+    )
+    argument_parser.add_argument(
+        "--metrics-host", default="127.0.0.1",
+        help="address the metrics endpoint binds to (default: loopback only)"
+    )
+    argument_parser.add_argument(
+        "--advertise-load", action="store_true",
+        help="also broadcast the extended offer with our active session count, for load-aware clients"
+    )
+    argument_parser.add_argument(
+        "--capacity", type=int, default=None,
+        help="session capacity to advertise in the extended offer (default: the session cap, 0 = no stated limit)"
+    )
+    argument_parser.add_argument(
+        "--max-sessions", type=int, default=None,
+        help="sessions played at the same time per process; more connections wait in the admission queue (default: 512, 65536 with --async)"
+    )
+    argument_parser.add_argument(
+        "--admission-queue", type=int, default=consts.DEFAULT_ADMISSION_QUEUE_CAPACITY,
+        help="connections that may wait for a free session slot before new ones get the busy notice"
+    )
+    argument_parser.add_argument(
+        "--queue-deadline", type=float, default=consts.DEFAULT_ADMISSION_QUEUE_DEADLINE_IN_SECONDS,
+        help="seconds a queued connection may wait for a slot before it gets the busy notice"
+    )
+    argument_parser.add_argument(
+        "--handshake-timeout", type=float, default=consts.HANDSHAKE_DEADLINE_IN_SECONDS,
+        help="seconds a connection has to send its request packet; one timer wheel enforces all three budgets and aborts connections that overrun them"
+    )
+    argument_parser.add_argument(
+        "--decision-timeout", type=float, default=consts.PLAYER_DECISION_DEADLINE_IN_SECONDS,
+        help="seconds the player has for each Hit/Stand (and for asking for the next batch)"
+    )
+    argument_parser.add_argument(
+        "--session-timeout", type=float, default=consts.SESSION_DEADLINE_IN_SECONDS,
+        help="seconds a whole session may last"
+    )
+    argument_parser.add_argument(
+        "--journal-dir", default=None,
+        help="append every round to a binary journal in this directory (read it with round_journal.py)"
+    )
+    argument_parser.add_argument(
+        "--leaderboard-file", default=None,
+        help="save the team standings (also served at /leaderboard next to the metrics) to this JSON file; reloaded on start, one file per worker with --workers"
+    )
+    argument_parser.add_argument(
+        "--leaderboard-interval", type=float, default=consts.DEFAULT_LEADERBOARD_SNAPSHOT_INTERVAL_IN_SECONDS,
+        help="seconds between two snapshots of the --leaderboard-file"
+    )
+    argument_parser.add_argument(
+        "--seed", type=int, default=None,
+        help="deal reproducibly: the same seed deals the same cards to each team's n-th session on every run"
+    )
+    argument_parser.add_argument(
+        "--interfaces", default=None,
+        help="comma separated interface names or IPv4 addresses to announce offers on (default: every interface but loopback); with more than one the listener accepts on all addresses"
+    )
+    argument_parser.add_argument(
+        "--table-size", type=int, default=consts.DEFAULT_SHARED_TABLE_SIZE,
+        choices=range(1, consts.MAX_SHARED_TABLE_SIZE + 1), metavar=f"1-{consts.MAX_SHARED_TABLE_SIZE}",
+        help="seat up to this many single-table players at one dealer and one shoe (1 = a private dealer for every session); multiplexed sessions keep their private tables"
+    )
+    argument_parser.add_argument(
+        "--max-pending-handshakes", type=int, default=consts.MAX_PENDING_HANDSHAKES_PER_SOURCE_IP,
+        help="connections one IP may have open without having sent their request yet (0 = no limit)"
+    )
+    command_line_arguments = argument_parser.parse_args()
+    # An empty shoe would only fail on the first card dealt
+    if command_line_arguments.decks < 1:
+        argument_parser.error("--decks must be at least 1")
+    # Zero or negative workers would otherwise quietly fall back to a single process
+    if command_line_arguments.workers < 1:
+        argument_parser.error("--workers must be at least 1")
+    # A zero session cap would queue every connection forever, and a zero or negative budget
+    # would drop every client before its first packet
+    if command_line_arguments.max_sessions is not None and command_line_arguments.max_sessions < 1:
+        argument_parser.error("--max-sessions must be at least 1")
+    if command_line_arguments.admission_queue < 0:
+        argument_parser.error("--admission-queue must be at least 0")
+    if command_line_arguments.queue_deadline < 0:
+        argument_parser.error("--queue-deadline must not be negative")
+    for option_name, budget_seconds in (
+        ("--handshake-timeout", command_line_arguments.handshake_timeout),
+        ("--decision-timeout", command_line_arguments.decision_timeout),
+        ("--session-timeout", command_line_arguments.session_timeout),
+    ):
+        if budget_seconds <= 0:
+            argument_parser.error(f"{option_name} must be greater than 0")
+    if command_line_arguments.max_pending_handshakes < 0:
+        argument_parser.error("--max-pending-handshakes must be at least 0 (0 = no limit)")
+    if command_line_arguments.interfaces:
+        command_line_arguments.interfaces = [
+            interface_name.strip() for interface_name in command_line_arguments.interfaces.split(",")
+            if interface_name.strip()
+        ]
+        # A typo should read like any other bad option, not end in a traceback from Server()
+        try:
+            select_broadcast_interfaces(command_line_arguments.interfaces)
+        except ValueError as error_message:
+            argument_parser.error(f"--interfaces: {error_message}")
+    return command_line_arguments
 
 if __name__ == "__main__":
-    game_server_instance = Server()
-    game_server_instance.start_server()
\ No newline at end of file
+    command_line_arguments = parse_command_line_arguments()
+    game_logging.configure_server_logging(command_line_arguments.log_level, command_line_arguments.log_format)
+    game_server_instance = Server(
+        shoe_deck_count=command_line_arguments.decks,
+        metrics_http_port=command_line_arguments.metrics_port,
+        metrics_http_host=command_line_arguments.metrics_host,
+        advertise_load_in_offers=command_line_arguments.advertise_load,
+        advertised_session_capacity=command_line_arguments.capacity,
+        max_concurrent_sessions=command_line_arguments.max_sessions,
+        admission_queue_capacity=command_line_arguments.admission_queue,
+        admission_queue_deadline_seconds=command_line_arguments.queue_deadline,
+        handshake_deadline_seconds=command_line_arguments.handshake_timeout,
+        player_decision_deadline_seconds=command_line_arguments.decision_timeout,
+        session_deadline_seconds=command_line_arguments.session_timeout,
+        max_pending_handshakes_per_ip=command_line_arguments.max_pending_handshakes,
+        round_journal_directory=command_line_arguments.journal_dir,
+        leaderboard_snapshot_path=command_line_arguments.leaderboard_file,
+        leaderboard_snapshot_interval_seconds=command_line_arguments.leaderboard_interval,
+        deal_seed=command_line_arguments.seed,
+        shared_table_size=command_line_arguments.table_size,
+        broadcast_interface_names=command_line_arguments.interfaces
+    )
+    if command_line_arguments.workers > 1:
+        game_server_instance.start_prefork_server(command_line_arguments.workers, command_line_arguments.use_async_engine)
+    elif command_line_arguments.use_async_engine:
+        game_server_instance.start_server_async()
+    else:
+        game_server_instance.start_server()
\ No newline at end of file
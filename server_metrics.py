@@ -0,0 +1,429 @@
+"""
+server_metrics.py
+In-process metrics for the game server: counters, up/down gauges and fixed-bucket
+latency histograms, exported in the Prometheus text format over a tiny local HTTP
+endpoint (GET /metrics). The same endpoint serves the team standings as JSON
+(GET /leaderboard?top=N, see team_leaderboard.py).
+
+Updates are lock-free on the hot path. Every thread gets its own list of cells and
+only ever writes to that list, so a session thread bumping a counter is a single
+list item += with no lock and no contention. A scrape sums the cells of all threads;
+cells of finished threads are folded into one "retired" list so a thread-per-client
+server does not keep thousands of them around.
+"""
+
+import bisect
+import http.server
+import json
+import threading
+import urllib.parse
+
+import consts
+from session_worker_pool import REJECTION_REASONS
+from deadline_timer_wheel import DEADLINE_BUDGETS
+
+PROMETHEUS_TEXT_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+JSON_CONTENT_TYPE = "application/json"
+
+# Upper bounds (seconds) for everything that happens inside the server, 50us .. 10s
+SERVER_LATENCY_BUCKETS_IN_SECONDS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+# The player's turn and decision waits include a human thinking, so they go up to the session timeout
+PLAYER_WAIT_BUCKETS_IN_SECONDS = SERVER_LATENCY_BUCKETS_IN_SECONDS + (30.0, 60.0, 120.0, 300.0, 600.0)
+
+ROUND_PHASE_HANDSHAKE = "handshake"
+ROUND_PHASE_DEAL = "deal"
+ROUND_PHASE_PLAYER_TURN = "player_turn"
+ROUND_PHASE_DEALER_TURN = "dealer_turn"
+ROUND_PHASE_RESULT = "result"
+ROUND_PHASES = (ROUND_PHASE_HANDSHAKE, ROUND_PHASE_DEAL, ROUND_PHASE_PLAYER_TURN, ROUND_PHASE_DEALER_TURN, ROUND_PHASE_RESULT)
+
+SESSION_END_COMPLETED = "completed"
+SESSION_END_DISCONNECTED = "disconnected"
+SESSION_END_INVALID_HANDSHAKE = "invalid_handshake"
+SESSION_END_TIMEOUT = "timeout"
+SESSION_END_ERROR = "error"
+SESSION_END_REASONS = (
+    SESSION_END_COMPLETED, SESSION_END_DISCONNECTED, SESSION_END_INVALID_HANDSHAKE,
+    SESSION_END_TIMEOUT, SESSION_END_ERROR
+)
+
+# Result code on the wire -> label value in the export
+ROUND_RESULT_LABELS_BY_CODE = {
+    consts.GAME_RESULT_INDICATOR_PLAYER_WIN: "win",
+    consts.GAME_RESULT_INDICATOR_PLAYER_LOSS: "loss",
+    consts.GAME_RESULT_INDICATOR_TIE: "tie",
+}
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """
+        Owns the cell layout (every metric reserves a few slots) and the per-thread
+        cell lists. All metrics must be created before the first update, which is
+        why GameServerMetrics builds the whole set in its constructor.
+        """
+        self.metric_families = []
+        self.allocated_slot_count = 0
+        self.per_thread_storage = threading.local()
+        self.live_thread_cells = []
+        self.retired_thread_cells = []
+        self.cells_lock = threading.Lock()
+
+    def allocate_slots(self, slot_count):
+        first_slot_index = self.allocated_slot_count
+        self.allocated_slot_count += slot_count
+        return first_slot_index
+
+    def register_family(self, metric_family):
+        self.metric_families.append(metric_family)
+        return metric_family
+
+    def current_thread_cells(self):
+        try:
+            return self.per_thread_storage.cells
+        except AttributeError:
+            # First update from this thread: hand it a private list (the only locked step)
+            new_cells = [0] * self.allocated_slot_count
+            self.per_thread_storage.cells = new_cells
+            with self.cells_lock:
+                self.live_thread_cells.append((threading.current_thread(), new_cells))
+            return new_cells
+
+    def sum_all_cells(self):
+        """
+        Adds up every thread's cells. Threads that ended since the last scrape are
+        merged into the retired list first; they can no longer write, so that is safe.
+        """
+        with self.cells_lock:
+            if not self.retired_thread_cells:
+                self.retired_thread_cells = [0] * self.allocated_slot_count
+
+            still_running = []
+            for owner_thread, thread_cells in self.live_thread_cells:
+                if owner_thread.is_alive():
+                    still_running.append((owner_thread, thread_cells))
+                else:
+                    for slot_index, slot_value in enumerate(thread_cells):
+                        self.retired_thread_cells[slot_index] += slot_value
+            self.live_thread_cells = still_running
+
+            cell_totals = list(self.retired_thread_cells)
+            for _, thread_cells in still_running:
+                for slot_index, slot_value in enumerate(thread_cells):
+                    cell_totals[slot_index] += slot_value
+        return cell_totals
+
+    def read_slot_total(self, slot_index):
+        """
+        The current total of a single slot, without folding or copying the other cells.
+        """
+        with self.cells_lock:
+            slot_total = self.retired_thread_cells[slot_index] if self.retired_thread_cells else 0
+            for _, thread_cells in self.live_thread_cells:
+                slot_total += thread_cells[slot_index]
+        return slot_total
+
+    def render_prometheus_text(self):
+        cell_totals = self.sum_all_cells()
+        exported_lines = []
+        for metric_family in self.metric_families:
+            metric_family.render_lines(cell_totals, exported_lines)
+        return "\n".join(exported_lines) + "\n"
+
+
+def format_label_set(label_pairs):
+    if not label_pairs:
+        return ""
+    return "{" + ",".join(f'{label_name}="{label_value}"' for label_name, label_value in label_pairs) + "}"
+
+
+class CounterMetric:
+    def __init__(self, metrics_registry, metric_name, help_text, label_name=None, label_values=(None,), metric_type="counter"):
+        """
+        A monotonically increasing count. With label_name set, one child per label value
+        is created up front; labels(value) returns the child to update.
+        """
+        self.metrics_registry = metrics_registry
+        self.metric_name = metric_name
+        self.help_text = help_text
+        self.metric_type = metric_type
+        self.label_name = label_name
+        self.children_by_label_value = {
+            label_value: CounterChild(metrics_registry, metrics_registry.allocate_slots(1))
+            for label_value in label_values
+        }
+        metrics_registry.register_family(self)
+
+    def labels(self, label_value):
+        return self.children_by_label_value[label_value]
+
+    def increment(self, amount=1):
+        self.children_by_label_value[None].increment(amount)
+
+    def render_lines(self, cell_totals, exported_lines):
+        exported_lines.append(f"# HELP {self.metric_name} {self.help_text}")
+        exported_lines.append(f"# TYPE {self.metric_name} {self.metric_type}")
+        for label_value, counter_child in self.children_by_label_value.items():
+            label_pairs = [(self.label_name, label_value)] if label_value is not None else []
+            exported_lines.append(f"{self.metric_name}{format_label_set(label_pairs)} {cell_totals[counter_child.slot_index]}")
+
+
+class CounterChild:
+    __slots__ = ("metrics_registry", "slot_index")
+
+    def __init__(self, metrics_registry, slot_index):
+        self.metrics_registry = metrics_registry
+        self.slot_index = slot_index
+
+    def increment(self, amount=1):
+        self.metrics_registry.current_thread_cells()[self.slot_index] += amount
+
+    # Gauges built on the same cells simply go down as well
+    def decrement(self, amount=1):
+        self.metrics_registry.current_thread_cells()[self.slot_index] -= amount
+
+
+class GaugeMetric(CounterMetric):
+    def __init__(self, metrics_registry, metric_name, help_text, label_name=None, label_values=(None,)):
+        """
+        An up/down value such as active sessions. Every thread keeps its own +/- delta,
+        the scrape adds them up, so the thread that increments should also decrement.
+        """
+        super().__init__(metrics_registry, metric_name, help_text, label_name, label_values, metric_type="gauge")
+
+    def decrement(self, amount=1):
+        self.children_by_label_value[None].decrement(amount)
+
+    def current_value(self):
+        return self.metrics_registry.read_slot_total(self.children_by_label_value[None].slot_index)
+
+
+class CallbackGaugeMetric:
+    def __init__(self, metrics_registry, metric_name, help_text, value_callback):
+        """
+        A gauge read at scrape time (pool sizes, thread counts), costs nothing in between.
+        """
+        self.metric_name = metric_name
+        self.help_text = help_text
+        self.value_callback = value_callback
+        metrics_registry.register_family(self)
+
+    def render_lines(self, cell_totals, exported_lines):
+        exported_lines.append(f"# HELP {self.metric_name} {self.help_text}")
+        exported_lines.append(f"# TYPE {self.metric_name} gauge")
+        exported_lines.append(f"{self.metric_name} {self.value_callback()}")
+
+
+class HistogramMetric:
+    def __init__(self, metrics_registry, metric_name, help_text, bucket_upper_bounds, label_name=None, label_values=(None,)):
+        """
+        Fixed buckets, so an observation is one bisect and two cell updates.
+        Each child reserves len(buckets) + 1 (the +Inf bucket) + 1 (the sum) slots.
+        """
+        self.metric_name = metric_name
+        self.help_text = help_text
+        self.bucket_upper_bounds = tuple(bucket_upper_bounds)
+        self.label_name = label_name
+        self.children_by_label_value = {
+            label_value: HistogramChild(
+                metrics_registry,
+                self.bucket_upper_bounds,
+                metrics_registry.allocate_slots(len(self.bucket_upper_bounds) + 2)
+            )
+            for label_value in label_values
+        }
+        metrics_registry.register_family(self)
+
+    def labels(self, label_value):
+        return self.children_by_label_value[label_value]
+
+    def observe(self, observed_value):
+        self.children_by_label_value[None].observe(observed_value)
+
+    def render_lines(self, cell_totals, exported_lines):
+        exported_lines.append(f"# HELP {self.metric_name} {self.help_text}")
+        exported_lines.append(f"# TYPE {self.metric_name} histogram")
+        for label_value, histogram_child in self.children_by_label_value.items():
+            base_label_pairs = [(self.label_name, label_value)] if label_value is not None else []
+            cumulative_count = 0
+            for bucket_offset, upper_bound in enumerate(self.bucket_upper_bounds + ("+Inf",)):
+                cumulative_count += cell_totals[histogram_child.first_slot_index + bucket_offset]
+                bucket_labels = format_label_set(base_label_pairs + [("le", upper_bound)])
+                exported_lines.append(f"{self.metric_name}_bucket{bucket_labels} {cumulative_count}")
+            series_labels = format_label_set(base_label_pairs)
+            exported_lines.append(f"{self.metric_name}_sum{series_labels} {cell_totals[histogram_child.sum_slot_index]}")
+            exported_lines.append(f"{self.metric_name}_count{series_labels} {cumulative_count}")
+
+
+class HistogramChild:
+    __slots__ = ("metrics_registry", "bucket_upper_bounds", "first_slot_index", "sum_slot_index")
+
+    def __init__(self, metrics_registry, bucket_upper_bounds, first_slot_index):
+        self.metrics_registry = metrics_registry
+        self.bucket_upper_bounds = bucket_upper_bounds
+        self.first_slot_index = first_slot_index
+        self.sum_slot_index = first_slot_index + len(bucket_upper_bounds) + 1
+
+    def observe(self, observed_value):
+        thread_cells = self.metrics_registry.current_thread_cells()
+        # bisect_left finds the first bound >= value, i.e. Prometheus' "le" bucket (or +Inf)
+        thread_cells[self.first_slot_index + bisect.bisect_left(self.bucket_upper_bounds, observed_value)] += 1
+        thread_cells[self.sum_slot_index] += observed_value
+
+
+class GameServerMetrics:
+    def __init__(self, queued_session_count_callback=None):
+        """
+        Every metric the server reports, created in one go so the cell layout is fixed
+        before the first session thread touches it.
+        """
+        self.metrics_registry = MetricsRegistry()
+
+        self.sessions_started = CounterMetric(
+            self.metrics_registry, "blackjack_sessions_started_total", "Client connections that reached the handshake."
+        )
+        self.sessions_active = GaugeMetric(
+            self.metrics_registry, "blackjack_sessions_active", "Sessions currently being played."
+        )
+        self.sessions_ended = CounterMetric(
+            self.metrics_registry, "blackjack_sessions_ended_total", "Finished sessions by how they ended.",
+            "reason", SESSION_END_REASONS
+        )
+        self.sessions_rejected = CounterMetric(
+            self.metrics_registry, "blackjack_sessions_rejected_total",
+            "Connections turned away with the busy notice by admission control.",
+            "reason", REJECTION_REASONS
+        )
+        self.deadline_expirations = CounterMetric(
+            self.metrics_registry, "blackjack_deadline_expirations_total",
+            "Connections aborted because a deadline budget ran out.",
+            "budget", DEADLINE_BUDGETS
+        )
+        self.admission_queue_wait_seconds = HistogramMetric(
+            self.metrics_registry, "blackjack_admission_queue_wait_seconds",
+            "Time a connection waited for a free session slot.",
+            SERVER_LATENCY_BUCKETS_IN_SECONDS
+        )
+        self.session_continuations = CounterMetric(
+            self.metrics_registry, "blackjack_session_continuations_total",
+            "Extra batches of rounds played on an already open connection."
+        )
+        self.rounds_completed = CounterMetric(
+            self.metrics_registry, "blackjack_rounds_completed_total", "Rounds that reached a verdict."
+        )
+        self.round_results = CounterMetric(
+            self.metrics_registry, "blackjack_round_results_total", "Round verdicts from the player's point of view.",
+            "result", tuple(ROUND_RESULT_LABELS_BY_CODE.values())
+        )
+        self.player_busts = CounterMetric(
+            self.metrics_registry, "blackjack_player_busts_total", "Rounds lost by going over 21."
+        )
+        self.dealer_busts = CounterMetric(
+            self.metrics_registry, "blackjack_dealer_busts_total", "Rounds where the dealer went over 21."
+        )
+        self.round_phase_seconds = HistogramMetric(
+            self.metrics_registry, "blackjack_round_phase_seconds",
+            "Wall time spent in each phase (handshake is per session, the rest per round).",
+            PLAYER_WAIT_BUCKETS_IN_SECONDS, "phase", ROUND_PHASES
+        )
+        self.round_duration_seconds = HistogramMetric(
+            self.metrics_registry, "blackjack_round_duration_seconds", "Wall time of a whole round.",
+            PLAYER_WAIT_BUCKETS_IN_SECONDS
+        )
+        self.decision_wait_seconds = HistogramMetric(
+            self.metrics_registry, "blackjack_decision_wait_seconds",
+            "From our last write until the player's decision arrived (network + thinking).",
+            PLAYER_WAIT_BUCKETS_IN_SECONDS
+        )
+        self.send_seconds = HistogramMetric(
+            self.metrics_registry, "blackjack_send_seconds", "Time spent in one flush of queued payloads.",
+            SERVER_LATENCY_BUCKETS_IN_SECONDS
+        )
+        self.payloads_sent = CounterMetric(
+            self.metrics_registry, "blackjack_payloads_sent_total", "Card and verdict payloads queued for clients."
+        )
+
+        CallbackGaugeMetric(
+            self.metrics_registry, "blackjack_threads", "Python threads alive in this process.", threading.active_count
+        )
+        if queued_session_count_callback is not None:
+            CallbackGaugeMetric(
+                self.metrics_registry, "blackjack_admission_queue_depth", "Connections waiting for a free session slot.",
+                queued_session_count_callback
+            )
+
+        # Handles for the hot path, so a round does not look up labels every time
+        self.handshake_phase = self.round_phase_seconds.labels(ROUND_PHASE_HANDSHAKE)
+        self.deal_phase = self.round_phase_seconds.labels(ROUND_PHASE_DEAL)
+        self.player_turn_phase = self.round_phase_seconds.labels(ROUND_PHASE_PLAYER_TURN)
+        self.dealer_turn_phase = self.round_phase_seconds.labels(ROUND_PHASE_DEALER_TURN)
+        self.result_phase = self.round_phase_seconds.labels(ROUND_PHASE_RESULT)
+        self.round_result_counters_by_code = {
+            result_code: self.round_results.labels(result_label)
+            for result_code, result_label in ROUND_RESULT_LABELS_BY_CODE.items()
+        }
+
+    def record_deadline_expiration(self, budget_name):
+        self.deadline_expirations.labels(budget_name).increment()
+
+    def record_session_end(self, end_reason):
+        self.sessions_ended.labels(end_reason).increment()
+
+    def render_prometheus_text(self):
+        return self.metrics_registry.render_prometheus_text()
+
+
+class MetricsRequestHandler(http.server.BaseHTTPRequestHandler):
+    # Filled in per server by start_metrics_http_server
+    game_server_metrics = None
+    team_leaderboard = None
+
+    def do_GET(self):
+        parsed_url = urllib.parse.urlsplit(self.path)
+        if parsed_url.path == "/metrics":
+            self.send_response_body(self.game_server_metrics.render_prometheus_text(), PROMETHEUS_TEXT_CONTENT_TYPE)
+        elif parsed_url.path == "/leaderboard" and self.team_leaderboard is not None:
+            query_parameters = urllib.parse.parse_qs(parsed_url.query)
+            try:
+                top_team_count = int(query_parameters.get("top", [consts.DEFAULT_LEADERBOARD_TOP_TEAM_COUNT])[0])
+            except ValueError:
+                self.send_error(400, "top must be a number")
+                return
+            leaderboard_document = {
+                "team_count": self.team_leaderboard.team_count(),
+                "teams": self.team_leaderboard.top_teams(max(top_team_count, 0)),
+            }
+            self.send_response_body(json.dumps(leaderboard_document), JSON_CONTENT_TYPE)
+        else:
+            self.send_error(404, "Only /metrics and /leaderboard live here")
+
+    def send_response_body(self, response_text, content_type):
+        response_body = response_text.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(response_body)))
+        self.end_headers()
+        self.wfile.write(response_body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would drown the game log
+        pass
+
+
+def start_metrics_http_server(game_server_metrics, listen_host, listen_port, team_leaderboard=None):
+    """
+    Serves GET /metrics (and GET /leaderboard, given a team_leaderboard) on a daemon
+    thread and returns the HTTP server object.
+    """
+    bound_handler_class = type(
+        "BoundMetricsRequestHandler", (MetricsRequestHandler,),
+        {"game_server_metrics": game_server_metrics, "team_leaderboard": team_leaderboard}
+    )
+    metrics_http_server = http.server.ThreadingHTTPServer((listen_host, listen_port), bound_handler_class)
+    metrics_http_server.daemon_threads = True
+    threading.Thread(target=metrics_http_server.serve_forever, name="metrics-http", daemon=True).start()
+    return metrics_http_server
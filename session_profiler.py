@@ -0,0 +1,239 @@
+"""
+session_profiler.py
+Opt-in profiling of a live server, to tell whether a slow server spends its time packing,
+logging, waiting on locks or waiting on the network. Two profilers, usable together:
+
+  sample    A background thread grabs the stack of every thread each interval and
+            counts identical stacks. Written in collapsed-stack format ("frame;frame;frame
+            count" per line), ready for flamegraph.pl or speedscope. Cheap enough for
+            production and it sees everything, including threads blocked in recv or on a lock.
+  cprofile  A random share of the threaded sessions runs under cProfile; their stats are
+            summed up and written as one pstats file (python -m pstats FILE). Exact call
+            counts, but only for the session threads picked.
+
+Turned on by environment variables when the server starts:
+  BLACKJACK_PROFILE=sample[,cprofile]   which profilers run (empty: none)
+  BLACKJACK_PROFILE_DIR=DIR             where the profiles go (default: ./profiles)
+  BLACKJACK_PROFILE_INTERVAL=SECONDS    time between two stack samples
+  BLACKJACK_PROFILE_SESSIONS=FRACTION   share of sessions under cProfile
+or at any moment with SIGUSR1: the first signal starts the profilers (the ones named in
+BLACKJACK_PROFILE, or just the sampler), the next one stops them and writes the files.
+Profiles are also written when the process exits. While profiling is off the sessions
+pay one attribute check each, nothing more.
+
+Sessions of the async engine are coroutines on one thread: use the sampler there, it
+shows whatever the event loop thread is running (a suspended coroutine has no stack).
+"""
+
+import atexit
+import collections
+import cProfile
+import functools
+import os
+import pstats
+import random
+import re
+import signal
+import sys
+import threading
+import time
+
+import consts
+import game_logging
+
+PROFILE_MODE_SAMPLE = "sample"
+PROFILE_MODE_CPROFILE = "cprofile"
+PROFILE_MODES = (PROFILE_MODE_SAMPLE, PROFILE_MODE_CPROFILE)
+
+PROFILE_MODES_ENVIRONMENT_VARIABLE = "BLACKJACK_PROFILE"
+PROFILE_DIRECTORY_ENVIRONMENT_VARIABLE = "BLACKJACK_PROFILE_DIR"
+PROFILE_INTERVAL_ENVIRONMENT_VARIABLE = "BLACKJACK_PROFILE_INTERVAL"
+PROFILED_SESSION_FRACTION_ENVIRONMENT_VARIABLE = "BLACKJACK_PROFILE_SESSIONS"
+
+DEFAULT_PROFILE_DIRECTORY = "profiles"
+
+# session-worker-17 and session-worker-3 play the same code, their stacks belong together
+THREAD_NUMBER_SUFFIX_PATTERN = re.compile(r"-\d+$")
+
+server_logger = game_logging.get_server_logger()
+
+
+@functools.lru_cache(maxsize=None)
+def describe_code(frame_code):
+    return f"{frame_code.co_name} ({os.path.basename(frame_code.co_filename)}:{frame_code.co_firstlineno})"
+
+
+class StackSampler:
+    def __init__(self, sample_interval_seconds):
+        self.sample_interval_seconds = sample_interval_seconds
+        # Collapsed stack (outermost frame first, the thread's group name in front) -> samples
+        self.collapsed_stack_counts = collections.Counter()
+        self.sample_count = 0
+        self.stop_requested = threading.Event()
+        self.sampler_thread = threading.Thread(target=self.sample_until_stopped, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self.sampler_thread.start()
+
+    def stop(self):
+        self.stop_requested.set()
+        self.sampler_thread.join()
+
+    def sample_until_stopped(self):
+        sampler_thread_id = threading.get_ident()
+        while not self.stop_requested.wait(self.sample_interval_seconds):
+            self.take_sample(sampler_thread_id)
+
+    def take_sample(self, sampler_thread_id):
+        thread_names_by_id = {running_thread.ident: running_thread.name for running_thread in threading.enumerate()}
+        for thread_id, innermost_frame in sys._current_frames().items():
+            if thread_id == sampler_thread_id:
+                continue
+            frame_labels = []
+            current_frame = innermost_frame
+            while current_frame is not None:
+                frame_labels.append(describe_code(current_frame.f_code))
+                current_frame = current_frame.f_back
+            frame_labels.append(THREAD_NUMBER_SUFFIX_PATTERN.sub("", thread_names_by_id.get(thread_id, "unknown-thread")))
+            frame_labels.reverse()
+            self.collapsed_stack_counts[";".join(frame_labels)] += 1
+        self.sample_count += 1
+
+    def write_collapsed_stacks(self, collapsed_stacks_path):
+        with open(collapsed_stacks_path, "w", encoding="utf-8") as collapsed_stacks_file:
+            for collapsed_stack, stack_sample_count in self.collapsed_stack_counts.most_common():
+                collapsed_stacks_file.write(f"{collapsed_stack} {stack_sample_count}\n")
+
+
+class SessionProfiler:
+    def __init__(self, profile_modes=(), profile_directory=DEFAULT_PROFILE_DIRECTORY,
+                 sample_interval_seconds=consts.DEFAULT_PROFILE_SAMPLE_INTERVAL_IN_SECONDS,
+                 profiled_session_fraction=consts.DEFAULT_PROFILED_SESSION_FRACTION):
+        """
+        profile_modes are started by start_for_process right away; with none, SIGUSR1
+        starts the sampler alone.
+        """
+        unknown_profile_modes = set(profile_modes) - set(PROFILE_MODES)
+        if unknown_profile_modes:
+            raise ValueError(f"Unknown profile modes {sorted(unknown_profile_modes)}, expected some of {PROFILE_MODES}")
+        self.profile_modes = tuple(profile_modes)
+        self.profile_directory = profile_directory
+        self.sample_interval_seconds = sample_interval_seconds
+        self.profiled_session_fraction = profiled_session_fraction
+        self.profiler_lock = threading.Lock()
+        self.is_profiling = False
+        # Read by every session without the lock; the only thing profiling costs while it is off
+        self.is_profiling_sessions = False
+        self.stack_sampler = None
+        self.aggregated_session_stats = None
+        self.profiled_session_count = 0
+        self.profiling_started_at = 0.0
+        self.session_picker = random.Random()
+
+    @classmethod
+    def from_environment(cls, environment=os.environ):
+        profile_modes = [profile_mode.strip() for profile_mode in environment.get(PROFILE_MODES_ENVIRONMENT_VARIABLE, "").split(",")]
+        return cls(
+            [profile_mode for profile_mode in profile_modes if profile_mode],
+            environment.get(PROFILE_DIRECTORY_ENVIRONMENT_VARIABLE, DEFAULT_PROFILE_DIRECTORY),
+            float(environment.get(PROFILE_INTERVAL_ENVIRONMENT_VARIABLE, consts.DEFAULT_PROFILE_SAMPLE_INTERVAL_IN_SECONDS)),
+            float(environment.get(PROFILED_SESSION_FRACTION_ENVIRONMENT_VARIABLE, consts.DEFAULT_PROFILED_SESSION_FRACTION))
+        )
+
+    def start_for_process(self):
+        """
+        Call where the sessions run (after a fork): installs the SIGUSR1 toggle, starts the
+        profilers named in the environment and writes whatever was collected at exit.
+        """
+        # Signal handlers can only be set from the main thread (not when embedded in tests)
+        if hasattr(signal, "SIGUSR1") and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGUSR1, self.handle_toggle_signal)
+        atexit.register(self.stop_profiling_safely)
+        if self.profile_modes:
+            self.start_profiling()
+
+    def handle_toggle_signal(self, signal_number, interrupted_frame):
+        # Off the main thread: it may be inside a lock the profiler needs, or in the middle of a log write
+        threading.Thread(target=self.toggle_profiling, name="profile-toggle", daemon=True).start()
+
+    def toggle_profiling(self):
+        if self.is_profiling:
+            self.stop_profiling_safely()
+        else:
+            self.start_profiling()
+
+    def start_profiling(self):
+        profile_modes = self.profile_modes or (PROFILE_MODE_SAMPLE,)
+        with self.profiler_lock:
+            if self.is_profiling:
+                return
+            self.is_profiling = True
+            self.profiling_started_at = time.time()
+            if PROFILE_MODE_SAMPLE in profile_modes:
+                self.stack_sampler = StackSampler(self.sample_interval_seconds)
+                self.stack_sampler.start()
+            self.is_profiling_sessions = PROFILE_MODE_CPROFILE in profile_modes
+        server_logger.info("Profiling started (%s), profiles go to %s.", ", ".join(profile_modes), self.profile_directory)
+
+    def stop_profiling(self):
+        """
+        Stops the profilers and writes their files. Returns the paths written.
+        """
+        with self.profiler_lock:
+            if not self.is_profiling:
+                return []
+            self.is_profiling = False
+            self.is_profiling_sessions = False
+            stack_sampler, self.stack_sampler = self.stack_sampler, None
+            aggregated_session_stats, self.aggregated_session_stats = self.aggregated_session_stats, None
+            profiled_session_count, self.profiled_session_count = self.profiled_session_count, 0
+
+        os.makedirs(self.profile_directory, exist_ok=True)
+        profile_path_prefix = os.path.join(
+            self.profile_directory, f"profile-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S', time.localtime(self.profiling_started_at))}"
+        )
+        written_paths = []
+        if stack_sampler is not None:
+            stack_sampler.stop()
+            stack_sampler.write_collapsed_stacks(profile_path_prefix + ".collapsed")
+            written_paths.append(profile_path_prefix + ".collapsed")
+            server_logger.info("Wrote %d stack samples to %s.collapsed", stack_sampler.sample_count, profile_path_prefix)
+        if aggregated_session_stats is not None:
+            aggregated_session_stats.dump_stats(profile_path_prefix + ".pstats")
+            written_paths.append(profile_path_prefix + ".pstats")
+            server_logger.info("Wrote the profile of %d sessions to %s.pstats", profiled_session_count, profile_path_prefix)
+        return written_paths
+
+    def stop_profiling_safely(self):
+        try:
+            self.stop_profiling()
+        except Exception as error_message:
+            # Profiling is a diagnostic, it must never take the server down with it
+            server_logger.warning("Could not write the profiles: %s", error_message)
+
+    def start_session_profile(self):
+        """
+        Called at the start of every threaded session. Returns a running cProfile.Profile
+        for the sessions picked, else None.
+        """
+        if not self.is_profiling_sessions or self.session_picker.random() >= self.profiled_session_fraction:
+            return None
+        session_profile = cProfile.Profile()
+        try:
+            session_profile.enable()
+        except ValueError:
+            # Interpreters where profiling is process-wide allow one profiled session at a time
+            return None
+        return session_profile
+
+    def finish_session_profile(self, session_profile):
+        session_profile.disable()
+        with self.profiler_lock:
+            # Profiling was stopped (and written) while this session ran
+            if not self.is_profiling_sessions:
+                return
+            if self.aggregated_session_stats is None:
+                self.aggregated_session_stats = pstats.Stats(session_profile)
+            else:
+                self.aggregated_session_stats.add(session_profile)
+            self.profiled_session_count += 1
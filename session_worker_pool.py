@@ -0,0 +1,185 @@
+"""
+session_worker_pool.py
+Admission control for player sessions. Instead of one new thread per accept(), a
+bounded set of worker threads plays the sessions and every other connection waits
+in a bounded queue. A connection that finds the queue full, or that waited longer
+than the queue deadline, is turned away right away with a "server busy" packet, so
+a surge of players can never eat all memory or slow down the games already running.
+The async engine gets the same rules from AsyncAdmissionGate.
+"""
+
+import asyncio
+import collections
+import threading
+import time
+
+import game_logging
+
+REJECTION_REASON_QUEUE_FULL = "queue_full"
+REJECTION_REASON_QUEUE_DEADLINE = "queue_deadline"
+# Turned away before queueing: the source IP has too many unfinished handshakes (deadline_timer_wheel.py)
+REJECTION_REASON_PENDING_HANDSHAKES = "pending_handshakes"
+REJECTION_REASONS = (REJECTION_REASON_QUEUE_FULL, REJECTION_REASON_QUEUE_DEADLINE, REJECTION_REASON_PENDING_HANDSHAKES)
+
+server_logger = game_logging.get_server_logger()
+
+
+class SessionWorkerPool:
+    def __init__(self, max_worker_count, queue_capacity, queue_wait_deadline_seconds, run_session, reject_connection, record_queue_wait=None):
+        """
+        run_session(client_socket, client_address) plays a whole session on a worker thread.
+        reject_connection(client_socket, client_address, reason) turns a connection away.
+        Workers are started lazily, whenever the idle ones cannot cover the connections
+        already handed to them, up to max_worker_count.
+        The queue is a FIFO, so the connections about to miss their deadline are always
+        at its head, where a small reaper thread finds them on time.
+        """
+        self.max_worker_count = max_worker_count
+        self.queue_capacity = queue_capacity
+        self.queue_wait_deadline_seconds = queue_wait_deadline_seconds
+        self.run_session = run_session
+        self.reject_connection = reject_connection
+        self.record_queue_wait = record_queue_wait
+        # (client_socket, client_address, enqueued_at), oldest first
+        self.pending_connections = collections.deque()
+        self.worker_threads = []
+        self.idle_worker_count = 0
+        self.pool_lock = threading.Lock()
+        self.connection_waiting = threading.Condition(self.pool_lock)
+        self.deadline_reaper_thread = None
+
+    def submit(self, client_socket, client_address):
+        """
+        Queues an accepted connection. Returns False (and rejects it) if the queue is full.
+        """
+        with self.pool_lock:
+            # Connections in the deque that an idle worker is about to pick up are not really waiting
+            if self.idle_worker_count <= len(self.pending_connections) and len(self.worker_threads) < self.max_worker_count:
+                self.start_worker()
+            is_queue_full = len(self.pending_connections) >= self.queue_capacity + self.idle_worker_count
+            if not is_queue_full:
+                self.pending_connections.append((client_socket, client_address, time.monotonic()))
+                self.connection_waiting.notify()
+
+        if is_queue_full:
+            # Rejecting outside the lock, the workers should not wait for our send()
+            self.reject_connection(client_socket, client_address, REJECTION_REASON_QUEUE_FULL)
+            return False
+        return True
+
+    def start_worker(self):
+        # Called with pool_lock held; the new worker counts as idle until it takes a job
+        new_worker_thread = threading.Thread(
+            target=self.serve_sessions_forever,
+            name=f"session-worker-{len(self.worker_threads)}",
+            daemon=True
+        )
+        self.worker_threads.append(new_worker_thread)
+        self.idle_worker_count += 1
+        new_worker_thread.start()
+
+    def serve_sessions_forever(self):
+        while True:
+            with self.pool_lock:
+                while not self.pending_connections:
+                    self.connection_waiting.wait()
+                client_socket, client_address, enqueued_at = self.pending_connections.popleft()
+                self.idle_worker_count -= 1
+                if self.deadline_reaper_thread is None and self.idle_worker_count == 0:
+                    # First time every worker is busy: from now on connections may really wait
+                    self.start_deadline_reaper()
+            try:
+                queue_wait_seconds = time.monotonic() - enqueued_at
+                if self.record_queue_wait is not None:
+                    self.record_queue_wait(queue_wait_seconds)
+
+                # The player gave up waiting long ago (or soon will), a quick "busy" beats a late game
+                if queue_wait_seconds > self.queue_wait_deadline_seconds:
+                    self.reject_connection(client_socket, client_address, REJECTION_REASON_QUEUE_DEADLINE)
+                else:
+                    self.run_session(client_socket, client_address)
+            except Exception:
+                # The worker must outlive any one session, or the pool shrinks while still counting it as idle
+                server_logger.exception("Unexpected error in a session from %s, closing it.", client_address)
+                try:
+                    client_socket.close()
+                except OSError:
+                    pass
+            finally:
+                with self.pool_lock:
+                    self.idle_worker_count += 1
+
+    def start_deadline_reaper(self):
+        # Called with pool_lock held
+        self.deadline_reaper_thread = threading.Thread(
+            target=self.reject_expired_connections_forever, name="admission-deadline-reaper", daemon=True
+        )
+        self.deadline_reaper_thread.start()
+
+    def reject_expired_connections_forever(self):
+        """
+        Turns away queued connections as soon as they are past the deadline, instead of
+        when a worker finally gets to them. Checks four times per deadline, so nobody
+        waits more than 25% longer than promised.
+        """
+        check_interval_seconds = max(self.queue_wait_deadline_seconds / 4, 0.01)
+        while True:
+            time.sleep(check_interval_seconds)
+            expired_before = time.monotonic() - self.queue_wait_deadline_seconds
+            expired_connections = []
+            with self.pool_lock:
+                while self.pending_connections and self.pending_connections[0][2] < expired_before:
+                    expired_connections.append(self.pending_connections.popleft())
+
+            for client_socket, client_address, enqueued_at in expired_connections:
+                if self.record_queue_wait is not None:
+                    self.record_queue_wait(time.monotonic() - enqueued_at)
+                self.reject_connection(client_socket, client_address, REJECTION_REASON_QUEUE_DEADLINE)
+
+    def queued_connection_count(self):
+        return len(self.pending_connections)
+
+    def busy_worker_count(self):
+        return len(self.worker_threads) - self.idle_worker_count
+
+
+class AsyncAdmissionGate:
+    def __init__(self, max_concurrent_sessions, queue_capacity, queue_wait_deadline_seconds):
+        """
+        The event loop equivalent of SessionWorkerPool: at most max_concurrent_sessions
+        coroutines play at once, up to queue_capacity more wait for a slot.
+        Only ever used from the loop's own thread, so no locking is needed.
+        """
+        self.session_slots = asyncio.Semaphore(max_concurrent_sessions)
+        self.queue_capacity = queue_capacity
+        self.queue_wait_deadline_seconds = queue_wait_deadline_seconds
+        self.waiting_session_count = 0
+
+    async def acquire_session_slot(self):
+        """
+        Returns (None, seconds waited) once the session may start, or (rejection reason,
+        seconds waited) if it has to be turned away. Call release_session_slot() after
+        an admitted session.
+        """
+        if not self.session_slots.locked():
+            await self.session_slots.acquire()
+            return None, 0.0
+
+        if self.waiting_session_count >= self.queue_capacity:
+            return REJECTION_REASON_QUEUE_FULL, 0.0
+
+        self.waiting_session_count += 1
+        wait_started_at = time.monotonic()
+        try:
+            await asyncio.wait_for(self.session_slots.acquire(), self.queue_wait_deadline_seconds)
+            return None, time.monotonic() - wait_started_at
+        except asyncio.TimeoutError:
+            return REJECTION_REASON_QUEUE_DEADLINE, time.monotonic() - wait_started_at
+        finally:
+            self.waiting_session_count -= 1
+
+    def release_session_slot(self):
+        self.session_slots.release()
+
+    def queued_connection_count(self):
+        return self.waiting_session_count
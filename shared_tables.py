@@ -0,0 +1,313 @@
+"""
+shared_tables.py
+Tables where several players sit at one dealer and play from one shoe, instead of every
+session getting a private dealer. Each round deals every seat and the dealer once,
+the seats take their turns in seat order, and the dealer plays a single hand against
+everyone still standing.
+
+Every seat still sees exactly the single-table protocol: its own two cards, the dealer's
+face-up card, its own hits, then the dealer's hole card and draws and its verdict. The
+other seats' cards are never sent, so any existing client can sit at a shared table.
+
+There is no thread per table. Whichever session changes the table (takes a seat, sends
+a decision, leaves) advances it under the table lock as far as it can go: to the next
+seat's turn, through the dealer's hand and into the next round. Cards are queued on
+each seat, and a seat's wake-up event is set when it is its turn, when its hand got a
+verdict or when its batch is over.
+The session then flushes what was queued and reads the decision itself, so the socket
+code stays in server.py. A threading.Event or an asyncio.Event works as the wake-up
+event, so threaded and async sessions use the same tables.
+
+House rules as in round_engine.py; a player who joins mid-round is dealt in from the
+next round, and a player who leaves mid-round forfeits that hand without a verdict.
+"""
+
+import threading
+import time
+
+import protocol_codec
+from card_shoe import RunningHand
+from round_engine import DEALER_STANDS_ON_POINTS, determine_round_result
+
+# What a woken seat has to do next
+SEAT_STATE_WAITING = "waiting"
+SEAT_STATE_DECIDING = "deciding"
+SEAT_STATE_FINISHED = "finished"
+
+
+class SharedTableSeat:
+    __slots__ = (
+        "connected_team_name", "session_journal", "seat_wakeup_event", "pending_payloads", "rounds_left", "rounds_finished",
+        "is_seated", "is_waiting_for_player_decision", "cards_held_by_player", "cards_held_by_dealer", "did_player_bust",
+        "final_round_result", "round_summary_text", "round_payload_count", "player_turn_started_at", "last_decision_received_at"
+    )
+
+    def __init__(self, connected_team_name, session_journal, rounds_left, seat_wakeup_event):
+        """
+        One player's seat for one batch of rounds. The hand attributes carry the same
+        names as BlackjackRoundEngine's, so a finished seat can be recorded like a
+        finished private table.
+        """
+        self.connected_team_name = connected_team_name
+        self.session_journal = session_journal
+        self.seat_wakeup_event = seat_wakeup_event
+        self.pending_payloads = []
+        self.rounds_left = rounds_left
+        self.rounds_finished = 0
+        self.is_seated = False
+        self.is_waiting_for_player_decision = False
+        self.cards_held_by_player = None
+        self.cards_held_by_dealer = None
+        self.did_player_bust = False
+        self.final_round_result = None
+        self.round_summary_text = None
+        self.round_payload_count = 0
+        self.player_turn_started_at = 0.0
+        # None until the player answered in the current round
+        self.last_decision_received_at = None
+
+    def queue_payload(self, server_payload):
+        self.pending_payloads.append(server_payload)
+        self.round_payload_count += 1
+
+
+class SharedDealerTable:
+    def __init__(self, table_id, table_size, acquire_shoe_for_round, round_finished_callback):
+        """
+        acquire_shoe_for_round(current_shoe) works like the private tables' one.
+        round_finished_callback(shared_table, finished_seats) runs under the table lock
+        once per round, after every verdict was queued; the timestamps (perf_counter)
+        let it time the phases.
+        """
+        self.table_id = table_id
+        self.table_size = table_size
+        self.acquire_shoe_for_round = acquire_shoe_for_round
+        self.round_finished_callback = round_finished_callback
+        self.table_lock = threading.Lock()
+        # Everyone at the table in seat order, including players waiting for the next round
+        self.seated_players = []
+        # The seats dealt into the current round, and whose turn it is among them
+        self.round_seats = []
+        self.turn_index = 0
+        self.is_round_in_progress = False
+        self.current_shoe = None
+        self.cards_held_by_dealer = None
+        self.dealer_hidden_card = None
+        self.rounds_played = 0
+        self.round_started_at = 0.0
+        self.player_turns_started_at = 0.0
+        self.dealer_turn_started_at = 0.0
+
+    def has_open_seat(self):
+        return len(self.seated_players) < self.table_size
+
+    def is_empty(self):
+        return not self.seated_players
+
+    def seat_player(self, table_seat):
+        """
+        Seats a player (the registry checked there is room). An idle table starts
+        dealing right away, otherwise the player is dealt in from the next round.
+        """
+        with self.table_lock:
+            table_seat.is_seated = True
+            self.seated_players.append(table_seat)
+            if not table_seat.rounds_left:
+                self.release_seat(table_seat)
+            elif not self.is_round_in_progress:
+                self.start_next_round()
+                self.advance_table()
+
+    def collect_seat_update(self, table_seat):
+        """
+        Called by the seat's own session once woken. Returns the payloads queued for it
+        and one of the SEAT_STATE_* values.
+        """
+        with self.table_lock:
+            seat_payloads = table_seat.pending_payloads
+            table_seat.pending_payloads = []
+            if not table_seat.is_seated:
+                return seat_payloads, SEAT_STATE_FINISHED
+            if table_seat.is_waiting_for_player_decision:
+                return seat_payloads, SEAT_STATE_DECIDING
+            return seat_payloads, SEAT_STATE_WAITING
+
+    def receive_decision(self, table_seat, player_decision_string):
+        # Only call in SEAT_STATE_DECIDING; anything but Hit counts as Stand
+        with self.table_lock:
+            table_seat.last_decision_received_at = time.perf_counter()
+            table_seat.is_waiting_for_player_decision = False
+            if player_decision_string == protocol_codec.PLAYER_DECISION_HIT:
+                self.deal_player_card(table_seat)
+                if table_seat.cards_held_by_player.is_bust():
+                    self.finish_busted_hand(table_seat)
+                else:
+                    table_seat.is_waiting_for_player_decision = True
+                    table_seat.seat_wakeup_event.set()
+                    return
+            self.turn_index += 1
+            self.advance_table()
+
+    def leave_table(self, table_seat):
+        """
+        Takes a player away mid-batch (hung up, timed out). Their hand in the current
+        round is dropped and the table carries on without them. Harmless after the
+        batch already ended.
+        """
+        with self.table_lock:
+            if not table_seat.is_seated:
+                return
+            table_seat.is_seated = False
+            self.seated_players.remove(table_seat)
+            if table_seat.is_waiting_for_player_decision:
+                table_seat.is_waiting_for_player_decision = False
+                self.turn_index += 1
+                self.advance_table()
+
+    def release_seat(self, table_seat):
+        table_seat.is_seated = False
+        self.seated_players.remove(table_seat)
+        table_seat.seat_wakeup_event.set()
+
+    def start_next_round(self):
+        """
+        Deals like a real table: one card to every seat, the dealer's face-up card, a
+        second card to every seat, the dealer's hole card. Each seat is sent its own two
+        cards and then the face-up card, the order the single-table protocol has.
+        """
+        self.round_started_at = time.perf_counter()
+        self.is_round_in_progress = True
+        self.current_shoe = self.acquire_shoe_for_round(self.current_shoe)
+        self.cards_held_by_dealer = RunningHand()
+        self.round_seats = list(self.seated_players)
+        self.turn_index = 0
+
+        for table_seat in self.round_seats:
+            table_seat.cards_held_by_player = RunningHand()
+            table_seat.cards_held_by_dealer = self.cards_held_by_dealer
+            table_seat.did_player_bust = False
+            table_seat.final_round_result = None
+            table_seat.round_summary_text = None
+            table_seat.round_payload_count = 0
+            table_seat.last_decision_received_at = None
+
+        for table_seat in self.round_seats:
+            self.deal_player_card(table_seat)
+        dealer_visible_card = self.draw_card()
+        for table_seat in self.round_seats:
+            self.deal_player_card(table_seat)
+        self.dealer_hidden_card = self.draw_card()
+        self.cards_held_by_dealer.add_card(dealer_visible_card)
+        self.cards_held_by_dealer.add_card(self.dealer_hidden_card)
+
+        dealer_visible_payload = protocol_codec.PREBUILT_CARD_PAYLOADS_BY_CARD_ID[dealer_visible_card]
+        for table_seat in self.round_seats:
+            table_seat.queue_payload(dealer_visible_payload)
+        self.player_turns_started_at = time.perf_counter()
+
+    def draw_card(self):
+        # A crowded table can empty even a fresh single deck; we play on from the next shoe
+        if not self.current_shoe.cards_remaining():
+            self.current_shoe = self.acquire_shoe_for_round(self.current_shoe)
+        return self.current_shoe.deal_card()
+
+    def deal_player_card(self, table_seat):
+        player_card = self.draw_card()
+        table_seat.cards_held_by_player.add_card(player_card)
+        table_seat.queue_payload(protocol_codec.PREBUILT_CARD_PAYLOADS_BY_CARD_ID[player_card])
+
+    def finish_busted_hand(self, table_seat):
+        # A bust gets its verdict right away, the dealer never plays against it
+        table_seat.did_player_bust = True
+        self.record_seat_result(table_seat)
+
+    def record_seat_result(self, table_seat):
+        table_seat.final_round_result, table_seat.round_summary_text = determine_round_result(
+            table_seat.cards_held_by_player.total_points, self.cards_held_by_dealer.total_points, table_seat.did_player_bust
+        )
+        table_seat.queue_payload(protocol_codec.PREBUILT_RESULT_PAYLOADS[table_seat.final_round_result])
+        # The verdict goes out right away, not with the seat's next turn
+        table_seat.seat_wakeup_event.set()
+
+    def advance_table(self):
+        """
+        Moves on from the current turn until some seat has to decide or nobody is left.
+        Called with the table lock held.
+        """
+        while True:
+            while self.turn_index < len(self.round_seats):
+                table_seat = self.round_seats[self.turn_index]
+                if table_seat.is_seated:
+                    table_seat.player_turn_started_at = time.perf_counter()
+                    if not table_seat.cards_held_by_player.is_bust():
+                        table_seat.is_waiting_for_player_decision = True
+                        table_seat.seat_wakeup_event.set()
+                        return
+                    self.finish_busted_hand(table_seat)
+                self.turn_index += 1
+
+            self.finish_round()
+            if not self.seated_players:
+                self.is_round_in_progress = False
+                return
+            self.start_next_round()
+
+    def finish_round(self):
+        self.dealer_turn_started_at = time.perf_counter()
+        finished_seats = [table_seat for table_seat in self.round_seats if table_seat.is_seated]
+        standing_seats = [table_seat for table_seat in finished_seats if not table_seat.did_player_bust]
+        if standing_seats:
+            dealt_payloads = [protocol_codec.PREBUILT_CARD_PAYLOADS_BY_CARD_ID[self.dealer_hidden_card]]
+            while self.cards_held_by_dealer.total_points < DEALER_STANDS_ON_POINTS:
+                dealer_new_card = self.draw_card()
+                self.cards_held_by_dealer.add_card(dealer_new_card)
+                dealt_payloads.append(protocol_codec.PREBUILT_CARD_PAYLOADS_BY_CARD_ID[dealer_new_card])
+            for table_seat in standing_seats:
+                for dealt_payload in dealt_payloads:
+                    table_seat.queue_payload(dealt_payload)
+                self.record_seat_result(table_seat)
+
+        self.round_seats = []
+        # Everybody left halfway through, nothing was decided
+        if not finished_seats:
+            return
+
+        self.rounds_played += 1
+        for table_seat in finished_seats:
+            table_seat.rounds_finished += 1
+            table_seat.rounds_left -= 1
+        self.round_finished_callback(self, finished_seats)
+
+        for table_seat in finished_seats:
+            if not table_seat.rounds_left:
+                self.release_seat(table_seat)
+
+
+class SharedTableRegistry:
+    def __init__(self, table_size, create_shared_table):
+        """
+        create_shared_table(table_id) builds a new SharedDealerTable of table_size seats.
+        """
+        self.table_size = table_size
+        self.create_shared_table = create_shared_table
+        self.registry_lock = threading.Lock()
+        self.open_tables = []
+        self.next_table_id = 0
+
+    def take_seat(self, table_seat):
+        """
+        Seats the player at the first table with a free seat, opening a new table when
+        all are full. Returns the table.
+        """
+        # Only take_seat adds players and it holds the registry lock, so a free seat stays free
+        with self.registry_lock:
+            self.open_tables = [shared_table for shared_table in self.open_tables if not shared_table.is_empty()]
+            for shared_table in self.open_tables:
+                if shared_table.has_open_seat():
+                    break
+            else:
+                shared_table = self.create_shared_table(self.next_table_id)
+                self.next_table_id += 1
+                self.open_tables.append(shared_table)
+            shared_table.seat_player(table_seat)
+        return shared_table
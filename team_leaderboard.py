@@ -0,0 +1,207 @@
+"""
+team_leaderboard.py
+Standings of every team across all of its sessions: wins, losses, ties, rounds played
+and how often it busts, kept in memory and updated as each round is decided.
+
+Teams are spread over a fixed number of shards by the hash of their name, each with its
+own lock, so sessions of different teams rarely wait for each other. Every shard also
+keeps its teams sorted by rank (most wins first, then fewest rounds needed for them),
+moved with bisect on every update. A top-K query only reads the first K entries of each
+shard and merges them, it never walks over all the teams.
+
+Snapshots are JSON files written to a temporary file next to the target and renamed
+over it, so a reader (or a restart) always finds either the old or the new standings,
+never half of them. A server restarted with the same file picks its standings up again.
+"""
+
+import atexit
+import bisect
+import heapq
+import itertools
+import json
+import os
+import tempfile
+import threading
+import time
+
+import consts
+import game_logging
+
+server_logger = game_logging.get_server_logger()
+
+
+class TeamStandings:
+    __slots__ = ("team_name", "wins", "losses", "ties", "busts", "rounds_played")
+
+    def __init__(self, team_name, wins=0, losses=0, ties=0, busts=0, rounds_played=0):
+        self.team_name = team_name
+        self.wins = wins
+        self.losses = losses
+        self.ties = ties
+        self.busts = busts
+        self.rounds_played = rounds_played
+
+    def ranking_key(self):
+        # Sorts ascending into standings order; the name keeps equal records in a stable order
+        return (-self.wins, self.rounds_played, self.team_name)
+
+    def as_dict(self):
+        rounds_played = self.rounds_played or 1
+        return {
+            "team": self.team_name,
+            "wins": self.wins,
+            "losses": self.losses,
+            "ties": self.ties,
+            "rounds": self.rounds_played,
+            "busts": self.busts,
+            "win_rate": self.wins / rounds_played,
+            "bust_rate": self.busts / rounds_played,
+        }
+
+
+class LeaderboardShard:
+    __slots__ = ("shard_lock", "standings_by_team", "ranking_keys")
+
+    def __init__(self):
+        self.shard_lock = threading.Lock()
+        self.standings_by_team = {}
+        # Every team's ranking_key(), kept sorted
+        self.ranking_keys = []
+
+    def update_team(self, team_name, final_round_result, did_player_bust):
+        # Called with shard_lock held
+        team_standings = self.standings_by_team.get(team_name)
+        if team_standings is None:
+            team_standings = TeamStandings(team_name)
+            self.standings_by_team[team_name] = team_standings
+        else:
+            del self.ranking_keys[bisect.bisect_left(self.ranking_keys, team_standings.ranking_key())]
+
+        team_standings.rounds_played += 1
+        if final_round_result == consts.GAME_RESULT_INDICATOR_PLAYER_WIN:
+            team_standings.wins += 1
+        elif final_round_result == consts.GAME_RESULT_INDICATOR_PLAYER_LOSS:
+            team_standings.losses += 1
+        else:
+            team_standings.ties += 1
+        if did_player_bust:
+            team_standings.busts += 1
+        bisect.insort(self.ranking_keys, team_standings.ranking_key())
+
+
+class TeamLeaderboard:
+    def __init__(self, shard_count=consts.LEADERBOARD_SHARD_COUNT):
+        self.leaderboard_shards = [LeaderboardShard() for _ in range(shard_count)]
+        self.snapshot_lock = threading.Lock()
+
+    def shard_for_team(self, team_name):
+        return self.leaderboard_shards[hash(team_name) % len(self.leaderboard_shards)]
+
+    def record_round(self, team_name, final_round_result, did_player_bust):
+        team_shard = self.shard_for_team(team_name)
+        with team_shard.shard_lock:
+            team_shard.update_team(team_name, final_round_result, did_player_bust)
+
+    def team_standings(self, team_name):
+        """
+        Returns the team's standings as a dict, or None for a team we have not seen.
+        """
+        team_shard = self.shard_for_team(team_name)
+        with team_shard.shard_lock:
+            team_standings = team_shard.standings_by_team.get(team_name)
+            return None if team_standings is None else team_standings.as_dict()
+
+    def top_teams(self, team_count=consts.DEFAULT_LEADERBOARD_TOP_TEAM_COUNT):
+        """
+        The best team_count teams, best first. Each shard is read consistently, the
+        shards one after the other.
+        """
+        leading_entries_by_shard = []
+        for leaderboard_shard in self.leaderboard_shards:
+            with leaderboard_shard.shard_lock:
+                leading_entries_by_shard.append([
+                    (ranking_key, leaderboard_shard.standings_by_team[ranking_key[2]].as_dict())
+                    for ranking_key in leaderboard_shard.ranking_keys[:team_count]
+                ])
+        merged_entries = heapq.merge(*leading_entries_by_shard, key=lambda leaderboard_entry: leaderboard_entry[0])
+        return [team_dict for _, team_dict in itertools.islice(merged_entries, team_count)]
+
+    def team_count(self):
+        return sum(len(leaderboard_shard.standings_by_team) for leaderboard_shard in self.leaderboard_shards)
+
+    def take_snapshot(self):
+        all_teams = []
+        for leaderboard_shard in self.leaderboard_shards:
+            with leaderboard_shard.shard_lock:
+                all_teams.extend(team_standings.as_dict() for team_standings in leaderboard_shard.standings_by_team.values())
+        all_teams.sort(key=lambda team_dict: (-team_dict["wins"], team_dict["rounds"], team_dict["team"]))
+        return {"taken_at": time.time(), "teams": all_teams}
+
+    def write_snapshot(self, snapshot_path):
+        """
+        Atomically replaces snapshot_path with the current standings.
+        """
+        snapshot_text = json.dumps(self.take_snapshot(), indent=1)
+        snapshot_directory = os.path.dirname(os.path.abspath(snapshot_path))
+        # One writer at a time, the periodic thread and the exit hook may meet here
+        with self.snapshot_lock:
+            temporary_file_descriptor, temporary_path = tempfile.mkstemp(
+                prefix=os.path.basename(snapshot_path) + ".", suffix=".tmp", dir=snapshot_directory
+            )
+            try:
+                with os.fdopen(temporary_file_descriptor, "w", encoding="utf-8") as temporary_file:
+                    temporary_file.write(snapshot_text)
+                    temporary_file.flush()
+                    os.fsync(temporary_file.fileno())
+                os.replace(temporary_path, snapshot_path)
+            except BaseException:
+                os.unlink(temporary_path)
+                raise
+
+    def load_snapshot(self, snapshot_path):
+        """
+        Adds the standings stored in snapshot_path. Returns the number of teams read,
+        0 if there is no snapshot yet.
+        """
+        try:
+            with open(snapshot_path, encoding="utf-8") as snapshot_file:
+                stored_snapshot = json.load(snapshot_file)
+        except FileNotFoundError:
+            return 0
+
+        for team_dict in stored_snapshot["teams"]:
+            stored_standings = TeamStandings(
+                team_dict["team"], team_dict["wins"], team_dict["losses"], team_dict["ties"], team_dict["busts"], team_dict["rounds"]
+            )
+            team_shard = self.shard_for_team(stored_standings.team_name)
+            with team_shard.shard_lock:
+                if stored_standings.team_name in team_shard.standings_by_team:
+                    continue
+                team_shard.standings_by_team[stored_standings.team_name] = stored_standings
+                bisect.insort(team_shard.ranking_keys, stored_standings.ranking_key())
+        return len(stored_snapshot["teams"])
+
+    def start_periodic_snapshots(self, snapshot_path, interval_seconds=consts.DEFAULT_LEADERBOARD_SNAPSHOT_INTERVAL_IN_SECONDS):
+        """
+        Loads snapshot_path if it exists, then rewrites it every interval_seconds and
+        once more when the process exits.
+        """
+        loaded_team_count = self.load_snapshot(snapshot_path)
+        if loaded_team_count:
+            server_logger.info("Loaded standings of %d teams from %s", loaded_team_count, snapshot_path)
+        threading.Thread(
+            target=self.write_snapshots_forever, args=(snapshot_path, interval_seconds), name="leaderboard-snapshots", daemon=True
+        ).start()
+        atexit.register(self.write_snapshot_safely, snapshot_path)
+
+    def write_snapshots_forever(self, snapshot_path, interval_seconds):
+        while True:
+            time.sleep(interval_seconds)
+            self.write_snapshot_safely(snapshot_path)
+
+    def write_snapshot_safely(self, snapshot_path):
+        try:
+            self.write_snapshot(snapshot_path)
+        except Exception as error_message:
+            # A full disk should cost us a snapshot, not the game
+            server_logger.warning("Could not write the leaderboard snapshot %s: %s", snapshot_path, error_message)
@@ -0,0 +1,114 @@
+import pytest
+
+import deadline_timer_wheel
+from deadline_timer_wheel import HashedTimerWheel, SessionDeadlineManager
+
+
+class SteppedClock:
+    def __init__(self):
+        """
+        Stands in for the time module inside deadline_timer_wheel, so the tests decide
+        when time passes.
+        """
+        self.now_seconds = 1000.0
+
+    def monotonic(self):
+        return self.now_seconds
+
+    def skip(self, elapsed_seconds):
+        self.now_seconds += elapsed_seconds
+
+
+@pytest.fixture
+def stepped_clock(monkeypatch):
+    stepped_clock = SteppedClock()
+    monkeypatch.setattr(deadline_timer_wheel, "time", stepped_clock)
+    return stepped_clock
+
+
+def test_timer_fires_after_its_tick_and_never_before(stepped_clock):
+    timer_wheel = HashedTimerWheel(tick_seconds=0.25, slot_count=8)
+    fired_timers = []
+    timer_wheel.schedule(0.875, lambda: fired_timers.append("due"))
+
+    stepped_clock.skip(0.75)
+    timer_wheel.advance()
+    assert fired_timers == []
+
+    stepped_clock.skip(0.25)
+    timer_wheel.advance()
+    assert fired_timers == ["due"]
+    assert timer_wheel.pending_timer_count() == 0
+
+
+def test_timers_due_inside_a_skipped_tick_range_all_fire(stepped_clock):
+    timer_wheel = HashedTimerWheel(tick_seconds=0.25, slot_count=8)
+    fired_delays = []
+    for delay_seconds in (0.25, 1.125, 1.875, 3.75, 5.125):
+        timer_wheel.schedule(delay_seconds, lambda delay_seconds=delay_seconds: fired_delays.append(delay_seconds))
+    # Due long after the stall, and lands in a slot the catch-up walks over
+    timer_wheel.schedule(12.5, lambda: fired_delays.append(12.5))
+
+    # The driver stalled for several turns of the wheel (one turn is 2 seconds)
+    stepped_clock.skip(7.5)
+    timer_wheel.advance()
+
+    assert sorted(fired_delays) == [0.25, 1.125, 1.875, 3.75, 5.125]
+    assert timer_wheel.pending_timer_count() == 1
+
+    stepped_clock.skip(5.0)
+    timer_wheel.advance()
+    assert sorted(fired_delays) == [0.25, 1.125, 1.875, 3.75, 5.125, 12.5]
+
+
+def test_cancelled_timer_stays_quiet(stepped_clock):
+    timer_wheel = HashedTimerWheel(tick_seconds=0.25, slot_count=8)
+    fired_timers = []
+    wheel_timer = timer_wheel.schedule(0.5, lambda: fired_timers.append("cancelled"))
+    timer_wheel.cancel(wheel_timer)
+
+    stepped_clock.skip(1.0)
+    timer_wheel.advance()
+
+    assert fired_timers == []
+
+
+def test_decision_budget_aborts_only_after_a_missed_answer(stepped_clock):
+    timer_wheel = HashedTimerWheel(tick_seconds=0.25, slot_count=8)
+    expired_budgets = []
+    aborted_connections = []
+    deadline_manager = SessionDeadlineManager(timer_wheel, 1.0, 2.0, 60.0, record_expiration=expired_budgets.append)
+    session_deadlines = deadline_manager.start_session(lambda: aborted_connections.append("aborted"))
+
+    session_deadlines.finish_handshake()
+    session_deadlines.wait_for_player()
+    stepped_clock.skip(1.5)
+    timer_wheel.advance()
+    session_deadlines.player_answered()
+    # Re-armed for the next question: the old wheel entry must follow the new deadline
+    session_deadlines.wait_for_player()
+    stepped_clock.skip(1.5)
+    timer_wheel.advance()
+    assert aborted_connections == []
+
+    stepped_clock.skip(1.0)
+    timer_wheel.advance()
+    assert aborted_connections == ["aborted"]
+    assert expired_budgets == [deadline_timer_wheel.DEADLINE_BUDGET_PLAYER_DECISION]
+    assert session_deadlines.expired_budget_name == deadline_timer_wheel.DEADLINE_BUDGET_PLAYER_DECISION
+
+    session_deadlines.finish()
+    assert timer_wheel.pending_timer_count() == 0
+
+
+def test_pending_handshakes_are_limited_per_address(stepped_clock):
+    deadline_manager = SessionDeadlineManager(HashedTimerWheel(), 1.0, 2.0, 60.0, max_pending_handshakes_per_ip=2)
+
+    assert deadline_manager.try_reserve_pending_handshake("192.0.2.7")
+    assert deadline_manager.try_reserve_pending_handshake("192.0.2.7")
+    assert not deadline_manager.try_reserve_pending_handshake("192.0.2.7")
+    assert deadline_manager.try_reserve_pending_handshake("192.0.2.8")
+
+    session_deadlines = deadline_manager.start_session(lambda: None, "192.0.2.7")
+    session_deadlines.finish_handshake()
+    assert deadline_manager.try_reserve_pending_handshake("192.0.2.7")
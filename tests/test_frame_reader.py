@@ -0,0 +1,99 @@
+import pytest
+
+import consts
+import protocol_codec
+from frame_reader import BufferedFrameReader
+
+
+class ScriptedSocket:
+    def __init__(self, received_chunks):
+        """
+        Hands out received_chunks one recv_into at a time, then reports a clean close.
+        """
+        self.received_chunks = list(received_chunks)
+        self.receive_call_count = 0
+
+    def recv_into(self, target_buffer):
+        self.receive_call_count += 1
+        if not self.received_chunks:
+            return 0
+        next_chunk = self.received_chunks.pop(0)
+        # A chunk bigger than the free space arrives in two parts, like a real socket
+        if len(next_chunk) > len(target_buffer):
+            self.received_chunks.insert(0, next_chunk[len(target_buffer):])
+            next_chunk = next_chunk[:len(target_buffer)]
+        target_buffer[:len(next_chunk)] = next_chunk
+        return len(next_chunk)
+
+
+def split_into_chunks(packet_bytes, chunk_size):
+    return [packet_bytes[chunk_start:chunk_start + chunk_size] for chunk_start in range(0, len(packet_bytes), chunk_size)]
+
+
+def test_request_split_over_several_reads_comes_out_whole():
+    request_packet = protocol_codec.encode_request_packet(3, "Split Team")
+    frame_reader = BufferedFrameReader(ScriptedSocket(split_into_chunks(request_packet, 4)))
+
+    decoded_request = frame_reader.read_request_packet()
+
+    assert decoded_request == protocol_codec.decode_request_packet(request_packet)
+    assert frame_reader.read_request_packet() is None
+
+
+def test_pipelined_decisions_need_a_single_recv():
+    pipelined_decisions = (
+        protocol_codec.encode_client_decision(protocol_codec.PLAYER_DECISION_HIT)
+        + protocol_codec.encode_client_decision(protocol_codec.PLAYER_DECISION_HIT)
+        + protocol_codec.encode_client_decision(protocol_codec.PLAYER_DECISION_STAND)
+    )
+    scripted_socket = ScriptedSocket([pipelined_decisions])
+    frame_reader = BufferedFrameReader(scripted_socket)
+
+    decision_strings = [frame_reader.read_client_decision()[2] for _ in range(3)]
+
+    assert decision_strings == [protocol_codec.PLAYER_DECISION_HIT, protocol_codec.PLAYER_DECISION_HIT, protocol_codec.PLAYER_DECISION_STAND]
+    assert scripted_socket.receive_call_count == 1
+
+
+def test_peer_closing_between_frames_reads_as_none():
+    frame_reader = BufferedFrameReader(ScriptedSocket([]))
+
+    assert frame_reader.read_client_decision() is None
+
+
+def test_peer_closing_inside_a_frame_is_an_error():
+    decision_packet = protocol_codec.encode_client_decision(protocol_codec.PLAYER_DECISION_STAND)
+    frame_reader = BufferedFrameReader(ScriptedSocket([decision_packet[:-2]]))
+
+    with pytest.raises(ConnectionError):
+        frame_reader.read_client_decision()
+
+
+def test_leftovers_slide_to_the_front_of_a_small_buffer():
+    server_payloads = [
+        protocol_codec.PREBUILT_CARD_PAYLOADS_BY_CARD_ID[card_id] for card_id in range(10)
+    ] + [protocol_codec.PREBUILT_RESULT_PAYLOADS[consts.GAME_RESULT_INDICATOR_TIE]]
+    # Chunks that never line up with the frames, into a buffer that fits barely two of them
+    frame_reader = BufferedFrameReader(
+        ScriptedSocket(split_into_chunks(b"".join(server_payloads), 7)), buffer_capacity_in_bytes=protocol_codec.SERVER_PAYLOAD_SIZE * 2 + 1
+    )
+
+    decoded_payloads = [frame_reader.read_server_payload() for _ in server_payloads]
+
+    assert decoded_payloads == [protocol_codec.SERVER_PAYLOAD_STRUCT.unpack(server_payload) for server_payload in server_payloads]
+    assert frame_reader.read_server_payload() is None
+
+
+def test_peek_waits_for_a_split_header_without_consuming_it():
+    busy_payload = protocol_codec.PREBUILT_SERVER_BUSY_PAYLOAD
+    frame_reader = BufferedFrameReader(ScriptedSocket(split_into_chunks(busy_payload, 2)))
+
+    assert frame_reader.peek_packet_type() == consts.MESSAGE_TYPE_SERVER_BUSY
+    assert frame_reader.read_server_payload() == protocol_codec.SERVER_PAYLOAD_STRUCT.unpack(busy_payload)
+
+
+def test_frame_bigger_than_the_buffer_is_refused():
+    frame_reader = BufferedFrameReader(ScriptedSocket([]), buffer_capacity_in_bytes=4)
+
+    with pytest.raises(ValueError):
+        frame_reader.read_client_decision()
@@ -0,0 +1,130 @@
+import consts
+import protocol_codec
+from card_shoe import SeededShoeSource
+from round_engine import BlackjackRoundEngine, BlackjackTableSession
+
+
+def create_table_session(shoe_source, queue_outgoing_payload, table_id=None, finished_rounds=None):
+    """
+    A table session wired like Server.create_table_sessions: single-table payloads, or
+    the payloads tagged with table_id for a multiplexed table.
+    """
+    def acquire_shoe_for_round(current_shoe):
+        if current_shoe is None or current_shoe.needs_replacement():
+            return shoe_source.acquire_shoe()
+        return current_shoe
+
+    if table_id is None:
+        card_payloads = protocol_codec.PREBUILT_CARD_PAYLOADS_BY_CARD_ID
+        result_payloads = protocol_codec.PREBUILT_RESULT_PAYLOADS
+    else:
+        card_payloads = protocol_codec.PREBUILT_MULTIPLEXED_CARD_PAYLOADS[table_id]
+        result_payloads = protocol_codec.PREBUILT_MULTIPLEXED_RESULT_PAYLOADS[table_id]
+    round_finished_callback = None if finished_rounds is None else finished_rounds.append
+    return BlackjackTableSession(
+        BlackjackRoundEngine(acquire_shoe_for_round), card_payloads, result_payloads, queue_outgoing_payload, round_finished_callback
+    )
+
+
+def play_batch_standing(table_session, round_count):
+    # The player stands on every question
+    is_waiting_for_player = table_session.start_batch(round_count)
+    while is_waiting_for_player:
+        is_waiting_for_player = table_session.receive_decision(protocol_codec.PLAYER_DECISION_STAND)
+
+
+def result_codes_in(server_payloads):
+    unpack_server_payload = protocol_codec.SERVER_PAYLOAD_STRUCT.unpack
+    return [
+        payload_result for _, _, payload_result, _, _ in map(unpack_server_payload, server_payloads)
+        if payload_result != consts.GAME_RESULT_INDICATOR_ROUND_STILL_ACTIVE
+    ]
+
+
+def test_batch_queues_one_verdict_per_round():
+    server_payloads = []
+    finished_rounds = []
+    table_session = create_table_session(SeededShoeSource(1, None, 7), server_payloads.append, finished_rounds=finished_rounds)
+
+    play_batch_standing(table_session, 5)
+
+    assert len(result_codes_in(server_payloads)) == 5
+    assert table_session.rounds_finished == 5
+    assert len(finished_rounds) == 5
+    assert all(server_payload[4] == consts.MESSAGE_TYPE_GAME_PAYLOAD for server_payload in server_payloads)
+
+
+def test_empty_batch_deals_nothing():
+    server_payloads = []
+    table_session = create_table_session(SeededShoeSource(1, None, 7), server_payloads.append)
+
+    assert table_session.start_batch(0) is False
+    assert server_payloads == []
+
+
+def test_hit_deals_one_more_player_card():
+    server_payloads = []
+    table_session = create_table_session(SeededShoeSource(1, None, 3), server_payloads.append)
+
+    assert table_session.start_batch(1)
+    # Two player cards and the dealer's face-up card
+    assert len(server_payloads) == 3
+    server_payloads.clear()
+
+    is_waiting_for_player = table_session.receive_decision(protocol_codec.PLAYER_DECISION_HIT)
+    if is_waiting_for_player:
+        assert len(server_payloads) == 1
+    else:
+        # Bust: the new card and the verdict
+        assert result_codes_in(server_payloads) == [consts.GAME_RESULT_INDICATOR_PLAYER_LOSS]
+
+
+def test_continuation_batch_keeps_playing_from_the_same_shoe():
+    server_payloads = []
+    table_session = create_table_session(SeededShoeSource(6, None, 11), server_payloads.append)
+
+    play_batch_standing(table_session, 3)
+    first_batch_shoe = table_session.table_engine.current_shoe
+    cards_left_after_first_batch = first_batch_shoe.cards_remaining()
+    server_payloads.clear()
+
+    play_batch_standing(table_session, 4)
+
+    assert len(result_codes_in(server_payloads)) == 4
+    assert table_session.rounds_finished == 7
+    # A six deck shoe lasts far longer than seven rounds, the next batch just carries on
+    assert table_session.table_engine.current_shoe is first_batch_shoe
+    assert first_batch_shoe.cards_remaining() < cards_left_after_first_batch
+
+
+def test_seeded_tables_deal_the_same_rounds():
+    first_run_payloads = []
+    second_run_payloads = []
+    play_batch_standing(create_table_session(SeededShoeSource(1, None, 42), first_run_payloads.append), 20)
+    play_batch_standing(create_table_session(SeededShoeSource(1, None, 42), second_run_payloads.append), 20)
+
+    assert first_run_payloads == second_run_payloads
+
+
+def test_multiplexed_tables_tag_every_payload_with_their_table():
+    server_payloads = []
+    table_sessions = [
+        create_table_session(SeededShoeSource(1, None, table_id), server_payloads.append, table_id=table_id)
+        for table_id in range(3)
+    ]
+
+    # Interleaved on one connection, like the multiplexed session loop
+    waiting_tables = [table_session for table_session in table_sessions if table_session.start_batch(4)]
+    while waiting_tables:
+        waiting_tables = [
+            table_session for table_session in waiting_tables
+            if table_session.receive_decision(protocol_codec.PLAYER_DECISION_STAND)
+        ]
+
+    verdict_count_by_table = [0, 0, 0]
+    for server_payload in server_payloads:
+        _, payload_type, table_id, payload_result, _, _ = protocol_codec.MULTIPLEXED_SERVER_PAYLOAD_STRUCT.unpack(server_payload)
+        assert payload_type == consts.MESSAGE_TYPE_MULTIPLEXED_GAME_PAYLOAD
+        if payload_result != consts.GAME_RESULT_INDICATOR_ROUND_STILL_ACTIVE:
+            verdict_count_by_table[table_id] += 1
+    assert verdict_count_by_table == [4, 4, 4]
@@ -0,0 +1,77 @@
+import consts
+import round_journal
+from round_journal import RoundJournalReader, RoundJournalWriter
+
+
+def record_kinds_and_values(journal_reader, round_id):
+    return [(record_kind, record_value) for _, _, _, _, record_kind, record_value, _ in journal_reader.read_round(round_id)]
+
+
+def test_rounds_written_by_the_writer_read_back(tmp_path):
+    journal_writer = RoundJournalWriter(str(tmp_path))
+    journal_writer.start()
+    first_session = journal_writer.open_session("Journal Team")
+    second_session = journal_writer.open_session("Other Team")
+    # Stood on two cards, dealer drew once and busted
+    first_session.record_round([1, 2], [3, 4, 5], consts.GAME_RESULT_INDICATOR_PLAYER_WIN, False)
+    # Hit once and busted, the dealer never played
+    first_session.record_round([10, 11, 12], [13, 14], consts.GAME_RESULT_INDICATOR_PLAYER_LOSS, True)
+    second_session.record_round([20, 21], [22, 23], consts.GAME_RESULT_INDICATOR_TIE, False, table_id=2)
+    journal_writer.stop()
+
+    journal_reader = RoundJournalReader(str(tmp_path))
+    try:
+        assert journal_reader.round_count() == 3
+        journal_team_round_ids = list(journal_reader.find_round_ids(team_name="Journal Team"))
+        other_team_round_ids = list(journal_reader.find_round_ids(team_name="Other Team"))
+        assert len(journal_team_round_ids) == 2
+        assert len(other_team_round_ids) == 1
+
+        stood_round_id, bust_round_id = journal_team_round_ids
+        assert record_kinds_and_values(journal_reader, stood_round_id) == [
+            (round_journal.RECORD_KIND_PLAYER_CARD, 1),
+            (round_journal.RECORD_KIND_PLAYER_CARD, 2),
+            (round_journal.RECORD_KIND_DEALER_UP_CARD, 3),
+            (round_journal.RECORD_KIND_DEALER_HOLE_CARD, 4),
+            (round_journal.RECORD_KIND_PLAYER_DECISION, round_journal.DECISION_CODE_STAND),
+            (round_journal.RECORD_KIND_DEALER_DRAW, 5),
+            (round_journal.RECORD_KIND_ROUND_RESULT, consts.GAME_RESULT_INDICATOR_PLAYER_WIN),
+        ]
+        assert record_kinds_and_values(journal_reader, bust_round_id) == [
+            (round_journal.RECORD_KIND_PLAYER_CARD, 10),
+            (round_journal.RECORD_KIND_PLAYER_CARD, 11),
+            (round_journal.RECORD_KIND_DEALER_UP_CARD, 13),
+            (round_journal.RECORD_KIND_DEALER_HOLE_CARD, 14),
+            (round_journal.RECORD_KIND_PLAYER_DECISION, round_journal.DECISION_CODE_HIT),
+            (round_journal.RECORD_KIND_PLAYER_CARD, 12),
+            (round_journal.RECORD_KIND_ROUND_RESULT, consts.GAME_RESULT_INDICATOR_PLAYER_LOSS),
+        ]
+        assert journal_reader.round_result(bust_round_id) == consts.GAME_RESULT_INDICATOR_PLAYER_LOSS
+
+        # Every record of a round carries its session, sequence number and table
+        tie_round_records = journal_reader.read_round(other_team_round_ids[0])
+        assert {(session_id, round_sequence, table_id) for _, session_id, round_sequence, table_id, _, _, _ in tie_round_records} == {
+            (second_session.session_id, 1, 2)
+        }
+    finally:
+        journal_reader.close()
+
+
+def test_round_cut_short_by_a_crash_is_left_out(tmp_path):
+    journal_writer = RoundJournalWriter(str(tmp_path))
+    journal_writer.start()
+    journal_writer.open_session("Crash Team").record_round([1, 2], [3, 4], consts.GAME_RESULT_INDICATOR_TIE, False)
+    journal_writer.stop()
+
+    rounds_file_path = next(tmp_path.glob("*.rounds"))
+    with open(rounds_file_path, "ab") as rounds_file:
+        # A whole player card record of the next round, then half of another one
+        rounds_file.write(round_journal.ROUND_RECORD_STRUCT.pack(0, 1, 2, 0, round_journal.RECORD_KIND_PLAYER_CARD, 7, 0))
+        rounds_file.write(b"\0" * (round_journal.ROUND_RECORD_SIZE // 2))
+
+    journal_reader = RoundJournalReader(str(tmp_path))
+    try:
+        assert journal_reader.round_count() == 1
+        assert journal_reader.round_result(0) == consts.GAME_RESULT_INDICATOR_TIE
+    finally:
+        journal_reader.close()
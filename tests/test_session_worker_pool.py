@@ -0,0 +1,84 @@
+import asyncio
+import threading
+
+from session_worker_pool import AsyncAdmissionGate, SessionWorkerPool, REJECTION_REASON_QUEUE_DEADLINE, REJECTION_REASON_QUEUE_FULL
+
+# Generous, so a slow machine never fails a test that is really waiting on an event
+EVENT_WAIT_TIMEOUT_IN_SECONDS = 5
+
+
+class RecordedConnections:
+    def __init__(self):
+        """
+        Stands in for the server's session and rejection handlers. Sessions block until
+        release_sessions is set, so the pool stays busy for as long as a test needs.
+        """
+        self.release_sessions = threading.Event()
+        self.session_started = threading.Event()
+        self.connection_handled = threading.Condition()
+        self.played_connections = []
+        self.rejected_connections = []
+
+    def run_session(self, client_socket, client_address):
+        self.session_started.set()
+        self.release_sessions.wait(EVENT_WAIT_TIMEOUT_IN_SECONDS)
+        with self.connection_handled:
+            self.played_connections.append(client_socket)
+            self.connection_handled.notify_all()
+
+    def reject_connection(self, client_socket, client_address, rejection_reason):
+        with self.connection_handled:
+            self.rejected_connections.append((client_socket, rejection_reason))
+            self.connection_handled.notify_all()
+
+    def wait_for_handled_count(self, handled_count):
+        with self.connection_handled:
+            return self.connection_handled.wait_for(
+                lambda: len(self.played_connections) + len(self.rejected_connections) >= handled_count,
+                EVENT_WAIT_TIMEOUT_IN_SECONDS
+            )
+
+
+def test_full_queue_turns_the_next_connection_away():
+    recorded_connections = RecordedConnections()
+    worker_pool = SessionWorkerPool(1, 1, 60, recorded_connections.run_session, recorded_connections.reject_connection)
+
+    assert worker_pool.submit("playing", ("192.0.2.1", 1))
+    assert worker_pool.submit("queued", ("192.0.2.2", 2))
+    assert not worker_pool.submit("turned away", ("192.0.2.3", 3))
+    assert recorded_connections.rejected_connections == [("turned away", REJECTION_REASON_QUEUE_FULL)]
+
+    recorded_connections.release_sessions.set()
+    assert recorded_connections.wait_for_handled_count(3)
+    assert recorded_connections.played_connections == ["playing", "queued"]
+
+
+def test_connection_queued_past_its_deadline_gets_the_busy_notice():
+    recorded_connections = RecordedConnections()
+    worker_pool = SessionWorkerPool(1, 4, 0.05, recorded_connections.run_session, recorded_connections.reject_connection)
+
+    worker_pool.submit("playing", ("192.0.2.1", 1))
+    assert recorded_connections.session_started.wait(EVENT_WAIT_TIMEOUT_IN_SECONDS)
+    worker_pool.submit("waits too long", ("192.0.2.2", 2))
+
+    # The only worker is still busy, so the deadline reaper has to answer
+    assert recorded_connections.wait_for_handled_count(1)
+    assert recorded_connections.rejected_connections == [("waits too long", REJECTION_REASON_QUEUE_DEADLINE)]
+    assert worker_pool.queued_connection_count() == 0
+    recorded_connections.release_sessions.set()
+
+
+def test_async_gate_queues_then_rejects():
+    async def acquire_slots():
+        admission_gate = AsyncAdmissionGate(1, 1, 0.05)
+        first_admission = await admission_gate.acquire_session_slot()
+        # One waiter fits in the queue, the next one finds it full
+        queued_waiter = asyncio.ensure_future(admission_gate.acquire_session_slot())
+        await asyncio.sleep(0)
+        full_queue_admission = await admission_gate.acquire_session_slot()
+        deadline_admission = await queued_waiter
+        admission_gate.release_session_slot()
+        admission_after_release = await admission_gate.acquire_session_slot()
+        return first_admission[0], full_queue_admission[0], deadline_admission[0], admission_after_release[0]
+
+    assert asyncio.run(acquire_slots()) == (None, REJECTION_REASON_QUEUE_FULL, REJECTION_REASON_QUEUE_DEADLINE, None)
@@ -0,0 +1,72 @@
+import json
+
+import consts
+from team_leaderboard import TeamLeaderboard
+
+
+def record_results(team_leaderboard, team_name, result_codes, bust_count=0):
+    for round_number, result_code in enumerate(result_codes):
+        team_leaderboard.record_round(team_name, result_code, round_number < bust_count)
+
+
+def test_teams_rank_by_wins_then_fewest_rounds_then_name():
+    team_leaderboard = TeamLeaderboard(shard_count=4)
+    win = consts.GAME_RESULT_INDICATOR_PLAYER_WIN
+    loss = consts.GAME_RESULT_INDICATOR_PLAYER_LOSS
+    tie = consts.GAME_RESULT_INDICATOR_TIE
+    record_results(team_leaderboard, "Slow", [win, win, loss, loss])
+    record_results(team_leaderboard, "Fast", [win, win])
+    record_results(team_leaderboard, "Beta", [win, loss, tie])
+    record_results(team_leaderboard, "Alpha", [win, tie, loss])
+    record_results(team_leaderboard, "Winless", [loss], bust_count=1)
+
+    ranked_team_names = [team_dict["team"] for team_dict in team_leaderboard.top_teams(10)]
+
+    assert ranked_team_names == ["Fast", "Slow", "Alpha", "Beta", "Winless"]
+    assert [team_dict["team"] for team_dict in team_leaderboard.top_teams(2)] == ["Fast", "Slow"]
+    assert team_leaderboard.team_count() == 5
+
+
+def test_standings_follow_every_round():
+    team_leaderboard = TeamLeaderboard()
+    record_results(
+        team_leaderboard, "Counted",
+        [consts.GAME_RESULT_INDICATOR_PLAYER_WIN, consts.GAME_RESULT_INDICATOR_PLAYER_LOSS, consts.GAME_RESULT_INDICATOR_PLAYER_LOSS,
+         consts.GAME_RESULT_INDICATOR_TIE],
+        bust_count=1
+    )
+
+    team_standings = team_leaderboard.team_standings("Counted")
+
+    assert (team_standings["wins"], team_standings["losses"], team_standings["ties"], team_standings["busts"]) == (1, 2, 1, 1)
+    assert team_standings["rounds"] == 4
+    assert team_standings["win_rate"] == 0.25
+    assert team_leaderboard.team_standings("Unknown") is None
+
+
+def test_snapshot_saved_and_loaded_keeps_the_standings(tmp_path):
+    snapshot_path = str(tmp_path / "standings.json")
+    team_leaderboard = TeamLeaderboard()
+    record_results(team_leaderboard, "Saved", [consts.GAME_RESULT_INDICATOR_PLAYER_WIN] * 3 + [consts.GAME_RESULT_INDICATOR_TIE])
+    record_results(team_leaderboard, "Also Saved", [consts.GAME_RESULT_INDICATOR_PLAYER_LOSS], bust_count=1)
+    team_leaderboard.write_snapshot(snapshot_path)
+
+    with open(snapshot_path, encoding="utf-8") as snapshot_file:
+        assert [team_dict["team"] for team_dict in json.load(snapshot_file)["teams"]] == ["Saved", "Also Saved"]
+    # Only the snapshot itself is left behind, no temporary file
+    assert [snapshot_file.name for snapshot_file in tmp_path.iterdir()] == ["standings.json"]
+
+    restored_leaderboard = TeamLeaderboard()
+    assert restored_leaderboard.load_snapshot(snapshot_path) == 2
+    assert restored_leaderboard.top_teams(10) == team_leaderboard.top_teams(10)
+
+    # New rounds carry on from the restored standings
+    restored_leaderboard.record_round("Also Saved", consts.GAME_RESULT_INDICATOR_PLAYER_WIN, False)
+    assert restored_leaderboard.team_standings("Also Saved")["rounds"] == 2
+
+
+def test_missing_snapshot_loads_nothing(tmp_path):
+    team_leaderboard = TeamLeaderboard()
+
+    assert team_leaderboard.load_snapshot(str(tmp_path / "not_written_yet.json")) == 0
+    assert team_leaderboard.team_count() == 0